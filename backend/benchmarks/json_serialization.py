@@ -0,0 +1,129 @@
+"""Micro-benchmark for JSON encoding of responses and data files.
+
+Builds codes and messages shaped like the ones in data/ and measures
+encode and parse throughput of:
+
+- fastapi: jsonable_encoder followed by JSONResponse rendering, the default
+  response path before FastJSONResponse
+- legacy save: json.dumps(indent=2, ensure_ascii=False), what the save_*
+  functions used to do
+- json / orjson: utils.serialization serializers, compact and indented
+
+Run from the backend directory:
+
+    python benchmarks/json_serialization.py --codes 2000 --messages 50000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from utils.serialization import ORJSON_AVAILABLE, StdlibSerializer, OrjsonSerializer
+
+SOURCE_LINE = "    result = {'атауы': item.name, 'count': len(item.values)}  # есептеу\n"
+
+
+def make_codes(count: int, rng: random.Random):
+    started = datetime(2024, 1, 1)
+    codes = []
+    for i in range(count):
+        created = (started + timedelta(minutes=i)).isoformat()
+        codes.append({
+            'id': f'code-{i}',
+            'title': f'Example {i}',
+            'content': SOURCE_LINE * rng.randint(20, 400),
+            'language': rng.choice(['python', 'javascript', 'typescript', 'java']),
+            'author': f'user{rng.randint(1, 200)}',
+            'description': 'Мысал код файлы',
+            'tags': ['example', 'demo'],
+            'likes': [f'{rng.randint(10 ** 11, 10 ** 12 - 1)}' for _ in range(rng.randint(0, 40))],
+            'comments': [{
+                'id': f'comment-{i}-{j}',
+                'author': f'user{j}',
+                'content': 'Жақсы код! ' * 3,
+                'createdAt': created,
+                'likes': []
+            } for j in range(rng.randint(0, 8))],
+            'folderId': None,
+            'folderPath': None,
+            'isFolder': False,
+            'folderStructure': None,
+            'views': rng.randint(0, 5000),
+            'viewedBy': [f'{rng.randint(10 ** 11, 10 ** 12 - 1)}' for _ in range(rng.randint(0, 60))],
+            'version': 1,
+            'createdAt': created,
+            'updatedAt': created,
+        })
+    return codes
+
+
+def make_messages(count: int, rng: random.Random):
+    started = datetime(2024, 1, 1)
+    return [{
+        'id': f'message-{i}',
+        'fromUserId': f'{rng.randint(1, 50):012d}',
+        'toUserId': f'{rng.randint(1, 50):012d}',
+        'content': 'Сәлем! Қалайсың? ' * rng.randint(1, 6),
+        'type': 'text',
+        'attachments': [],
+        'metadata': {},
+        'createdAt': (started + timedelta(seconds=i)).isoformat(),
+        'status': 'sent',
+        'read': rng.random() < 0.5,
+    } for i in range(count)]
+
+
+def best_of(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def report(name: str, label: str, size: int, seconds: float):
+    print(f'{name:<10}{label:<20}{seconds * 1000:>10.1f}ms{size / seconds / 1024 / 1024:>10.0f}MB/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--codes', type=int, default=2000)
+    parser.add_argument('--messages', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    datasets = {'codes': make_codes(args.codes, rng), 'messages': make_messages(args.messages, rng)}
+    serializers = [StdlibSerializer()] + ([OrjsonSerializer()] if ORJSON_AVAILABLE else [])
+    if not ORJSON_AVAILABLE:
+        print('orjson is not installed, only the standard json module is measured')
+
+    print(f'{"data":<10}{"encoder":<20}{"time":>12}{"throughput":>12}')
+    for name, data in datasets.items():
+        size = len(StdlibSerializer().dumps(data))
+        response = JSONResponse(None)
+        report(name, 'fastapi', size, best_of(lambda: response.render(jsonable_encoder(data)), args.repeat))
+        report(name, 'legacy save', size, best_of(
+            lambda: json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8'), args.repeat
+        ))
+        for serializer in serializers:
+            assert serializer.loads(serializer.dumps(data)) == data
+            report(name, f'{serializer.name} compact', size, best_of(lambda: serializer.dumps(data), args.repeat))
+            report(name, f'{serializer.name} indent', size, best_of(
+                lambda: serializer.dumps(data, indent=True), args.repeat
+            ))
+        encoded = StdlibSerializer().dumps(data)
+        for serializer in serializers:
+            report(name, f'{serializer.name} parse', size, best_of(lambda: serializer.loads(encoded), args.repeat))
+
+
+if __name__ == '__main__':
+    main()
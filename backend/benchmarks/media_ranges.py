@@ -0,0 +1,121 @@
+"""Benchmark concurrent byte-range reads from the media endpoint.
+
+Serves a generated file through GET /api/uploads/{path} and, for comparison,
+through a plain StaticFiles mount, on a local uvicorn server. Many clients
+then read random ranges in parallel, the way video players seek.
+
+Run from the backend directory (needs httpx):
+
+    python benchmarks/media_ranges.py --size-mb 64 --range-kb 256 --requests 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(app, port: int):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def _run(url: str, size: int, range_size: int, requests: int, concurrency: int, seed: int):
+    import httpx
+    rng = random.Random(seed)
+    offsets = [rng.randrange(0, size - range_size) for _ in range(requests)]
+    queue = asyncio.Queue()
+    for offset in offsets:
+        queue.put_nowait(offset)
+
+    received = 0
+    latencies = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal received
+            while not queue.empty():
+                offset = queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.get(url, headers={'Range': f'bytes={offset}-{offset + range_size - 1}'})
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 206, response.status_code
+                received += len(response.content)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests/s': requests / elapsed,
+        'MB/s': received / elapsed / (1024 * 1024),
+        'p50 ms': latencies[len(latencies) // 2] * 1000,
+        'p99 ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=64)
+    parser.add_argument('--range-kb', type=int, default=256)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    # Uploads are resolved relative to the working directory
+    workdir = tempfile.mkdtemp(prefix='media-bench-')
+    os.chdir(workdir)
+    content_hash = 'ab' * 32
+    blob_dir = os.path.join('uploads', 'blobs', content_hash[:2])
+    os.makedirs(blob_dir)
+    size = args.size_mb * 1024 * 1024
+    with open(os.path.join(blob_dir, f'{content_hash}.mp4'), 'wb') as f:
+        f.write(os.urandom(size))
+
+    from fastapi import FastAPI
+    from fastapi.staticfiles import StaticFiles
+    from routes import media
+
+    app = FastAPI()
+    app.include_router(media.router, prefix='/api')
+    app.mount('/static', StaticFiles(directory='uploads'), name='static')
+
+    port = _free_port()
+    server, thread = _start_server(app, port)
+    path = f'blobs/{content_hash[:2]}/{content_hash}.mp4'
+    targets = {
+        'StaticFiles mount': f'http://127.0.0.1:{port}/static/{path}',
+        'media endpoint': f'http://127.0.0.1:{port}/api/uploads/{path}',
+    }
+    print(f'{args.requests} reads of {args.range_kb}KB ranges from a {args.size_mb}MB file, '
+          f'{args.concurrency} concurrent clients')
+    try:
+        for name, url in targets.items():
+            result = asyncio.run(_run(url, size, args.range_kb * 1024, args.requests, args.concurrency, args.seed))
+            print(f'{name:>18}: ' + ', '.join(f'{key} {value:,.1f}' for key, value in result.items()))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == '__main__':
+    main()
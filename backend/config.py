@@ -8,7 +8,28 @@ USERS_FILE = os.path.join(DATA_DIR, "users.json")
 PASSWORDS_FILE = os.path.join(DATA_DIR, "passwords.json")
 FRIENDS_FILE = os.path.join(DATA_DIR, "friends.json")
 MESSAGES_FILE = os.path.join(DATA_DIR, "messages.json")
-FRIEND_REQUESTS_FILE = os.path.join(DATA_DIR, "friendRequests.json")
+FRIEND_REQUESTS_FILE = os.path.join(DATA_DIR, "friendRequests.json")  # Pending requests only
+FRIEND_REQUESTS_ARCHIVE_FILE = os.path.join(DATA_DIR, "friendRequestsArchive.jsonl")  # Accepted, rejected and cancelled
+CODE_SEARCH_INDEX_FILE = os.path.join(DATA_DIR, "codeSearchIndex.json")
+TRENDING_FILE = os.path.join(DATA_DIR, "trending.json")
+CODE_HISTORY_DIR = os.path.join(DATA_DIR, "codeHistory")  # One JSON Lines file of reverse deltas per code
+PENDING_DELETIONS_FILE = os.path.join(DATA_DIR, "pendingDeletions.json")  # Account deletions accepted but not finished
+
+# Uploaded media (relative to the working directory, served under /api/uploads)
+UPLOAD_DIR = "uploads"
+AVATAR_DIR = os.path.join(UPLOAD_DIR, "avatars")
+THUMBNAIL_DIR = os.path.join(UPLOAD_DIR, "thumbnails")
+AVATAR_THUMBNAIL_DIR = os.path.join(THUMBNAIL_DIR, "avatars")
+IMAGE_THUMBNAIL_DIR = os.path.join(THUMBNAIL_DIR, "images")
+# Attachments stored by content hash
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+# Uploads in progress, outside the served directory but on the same filesystem
+UPLOAD_TMP_DIR = "uploads_tmp"
+
+# JSON encoding of responses and data files: 'orjson', 'json' (standard
+# library) or 'auto' for orjson when it is installed
+JSON_SERIALIZER = 'auto'
+DATA_FILE_INDENT = True  # Indented data files are easier to read, False writes compact JSON (smaller, faster to save)
 
 # Ensure data directory exists
 os.makedirs(DATA_DIR, exist_ok=True)
@@ -16,25 +37,90 @@ os.makedirs(DATA_DIR, exist_ok=True)
 # File validation constants
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB
+MAX_AVATAR_SIZE = 5 * 1024 * 1024  # 5MB
+CONTENT_SCAN_THREAD_THRESHOLD = 256 * 1024  # Larger code content is scanned off the event loop
+BULK_IMPORT_MAX_FILES = 2000  # Files per POST /api/codes/bulk
+BULK_IMPORT_MAX_BYTES = 100 * 1024 * 1024  # 100MB, request body or unpacked zip size per bulk import
+BATCH_LOOKUP_MAX_IDS = 500  # IDs per POST /api/users/batch or /api/codes/batch
+UPLOAD_READ_SIZE = 1024 * 1024  # 1MB, read size when streaming uploads to disk
+UPLOAD_SESSION_CHUNK_SIZE = 4 * 1024 * 1024  # 4MB, suggested chunk size for resumable uploads
+UPLOAD_SESSION_TTL_HOURS = 24  # Unfinished resumable uploads are removed after this
+BLOB_GC_INTERVAL_MINUTES = 60  # How often unreferenced attachment blobs are collected
+BLOB_GC_GRACE_MINUTES = 60  # Unreferenced blobs are kept this long before removal
+AVATAR_TYPES = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+}
 DANGEROUS_EXTENSIONS = [
     '.exe', '.bat', '.cmd', '.com', '.pif', '.scr', '.vbs', '.jar',
     '.app', '.deb', '.pkg', '.rpm', '.msi', '.dmg', '.sh', '.ps1',
     '.bin', '.dll', '.so', '.dylib', '.sys', '.drv', '.ocx', '.cpl',
     '.php', '.asp', '.aspx', '.jsp', '.class'
 ]
+# Same mapping as detectLanguage in the frontend, used for zip imports
+LANGUAGE_EXTENSIONS = {
+    '.js': 'javascript', '.jsx': 'javascript', '.ts': 'typescript', '.tsx': 'typescript',
+    '.py': 'python', '.java': 'java', '.cpp': 'cpp', '.c': 'c', '.h': 'c',
+    '.html': 'html', '.css': 'css', '.json': 'json', '.md': 'markdown',
+}
+
+# Thumbnails (longest side in pixels), rendered by MEDIA_WORKERS background processes
+AVATAR_THUMBNAIL_SIZES = (40, 96, 256)
+IMAGE_THUMBNAIL_SIZES = (160, 480)
+MEDIA_WORKERS = 2
+
+# Trending score: events lose half their weight every TRENDING_HALF_LIFE_HOURS
+TRENDING_HALF_LIFE_HOURS = 24
+TRENDING_VIEW_WEIGHT = 1.0
+TRENDING_LIKE_WEIGHT = 3.0
+
+# Users whose friend suggestion candidates are kept and updated as friendships change
+FRIEND_SUGGESTION_CACHE_USERS = 10000
+
+# Activity feed of friends' new codes, comments and likes
+FEED_TIMELINE_SIZE = 500  # Items kept per timeline and per outbox, oldest dropped first
+FEED_FANOUT_MAX_FOLLOWERS = 1000  # Actors with more friends are merged in when feeds are read
+FEED_BACKFILL_EVENTS = 10000  # Latest codes and comments replayed into timelines on startup
+
+# Background jobs (account deletion cascades) run one at a time
+JOB_SLICE_MS = 20  # Longest a job runs before giving the event loop a turn
+JOB_RETENTION_MINUTES = 60  # Finished jobs stay queryable this long
+
+# Serialized GET responses kept until a version bump they depend on
+RESPONSE_CACHE_BYTES = 64 * 1024 * 1024  # 64MB across all entries
+RESPONSE_CACHE_MAX_ENTRY_BYTES = 4 * 1024 * 1024  # Larger bodies are not cached
+
+# Response compression: encodings in order of preference when a client
+# accepts several (br and zstd need the brotli and zstandard packages)
+COMPRESSION_ENCODINGS = ('zstd', 'br', 'gzip')
+COMPRESSION_LEVELS = {'zstd': 3, 'br': 4, 'gzip': 6}
+COMPRESSION_MIN_SIZE = 1024  # Smaller bodies are sent uncompressed
+COMPRESSION_THREAD_THRESHOLD = 256 * 1024  # Larger bodies are compressed in the thread pool
+COMPRESSION_CACHE_BYTES = 32 * 1024 * 1024  # Compressed bodies of responses with an ETag, kept per encoding
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/x-ndjson', 'application/javascript',
+    'application/xml', 'image/svg+xml'
+)
 
 # Firestore sync availability
 try:
-    from firestore_sync import init_firestore, sync_code_to_firestore, sync_message_to_firestore, delete_code_from_firestore
+    from firestore_sync import (
+        init_firestore, sync_code_to_firestore, sync_codes_to_firestore,
+        sync_message_to_firestore, delete_code_from_firestore
+    )
     FIRESTORE_SYNC_AVAILABLE = True
     FIRESTORE_INIT = init_firestore
     FIRESTORE_SYNC_CODE = sync_code_to_firestore
+    FIRESTORE_SYNC_CODES = sync_codes_to_firestore
     FIRESTORE_SYNC_MESSAGE = sync_message_to_firestore
     FIRESTORE_DELETE_CODE = delete_code_from_firestore
 except ImportError:
     FIRESTORE_SYNC_AVAILABLE = False
     FIRESTORE_INIT = None
     FIRESTORE_SYNC_CODE = None
+    FIRESTORE_SYNC_CODES = None
     FIRESTORE_SYNC_MESSAGE = None
     FIRESTORE_DELETE_CODE = None
     print("Warning: Firestore sync module not available. Real-time features will be disabled.")
@@ -1,5 +1,4 @@
 """Database operations for loading and saving data"""
-import json
 import os
 from typing import List, Dict, Any
 from config import (
@@ -7,6 +6,7 @@ from config import (
     MESSAGES_FILE, FRIEND_REQUESTS_FILE, FIRESTORE_SYNC_AVAILABLE,
     FIRESTORE_SYNC_CODE, FIRESTORE_SYNC_MESSAGE, FIRESTORE_DELETE_CODE
 )
+from utils.serialization import read_json, write_json
 
 # Global data storage
 codes: List[Dict[str, Any]] = []
@@ -24,10 +24,9 @@ def load_data():
     # Load codes
     try:
         if os.path.exists(CODES_FILE):
-            with open(CODES_FILE, 'r', encoding='utf-8') as f:
-                loaded_codes = json.load(f)
-                codes.clear()
-                codes.extend(loaded_codes)
+            loaded_codes = read_json(CODES_FILE)
+            codes.clear()
+            codes.extend(loaded_codes)
         else:
             codes.clear()
     except Exception as e:
@@ -37,10 +36,9 @@ def load_data():
     # Load users
     try:
         if os.path.exists(USERS_FILE):
-            with open(USERS_FILE, 'r', encoding='utf-8') as f:
-                loaded_users = json.load(f)
-                users.clear()
-                users.extend(loaded_users)
+            loaded_users = read_json(USERS_FILE)
+            users.clear()
+            users.extend(loaded_users)
         else:
             users.clear()
             users.append({
@@ -63,10 +61,9 @@ def load_data():
     # Load passwords
     try:
         if os.path.exists(PASSWORDS_FILE):
-            with open(PASSWORDS_FILE, 'r', encoding='utf-8') as f:
-                passwords_obj = json.load(f)
-                passwords.clear()
-                passwords.update(passwords_obj)
+            passwords_obj = read_json(PASSWORDS_FILE)
+            passwords.clear()
+            passwords.update(passwords_obj)
         else:
             passwords.clear()
     except Exception as e:
@@ -76,10 +73,9 @@ def load_data():
     # Load friends
     try:
         if os.path.exists(FRIENDS_FILE):
-            with open(FRIENDS_FILE, 'r', encoding='utf-8') as f:
-                friends_obj = json.load(f)
-                friends.clear()
-                friends.update(friends_obj)
+            friends_obj = read_json(FRIENDS_FILE)
+            friends.clear()
+            friends.update(friends_obj)
         else:
             friends.clear()
     except Exception as e:
@@ -89,10 +85,9 @@ def load_data():
     # Load messages
     try:
         if os.path.exists(MESSAGES_FILE):
-            with open(MESSAGES_FILE, 'r', encoding='utf-8') as f:
-                loaded_messages = json.load(f)
-                messages.clear()
-                messages.extend(loaded_messages)
+            loaded_messages = read_json(MESSAGES_FILE)
+            messages.clear()
+            messages.extend(loaded_messages)
         else:
             messages.clear()
     except Exception as e:
@@ -102,10 +97,9 @@ def load_data():
     # Load friend requests
     try:
         if os.path.exists(FRIEND_REQUESTS_FILE):
-            with open(FRIEND_REQUESTS_FILE, 'r', encoding='utf-8') as f:
-                loaded_friend_requests = json.load(f)
-                friend_requests.clear()
-                friend_requests.extend(loaded_friend_requests)
+            loaded_friend_requests = read_json(FRIEND_REQUESTS_FILE)
+            friend_requests.clear()
+            friend_requests.extend(loaded_friend_requests)
         else:
             friend_requests.clear()
     except Exception as e:
@@ -113,17 +107,17 @@ def load_data():
         friend_requests.clear()
 
 
-def save_codes():
-    """Save codes to file and sync to Firestore"""
+def save_codes(sync_firestore: bool = True):
+    """Save codes to file and sync to Firestore.
+    
+    Callers that sync the codes they changed themselves pass sync_firestore=False.
+    """
     try:
-        os.makedirs(os.path.dirname(CODES_FILE), exist_ok=True)
-        json_data = json.dumps(codes, indent=2, ensure_ascii=False)
-        with open(CODES_FILE, 'w', encoding='utf-8') as f:
-            f.write(json_data)
-        print(f'Codes saved successfully, file size: {len(json_data)} bytes')
+        size = write_json(CODES_FILE, codes)
+        print(f'Codes saved successfully, file size: {size} bytes')
         
         # Firestore-ға синхрондау
-        if FIRESTORE_SYNC_AVAILABLE and FIRESTORE_SYNC_CODE:
+        if sync_firestore and FIRESTORE_SYNC_AVAILABLE and FIRESTORE_SYNC_CODE:
             try:
                 for code in codes:
                     FIRESTORE_SYNC_CODE(code)
@@ -137,12 +131,7 @@ def save_codes():
 def save_users():
     """Save users to file"""
     try:
-        # Ensure directory exists
-        users_dir = os.path.dirname(USERS_FILE)
-        if users_dir:
-            os.makedirs(users_dir, exist_ok=True)
-        with open(USERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(users, f, indent=2, ensure_ascii=False)
+        write_json(USERS_FILE, users)
         print(f'Users saved successfully, count: {len(users)}')
     except Exception as e:
         print(f'Error saving users: {e}')
@@ -152,12 +141,7 @@ def save_users():
 def save_passwords():
     """Save passwords to file"""
     try:
-        # Ensure directory exists
-        password_dir = os.path.dirname(PASSWORDS_FILE)
-        if password_dir:
-            os.makedirs(password_dir, exist_ok=True)
-        with open(PASSWORDS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(passwords, f, indent=2, ensure_ascii=False)
+        write_json(PASSWORDS_FILE, passwords)
     except Exception as e:
         print(f'Error saving passwords: {e}')
         raise
@@ -166,12 +150,7 @@ def save_passwords():
 def save_friends():
     """Save friends to file"""
     try:
-        # Ensure directory exists
-        friends_dir = os.path.dirname(FRIENDS_FILE)
-        if friends_dir:
-            os.makedirs(friends_dir, exist_ok=True)
-        with open(FRIENDS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(friends, f, indent=2, ensure_ascii=False)
+        write_json(FRIENDS_FILE, friends)
         print(f'Friends saved successfully, count: {len(friends)} users')
     except Exception as e:
         print(f'Error saving friends: {e}')
@@ -181,12 +160,7 @@ def save_friends():
 def save_messages():
     """Save messages to file and sync to Firestore"""
     try:
-        # Ensure directory exists
-        messages_dir = os.path.dirname(MESSAGES_FILE)
-        if messages_dir:
-            os.makedirs(messages_dir, exist_ok=True)
-        with open(MESSAGES_FILE, 'w', encoding='utf-8') as f:
-            json.dump(messages, f, indent=2, ensure_ascii=False)
+        write_json(MESSAGES_FILE, messages)
         
         # Firestore-ға синхрондау (соңғы хабарламаларды)
         if FIRESTORE_SYNC_AVAILABLE and FIRESTORE_SYNC_MESSAGE:
@@ -205,12 +179,7 @@ def save_messages():
 def save_friend_requests():
     """Save friend requests to file"""
     try:
-        # Ensure directory exists
-        friend_requests_dir = os.path.dirname(FRIEND_REQUESTS_FILE)
-        if friend_requests_dir:
-            os.makedirs(friend_requests_dir, exist_ok=True)
-        with open(FRIEND_REQUESTS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(friend_requests, f, indent=2, ensure_ascii=False)
+        write_json(FRIEND_REQUESTS_FILE, friend_requests)
         print(f'Friend requests saved successfully, count: {len(friend_requests)}')
     except Exception as e:
         print(f'Error saving friend requests: {e}')
@@ -49,6 +49,31 @@ def init_firestore():
         print(f"Error initializing Firestore: {e}")
         return False
 
+def _code_document(code: Dict[str, Any]) -> Dict[str, Any]:
+    """Firestore-дағы код құжатының өрістері"""
+    # isFolder қасиетін дұрыс анықтау - әртүрлі форматын қолдау
+    isFolder_value = code.get('isFolder', False)
+    isFolder = bool(isFolder_value) if isFolder_value is not None else False
+    
+    return {
+        'title': code.get('title', ''),
+        'content': code.get('content', ''),
+        'language': code.get('language', ''),
+        'author': code.get('author', ''),
+        'createdAt': code.get('createdAt', datetime.now().isoformat()),
+        'updatedAt': code.get('updatedAt', datetime.now().isoformat()),
+        'tags': code.get('tags', []),
+        'description': code.get('description', ''),
+        'likes': code.get('likes', []),
+        'comments': code.get('comments', []),
+        'folderId': code.get('folderId'),
+        'folderPath': code.get('folderPath'),
+        'isFolder': isFolder,  # Boolean мән ретінде сақтау
+        'folderStructure': code.get('folderStructure', {}),
+        'views': code.get('views', 0),
+        'viewedBy': code.get('viewedBy', []),
+    }
+
 def sync_code_to_firestore(code: Dict[str, Any]) -> bool:
     """Кодты Firestore-ға синхрондау"""
     if not FIRESTORE_AVAILABLE or _firestore_db is None:
@@ -56,30 +81,10 @@ def sync_code_to_firestore(code: Dict[str, Any]) -> bool:
     
     try:
         code_ref = _firestore_db.collection('codes').document(code['id'])
-        # isFolder қасиетін дұрыс анықтау - әртүрлі форматын қолдау
-        isFolder_value = code.get('isFolder', False)
-        isFolder = bool(isFolder_value) if isFolder_value is not None else False
-        
-        code_ref.set({
-            'title': code.get('title', ''),
-            'content': code.get('content', ''),
-            'language': code.get('language', ''),
-            'author': code.get('author', ''),
-            'createdAt': code.get('createdAt', datetime.now().isoformat()),
-            'updatedAt': code.get('updatedAt', datetime.now().isoformat()),
-            'tags': code.get('tags', []),
-            'description': code.get('description', ''),
-            'likes': code.get('likes', []),
-            'comments': code.get('comments', []),
-            'folderId': code.get('folderId'),
-            'folderPath': code.get('folderPath'),
-            'isFolder': isFolder,  # Boolean мән ретінде сақтау
-            'folderStructure': code.get('folderStructure', {}),
-            'views': code.get('views', 0),
-            'viewedBy': code.get('viewedBy', []),
-        }, merge=True)
+        document = _code_document(code)
+        code_ref.set(document, merge=True)
         
-        if isFolder:
+        if document['isFolder']:
             print(f"Firestore sync: Folder '{code.get('title', '')}' synced with isFolder=True")
         
         return True
@@ -87,6 +92,27 @@ def sync_code_to_firestore(code: Dict[str, Any]) -> bool:
         print(f"Error syncing code to Firestore: {e}")
         return False
 
+# Firestore бір батчта 500-ден артық жазбаны қабылдамайды
+FIRESTORE_BATCH_LIMIT = 500
+
+def sync_codes_to_firestore(codes: List[Dict[str, Any]]) -> bool:
+    """Көп кодты Firestore-ға батчпен синхрондау (әр кодқа бөлек сұраныс жібермей)"""
+    if not FIRESTORE_AVAILABLE or _firestore_db is None:
+        return False
+    
+    try:
+        collection = _firestore_db.collection('codes')
+        for start in range(0, len(codes), FIRESTORE_BATCH_LIMIT):
+            batch = _firestore_db.batch()
+            for code in codes[start:start + FIRESTORE_BATCH_LIMIT]:
+                batch.set(collection.document(code['id']), _code_document(code), merge=True)
+            batch.commit()
+        print(f"Firestore sync: {len(codes)} codes synced in batches")
+        return True
+    except Exception as e:
+        print(f"Error syncing codes to Firestore: {e}")
+        return False
+
 def sync_message_to_firestore(message: Dict[str, Any]) -> bool:
     """Хабарламаны Firestore-ға синхрондау"""
     if not FIRESTORE_AVAILABLE or _firestore_db is None:
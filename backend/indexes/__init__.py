@@ -0,0 +1,98 @@
+"""In-memory indexes over the loaded data"""
+from typing import Dict, Any, Optional
+from .user_index import UserSearchIndex, user_index
+from .code_search import CodeSearchIndex, code_search_index
+from .code_index import CodeIndex, code_index
+from .code_ranking import CodeRanking, code_ranking, SORT_ORDERS, TRENDING_EVENTS
+from .friend_request_index import FriendRequestIndex, friend_request_index
+from .friend_graph import FriendGraph, friend_graph
+from .message_index import MessageIndex, message_index
+from .user_content_index import UserContentIndex, user_content_index
+
+
+def rebuild_indexes():
+    """Rebuild all indexes from the loaded data"""
+    from database import users, codes, friends, messages, friend_requests
+    user_index.rebuild(users)
+    friend_graph.rebuild(friends)
+    message_index.rebuild(messages)
+    friend_request_index.rebuild(friend_requests)
+    code_index.rebuild(codes)
+    code_ranking.rebuild(codes)
+    user_content_index.rebuild(codes)
+    reindexed = code_search_index.rebuild(codes)
+    print(f"Code search index ready, re-indexed {reindexed} of {len(codes)} codes")
+
+
+def save_indexes():
+    """Persist indexes that are kept on disk"""
+    code_search_index.save()
+    code_ranking.save()
+
+
+def index_code(code: Dict[str, Any]):
+    """Add a new code to every code index"""
+    code_index.add(code)
+    code_search_index.add(code)
+    code_ranking.add(code)
+    user_content_index.update(code)
+
+
+def reindex_code(code: Dict[str, Any]):
+    """Refresh a code in every code index after its fields changed"""
+    code_index.update(code)
+    code_search_index.update(code)
+    code_ranking.update(code)
+    user_content_index.update(code)
+
+
+def touch_code(code: Dict[str, Any], event: Optional[str] = None):
+    """Refresh a code's timestamps and counters in the sort orders, recording a trending event"""
+    code_ranking.update(code)
+    if event:
+        code_ranking.record_event(code['id'], TRENDING_EVENTS[event])
+
+
+def unindex_code(code_id: str):
+    """Remove a code from every code index"""
+    code_index.remove(code_id)
+    code_search_index.remove(code_id)
+    code_ranking.remove(code_id)
+    user_content_index.remove(code_id)
+
+
+def clear_code_indexes():
+    """Empty every code index"""
+    code_index.clear()
+    code_search_index.clear()
+    code_ranking.clear()
+    user_content_index.clear()
+
+
+__all__ = [
+    "UserSearchIndex",
+    "user_index",
+    "CodeSearchIndex",
+    "code_search_index",
+    "CodeIndex",
+    "code_index",
+    "CodeRanking",
+    "code_ranking",
+    "SORT_ORDERS",
+    "TRENDING_EVENTS",
+    "FriendRequestIndex",
+    "friend_request_index",
+    "FriendGraph",
+    "friend_graph",
+    "MessageIndex",
+    "message_index",
+    "UserContentIndex",
+    "user_content_index",
+    "rebuild_indexes",
+    "save_indexes",
+    "index_code",
+    "reindex_code",
+    "touch_code",
+    "unindex_code",
+    "clear_code_indexes",
+]
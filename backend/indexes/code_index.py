@@ -0,0 +1,176 @@
+"""Posting-list indexes over codes by id, folder, tag, language and author"""
+from itertools import count
+from typing import Dict, List, Any, Optional, Iterable
+
+
+# Posting list key for codes that are not inside a folder
+ROOT_FOLDER = None
+
+# Keys of a code that is not filed anywhere yet
+_UNFILED = {'folder': object(), 'tags': [], 'language': '', 'author': ''}
+
+
+class CodeIndex:
+    """Posting lists for listing and filtering codes without scanning.
+
+    Every posting list is an insertion-ordered dict of code ids, so its size
+    doubles as the facet count for that tag or language. Each code also gets
+    a sequence number recording its position in the codes list, which is
+    used to return filtered results in the original listing order.
+    """
+
+    def __init__(self):
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.sequence: Dict[str, int] = {}
+        self.by_folder: Dict[Optional[str], Dict[str, None]] = {}
+        self.by_tag: Dict[str, Dict[str, None]] = {}
+        self.by_language: Dict[str, Dict[str, None]] = {}
+        self.by_author: Dict[str, Dict[str, None]] = {}
+        # code_id -> keys the code is currently filed under
+        self.keys: Dict[str, Dict[str, Any]] = {}
+        self._counter = count()
+
+    @staticmethod
+    def _code_keys(code: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'folder': code.get('folderId') or ROOT_FOLDER,
+            'tags': list(dict.fromkeys(tag.strip().lower() for tag in code.get('tags') or [] if tag and tag.strip())),
+            'language': (code.get('language') or '').strip().lower(),
+            'author': code.get('author') or '',
+        }
+
+    @staticmethod
+    def _post(postings: Dict[Any, Dict[str, None]], key: Any, code_id: str) -> None:
+        postings.setdefault(key, {})[code_id] = None
+
+    @staticmethod
+    def _unpost(postings: Dict[Any, Dict[str, None]], key: Any, code_id: str) -> None:
+        posting = postings.get(key)
+        if posting is not None:
+            posting.pop(code_id, None)
+            if not posting:
+                del postings[key]
+
+    def _file(self, code_id: str, keys: Dict[str, Any], previous: Optional[Dict[str, Any]] = None) -> None:
+        """Post a code under keys, touching only the keys that differ from previous"""
+        previous = previous or _UNFILED
+        self.keys[code_id] = keys
+        if keys['folder'] != previous['folder']:
+            self._post(self.by_folder, keys['folder'], code_id)
+        for tag in keys['tags']:
+            if tag not in previous['tags']:
+                self._post(self.by_tag, tag, code_id)
+        if keys['language'] and keys['language'] != previous['language']:
+            self._post(self.by_language, keys['language'], code_id)
+        if keys['author'] and keys['author'] != previous['author']:
+            self._post(self.by_author, keys['author'], code_id)
+
+    def _unfile(self, code_id: str, keep: Optional[Dict[str, Any]] = None) -> None:
+        """Remove a code from its postings, except the ones it stays under in keep"""
+        keys = self.keys.pop(code_id, None)
+        if not keys:
+            return
+        keep = keep or _UNFILED
+        if keys['folder'] != keep['folder']:
+            self._unpost(self.by_folder, keys['folder'], code_id)
+        for tag in keys['tags']:
+            if tag not in keep['tags']:
+                self._unpost(self.by_tag, tag, code_id)
+        if keys['language'] and keys['language'] != keep['language']:
+            self._unpost(self.by_language, keys['language'], code_id)
+        if keys['author'] and keys['author'] != keep['author']:
+            self._unpost(self.by_author, keys['author'], code_id)
+
+    def rebuild(self, codes: Iterable[Dict[str, Any]]) -> None:
+        """Rebuild the index from scratch"""
+        self.clear()
+        for code in codes:
+            self.add(code)
+
+    def clear(self) -> None:
+        """Remove everything from the index"""
+        self.by_id.clear()
+        self.sequence.clear()
+        self.by_folder.clear()
+        self.by_tag.clear()
+        self.by_language.clear()
+        self.by_author.clear()
+        self.keys.clear()
+
+    def add(self, code: Dict[str, Any]) -> None:
+        """Add a code (appended to the end of the listing order)"""
+        code_id = code['id']
+        self.remove(code_id)
+        self.by_id[code_id] = code
+        self.sequence[code_id] = next(self._counter)
+        self._file(code_id, self._code_keys(code))
+
+    def update(self, code: Dict[str, Any]) -> None:
+        """Re-file a code after its tags, language, author or folder changed"""
+        code_id = code['id']
+        if code_id not in self.by_id:
+            self.add(code)
+            return
+        self.by_id[code_id] = code
+        keys = self._code_keys(code)
+        previous = self.keys.get(code_id)
+        if keys != previous:
+            self._unfile(code_id, keep=keys)
+            self._file(code_id, keys, previous=previous)
+
+    def remove(self, code_id: str) -> None:
+        """Remove a code from the index"""
+        if self.by_id.pop(code_id, None) is None:
+            return
+        self.sequence.pop(code_id, None)
+        self._unfile(code_id)
+
+    def get(self, code_id: str) -> Optional[Dict[str, Any]]:
+        """Get a code by ID"""
+        return self.by_id.get(code_id)
+
+    def folder_children(self, folder_id: str) -> List[Dict[str, Any]]:
+        """Get codes stored directly inside a folder"""
+        return [self.by_id[code_id] for code_id in self.by_folder.get(folder_id, {})]
+
+    def filter(self, folder_id: Optional[str] = ROOT_FOLDER, tag: Optional[str] = None,
+               language: Optional[str] = None, author: Optional[str] = None,
+               any_folder: bool = False) -> List[Dict[str, Any]]:
+        """Codes matching every given filter, in listing order.
+
+        The smallest posting list is walked and checked against the others,
+        so the cost is bounded by the smallest list rather than all codes.
+        """
+        postings = []
+        postings_in_order = None
+        if not any_folder:
+            postings_in_order = self.by_folder.get(folder_id or ROOT_FOLDER, {})
+            postings.append(postings_in_order)
+        if tag:
+            postings.append(self.by_tag.get(tag.strip().lower(), {}))
+        if language:
+            postings.append(self.by_language.get(language.strip().lower(), {}))
+        if author:
+            postings.append(self.by_author.get(author, {}))
+        if not postings:
+            postings.append(self.by_id)
+
+        postings.sort(key=len)
+        smallest, rest = postings[0], postings[1:]
+        code_ids = [code_id for code_id in smallest if all(code_id in posting for posting in rest)]
+        if smallest is not self.by_id and smallest is not postings_in_order:
+            # Tag, language and author postings can be out of listing order after
+            # re-filing, folder postings and by_id never are
+            code_ids.sort(key=self.sequence.__getitem__)
+        return [self.by_id[code_id] for code_id in code_ids]
+
+    def facets(self) -> Dict[str, Dict[str, int]]:
+        """Number of codes per tag and per language"""
+        return {
+            'tags': {tag: len(posting) for tag, posting in self.by_tag.items()},
+            'languages': {language: len(posting) for language, posting in self.by_language.items()},
+        }
+
+
+# Global code index
+code_index = CodeIndex()
@@ -0,0 +1,225 @@
+"""Precomputed sort orders for code listings"""
+import math
+import os
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Iterable, Tuple, Set
+from config import (
+    TRENDING_FILE, TRENDING_HALF_LIFE_HOURS, TRENDING_VIEW_WEIGHT, TRENDING_LIKE_WEIGHT
+)
+from utils.serialization import dumps, loads
+
+
+SORT_ORDERS = ('newest', 'updated', 'views', 'likes', 'trending')
+
+# Trending weight of each code event
+TRENDING_EVENTS = {
+    'view': TRENDING_VIEW_WEIGHT,
+    'like': TRENDING_LIKE_WEIGHT,
+    'unlike': -TRENDING_LIKE_WEIGHT,
+}
+
+# Decay rate per second for the trending score
+_DECAY = math.log(2) / (TRENDING_HALF_LIFE_HOURS * 3600)
+
+
+def _timestamp(value: Optional[str]) -> float:
+    """Parse an ISO timestamp into seconds, 0 if missing or invalid"""
+    if not value:
+        return 0.0
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class SortedIndex:
+    """Codes kept sorted by a key, updated in place as the key changes"""
+
+    def __init__(self):
+        # Ascending (key, code_id) pairs, walked from the end for descending order
+        self.items: List[Tuple[Any, str]] = []
+        self.keys: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def set(self, code_id: str, key: Any) -> None:
+        """Insert a code or move it to its new key"""
+        old_key = self.keys.get(code_id)
+        if code_id in self.keys:
+            if old_key == key:
+                return
+            self.remove(code_id)
+        self.keys[code_id] = key
+        insort(self.items, (key, code_id))
+
+    def remove(self, code_id: str) -> None:
+        """Remove a code"""
+        if code_id not in self.keys:
+            return
+        key = self.keys.pop(code_id)
+        position = bisect_left(self.items, (key, code_id))
+        if position < len(self.items) and self.items[position] == (key, code_id):
+            self.items.pop(position)
+
+    def load(self, keyed: Iterable[Tuple[Any, str]]) -> None:
+        """Replace the contents with (key, code_id) pairs in one sort"""
+        self.items = sorted(keyed)
+        self.keys = {code_id: key for key, code_id in self.items}
+
+    def descending(self):
+        """Yield code ids from the highest key down"""
+        for position in range(len(self.items) - 1, -1, -1):
+            yield self.items[position][1]
+
+
+class CodeRanking:
+    """Sorted orders over codes for newest, updated, most viewed, most liked and trending.
+
+    The trending score of a code is log(sum(weight * exp(decay * t))) over its
+    view and like events. Measuring time from a fixed epoch means scores never
+    need to be recomputed as time passes, older events are simply outweighed
+    by newer ones, so every event is a single O(log n) re-position.
+    """
+
+    def __init__(self, trending_file: Optional[str] = None):
+        self.trending_file = trending_file
+        self.orders: Dict[str, SortedIndex] = {order: SortedIndex() for order in SORT_ORDERS}
+        self.trending: Dict[str, float] = {}
+        self.dirty = False
+
+    @staticmethod
+    def _counter_keys(code: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'newest': code.get('createdAt') or '',
+            'updated': code.get('updatedAt') or '',
+            'views': code.get('views', 0) or 0,
+            'likes': len(code.get('likes') or []),
+        }
+
+    def rebuild(self, codes: Iterable[Dict[str, Any]]) -> None:
+        """Rebuild all orders, restoring persisted trending scores"""
+        codes = list(codes)
+        persisted = self._load_trending()
+        self.trending = {}
+        for code in codes:
+            score = persisted.get(code['id'])
+            if score is None:
+                # No recorded events, seed from the counters as of the last update
+                weight = (code.get('views', 0) or 0) * TRENDING_VIEW_WEIGHT + \
+                    len(code.get('likes') or []) * TRENDING_LIKE_WEIGHT
+                at = _timestamp(code.get('updatedAt')) or _timestamp(code.get('createdAt'))
+                score = math.log(weight) + _DECAY * at if weight > 0 else -math.inf
+            self.trending[code['id']] = score
+
+        for order in ('newest', 'updated', 'views', 'likes'):
+            self.orders[order].load((self._counter_keys(code)[order], code['id']) for code in codes)
+        self.orders['trending'].load((score, code_id) for code_id, score in self.trending.items())
+        self.dirty = True
+
+    def clear(self) -> None:
+        """Remove everything from the orders"""
+        for order in self.orders.values():
+            order.load(())
+        self.trending.clear()
+        self.dirty = True
+
+    def add(self, code: Dict[str, Any]) -> None:
+        """Add a new code to every order"""
+        self.trending.setdefault(code['id'], -math.inf)
+        self.update(code)
+
+    def update(self, code: Dict[str, Any]) -> None:
+        """Re-position a code after its timestamps or counters changed"""
+        code_id = code['id']
+        for order, key in self._counter_keys(code).items():
+            self.orders[order].set(code_id, key)
+        self.orders['trending'].set(code_id, self.trending.setdefault(code_id, -math.inf))
+
+    def remove(self, code_id: str) -> None:
+        """Remove a code from every order"""
+        for order in self.orders.values():
+            order.remove(code_id)
+        if self.trending.pop(code_id, None) is not None:
+            self.dirty = True
+
+    def record_event(self, code_id: str, weight: float, at: Optional[float] = None) -> None:
+        """Add a weighted view or like event (negative weight retracts one) to the trending score"""
+        if code_id not in self.trending or not weight:
+            return
+        score = self.trending[code_id]
+        event = _DECAY * (at if at is not None else time.time())
+        magnitude = math.log(abs(weight)) + event
+        if weight > 0:
+            if score == -math.inf:
+                score = magnitude
+            else:
+                high, low = max(score, magnitude), min(score, magnitude)
+                score = high + math.log1p(math.exp(low - high))
+        elif score > magnitude:
+            score = score + math.log1p(-math.exp(magnitude - score))
+        else:
+            score = -math.inf
+        self.trending[code_id] = score
+        self.orders['trending'].set(code_id, score)
+        self.dirty = True
+
+    def page(self, order: str, candidate_ids: Set[str], offset: int = 0,
+             limit: Optional[int] = None) -> List[str]:
+        """Candidate code ids in descending order, sliced to offset/limit.
+
+        Dense candidate sets walk the precomputed order and stop once the page
+        is full; sparse ones sort just the candidates by their stored key.
+        """
+        index = self.orders[order]
+        end = None if limit is None else offset + limit
+        if end is not None and len(candidate_ids) * 4 >= len(index):
+            page = []
+            for code_id in index.descending():
+                if code_id in candidate_ids:
+                    page.append(code_id)
+                    if len(page) >= end:
+                        break
+            return page[offset:]
+
+        keys = index.keys
+        ranked = sorted(
+            (code_id for code_id in candidate_ids if code_id in keys),
+            key=lambda code_id: (keys[code_id], code_id),
+            reverse=True
+        )
+        return ranked[offset:end]
+
+    def _load_trending(self) -> Dict[str, float]:
+        if not self.trending_file or not os.path.exists(self.trending_file):
+            return {}
+        try:
+            with open(self.trending_file, 'rb') as f:
+                return {code_id: (score if score is not None else -math.inf) for code_id, score in loads(f.read()).items()}
+        except Exception as e:
+            print(f'Error loading trending scores: {e}')
+            return {}
+
+    def save(self) -> None:
+        """Persist trending scores if anything changed"""
+        if not self.trending_file or not self.dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.trending_file), exist_ok=True)
+            tmp_file = f'{self.trending_file}.tmp'
+            with open(tmp_file, 'wb') as f:
+                # -inf is not valid JSON, codes without events are stored as null
+                f.write(dumps({
+                    code_id: (score if score != -math.inf else None)
+                    for code_id, score in self.trending.items()
+                }))
+            os.replace(tmp_file, self.trending_file)
+            self.dirty = False
+        except Exception as e:
+            print(f'Error saving trending scores: {e}')
+
+
+# Global code ranking
+code_ranking = CodeRanking(TRENDING_FILE)
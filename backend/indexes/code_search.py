@@ -0,0 +1,268 @@
+"""Full-text search index over codes with BM25 ranking"""
+import hashlib
+import heapq
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+from config import CODE_SEARCH_INDEX_FILE
+from utils.serialization import dumps, loads
+
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Per-field weights applied to term frequencies
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'tags': 2.0,
+    'description': 1.5,
+    'content': 1.0,
+}
+
+# Only the head of very large files is indexed
+MAX_INDEXED_CONTENT = 1024 * 1024
+
+INDEX_FORMAT_VERSION = 1
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def _split_identifier(word: str) -> List[str]:
+    """Split a camelCase / PascalCase / snake_case identifier into parts"""
+    parts = []
+    for chunk in word.split('_'):
+        if not chunk:
+            continue
+        start = 0
+        for i in range(1, len(chunk)):
+            prev, char = chunk[i - 1], chunk[i]
+            boundary = (
+                (prev.islower() and char.isupper()) or
+                (prev.isdigit() != char.isdigit()) or
+                # Acronym followed by a word: "HTTPServer" -> "HTTP", "Server"
+                (prev.isupper() and char.isupper() and i + 1 < len(chunk) and chunk[i + 1].islower())
+            )
+            if boundary:
+                parts.append(chunk[start:i])
+                start = i
+        parts.append(chunk[start:])
+    return parts
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokenize text for code search.
+
+    Identifiers are split on case changes, digits and underscores, and the
+    whole identifier is kept as well so exact identifier queries rank highest.
+    """
+    tokens = []
+    if not text:
+        return tokens
+    for word in _WORD_RE.findall(text):
+        parts = _split_identifier(word)
+        for part in parts:
+            if len(part) > 1:
+                tokens.append(part.lower())
+        if len(parts) > 1:
+            tokens.append(word.lower())
+    return tokens
+
+
+def code_signature(code: Dict[str, Any]) -> str:
+    """Hash of everything the index stores about a code"""
+    digest = hashlib.blake2b(digest_size=16)
+    for value in (
+        code.get('title'), code.get('description'), code.get('language'),
+        code.get('author'), '\x00'.join(code.get('tags') or []), code.get('content'),
+    ):
+        digest.update((value or '').encode('utf-8', 'surrogatepass'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+class CodeSearchIndex:
+    """Inverted index with BM25 ranking over code titles, descriptions, tags and content"""
+
+    def __init__(self, index_file: Optional[str] = None):
+        self.index_file = index_file
+        # term -> {code_id: weighted term frequency}
+        self.postings: Dict[str, Dict[str, float]] = {}
+        # code_id -> document info (signature, length, term frequencies, filter fields)
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.total_length = 0.0
+        self.dirty = False
+
+    def _document_terms(self, code: Dict[str, Any]) -> Counter:
+        terms = Counter()
+        content = code.get('content') or ''
+        fields = {
+            'title': code.get('title') or '',
+            'tags': ' '.join(code.get('tags') or []),
+            'description': code.get('description') or '',
+            'content': content[:MAX_INDEXED_CONTENT],
+        }
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for token in tokenize(text):
+                terms[token] += weight
+        return terms
+
+    def _insert(self, code_id: str, document: Dict[str, Any]) -> None:
+        self.documents[code_id] = document
+        self.total_length += document['length']
+        for term, frequency in document['terms'].items():
+            self.postings.setdefault(term, {})[code_id] = frequency
+
+    def add(self, code: Dict[str, Any], signature: Optional[str] = None) -> None:
+        """Add or re-index a code"""
+        code_id = code['id']
+        self.remove(code_id)
+        terms = self._document_terms(code)
+        self._insert(code_id, {
+            'signature': signature or code_signature(code),
+            'length': sum(terms.values()),
+            'terms': dict(terms),
+            'language': (code.get('language') or '').lower(),
+            'tags': [tag.lower() for tag in code.get('tags') or []],
+            'author': code.get('author') or '',
+        })
+        self.dirty = True
+
+    def update(self, code: Dict[str, Any]) -> None:
+        """Re-index a code if any indexed field changed"""
+        signature = code_signature(code)
+        document = self.documents.get(code['id'])
+        if document and document['signature'] == signature:
+            return
+        self.add(code, signature)
+
+    def remove(self, code_id: str) -> None:
+        """Remove a code from the index"""
+        document = self.documents.pop(code_id, None)
+        if not document:
+            return
+        self.total_length -= document['length']
+        for term in document['terms']:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(code_id, None)
+                if not posting:
+                    del self.postings[term]
+        self.dirty = True
+
+    def clear(self) -> None:
+        """Remove everything from the index"""
+        self.postings.clear()
+        self.documents.clear()
+        self.total_length = 0.0
+        self.dirty = True
+
+    def rebuild(self, codes: Iterable[Dict[str, Any]]) -> int:
+        """Bring the index in line with codes, reusing persisted documents that are still current.
+
+        Returns the number of codes that had to be (re)tokenized.
+        """
+        if not self.documents:
+            self.load()
+
+        reindexed = 0
+        live_ids = set()
+        for code in codes:
+            live_ids.add(code['id'])
+            signature = code_signature(code)
+            document = self.documents.get(code['id'])
+            if not document or document['signature'] != signature:
+                self.add(code, signature)
+                reindexed += 1
+
+        for code_id in [code_id for code_id in self.documents if code_id not in live_ids]:
+            self.remove(code_id)
+        return reindexed
+
+    def load(self) -> bool:
+        """Load persisted documents from index_file"""
+        if not self.index_file or not os.path.exists(self.index_file):
+            return False
+        try:
+            with open(self.index_file, 'rb') as f:
+                data = loads(f.read())
+            if data.get('version') != INDEX_FORMAT_VERSION:
+                return False
+            self.postings.clear()
+            self.documents.clear()
+            self.total_length = 0.0
+            for code_id, document in data.get('documents', {}).items():
+                self._insert(code_id, document)
+            self.dirty = False
+            return True
+        except Exception as e:
+            print(f'Error loading code search index: {e}')
+            self.postings.clear()
+            self.documents.clear()
+            self.total_length = 0.0
+            return False
+
+    def save(self, force: bool = False) -> None:
+        """Persist documents to index_file if anything changed"""
+        if not self.index_file or not (self.dirty or force):
+            return
+        try:
+            os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+            tmp_file = f'{self.index_file}.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(dumps({'version': INDEX_FORMAT_VERSION, 'documents': self.documents}))
+            os.replace(tmp_file, self.index_file)
+            self.dirty = False
+        except Exception as e:
+            print(f'Error saving code search index: {e}')
+
+    def _matches_filters(self, document: Dict[str, Any], language: Optional[str],
+                         tag: Optional[str], author: Optional[str]) -> bool:
+        if language and document['language'] != language.lower():
+            return False
+        if tag and tag.lower() not in document['tags']:
+            return False
+        if author and document['author'] != author:
+            return False
+        return True
+
+    def search(self, query: str, limit: int = 20, offset: int = 0,
+               language: Optional[str] = None, tag: Optional[str] = None,
+               author: Optional[str] = None) -> Tuple[List[Tuple[str, float]], int]:
+        """Rank codes against query with BM25.
+
+        Returns ((code_id, score) pairs for the requested page, total matches).
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        document_count = len(self.documents)
+        if not terms or not document_count:
+            return [], 0
+
+        average_length = self.total_length / document_count or 1.0
+        scores: Dict[str, float] = {}
+        for term in terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            frequency = len(posting)
+            idf = math.log(1 + (document_count - frequency + 0.5) / (frequency + 0.5))
+            for code_id, tf in posting.items():
+                length = self.documents[code_id]['length']
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                scores[code_id] = scores.get(code_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        if language or tag or author:
+            scores = {
+                code_id: score for code_id, score in scores.items()
+                if self._matches_filters(self.documents[code_id], language, tag, author)
+            }
+
+        ranked = heapq.nlargest(offset + limit, scores.items(), key=lambda item: item[1])
+        return ranked[offset:], len(scores)
+
+
+# Global code search index
+code_search_index = CodeSearchIndex(CODE_SEARCH_INDEX_FILE)
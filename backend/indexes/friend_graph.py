@@ -0,0 +1,136 @@
+"""Friendship adjacency sets and friends-of-friends candidates"""
+import heapq
+from collections import OrderedDict
+from typing import Dict, List, Iterable, Set, Tuple
+from config import FRIEND_SUGGESTION_CACHE_USERS
+
+
+class FriendGraph:
+    """Undirected friendship graph with cached suggestion candidates.
+
+    friends.json stores lists; here every user has a set of friends, so
+    membership and mutual friends are set operations. A user's candidates
+    (friends of friends who are not friends yet, with their mutual friend
+    counts) are counted the first time they are asked for and from then on
+    kept up to date by add() and remove(), which only touch the two users
+    and their direct friends. At most max_cached users keep candidates,
+    least recently asked dropped first.
+    """
+
+    def __init__(self, max_cached: int = FRIEND_SUGGESTION_CACHE_USERS):
+        self.adjacency: Dict[str, Set[str]] = {}
+        self.candidates: 'OrderedDict[str, Dict[str, int]]' = OrderedDict()
+        self.max_cached = max_cached
+
+    def rebuild(self, friends: Dict[str, Iterable[str]]) -> None:
+        self.adjacency = {}
+        self.candidates.clear()
+        for user_id, friend_ids in friends.items():
+            for friend_id in friend_ids:
+                if friend_id != user_id:
+                    self.adjacency.setdefault(user_id, set()).add(friend_id)
+                    self.adjacency.setdefault(friend_id, set()).add(user_id)
+
+    def clear(self) -> None:
+        self.adjacency = {}
+        self.candidates.clear()
+
+    def friends_of(self, user_id: str) -> Set[str]:
+        return self.adjacency.get(user_id, set())
+
+    def are_friends(self, user_id: str, other_user_id: str) -> bool:
+        return other_user_id in self.friends_of(user_id)
+
+    def mutual_friends(self, user_id: str, other_user_id: str) -> Set[str]:
+        return self.friends_of(user_id) & self.friends_of(other_user_id)
+
+    def _count_candidates(self, user_id: str) -> Dict[str, int]:
+        friend_ids = self.friends_of(user_id)
+        counts: Dict[str, int] = {}
+        for friend_id in friend_ids:
+            for candidate_id in self.friends_of(friend_id):
+                if candidate_id != user_id and candidate_id not in friend_ids:
+                    counts[candidate_id] = counts.get(candidate_id, 0) + 1
+        return counts
+
+    def _candidates_of(self, user_id: str) -> Dict[str, int]:
+        counts = self.candidates.get(user_id)
+        if counts is None:
+            counts = self._count_candidates(user_id)
+            self.candidates[user_id] = counts
+            if len(self.candidates) > self.max_cached:
+                self.candidates.popitem(last=False)
+        else:
+            self.candidates.move_to_end(user_id)
+        return counts
+
+    def suggestions(self, user_id: str, limit: int) -> List[Tuple[str, int]]:
+        """Up to limit (candidate_id, mutual friend count), most mutual friends first"""
+        return heapq.nlargest(limit, self._candidates_of(user_id).items(), key=lambda item: item[1])
+
+    @staticmethod
+    def _shift(counts: Dict[str, int], candidate_id: str, delta: int) -> None:
+        count = counts.get(candidate_id, 0) + delta
+        if count > 0:
+            counts[candidate_id] = count
+        else:
+            counts.pop(candidate_id, None)
+
+    def _link_candidates(self, user_id: str, other_user_id: str, delta: int) -> None:
+        """Apply an edge change between user_id and other_user_id to cached candidates on user_id's side.
+
+        Called before adding or after removing the edge, so both friend
+        sets hold only the friendships that stay the same.
+        """
+        user_friends = self.friends_of(user_id)
+        counts = self.candidates.get(user_id)
+        if counts is not None:
+            # other_user_id's friends gain or lose user_id as a mutual friend
+            for candidate_id in self.friends_of(other_user_id):
+                if candidate_id != user_id and candidate_id not in user_friends:
+                    self._shift(counts, candidate_id, delta)
+        # user_id's friends gain or lose a path to other_user_id
+        for friend_id in user_friends:
+            friend_counts = self.candidates.get(friend_id)
+            if friend_counts is not None and friend_id != other_user_id \
+                    and other_user_id not in self.friends_of(friend_id):
+                self._shift(friend_counts, other_user_id, delta)
+
+    def add(self, user_id: str, friend_id: str) -> None:
+        if user_id == friend_id or self.are_friends(user_id, friend_id):
+            return
+        self._link_candidates(user_id, friend_id, 1)
+        self._link_candidates(friend_id, user_id, 1)
+        self.adjacency.setdefault(user_id, set()).add(friend_id)
+        self.adjacency.setdefault(friend_id, set()).add(user_id)
+        # Friends are no longer candidates of each other
+        for one, other in ((user_id, friend_id), (friend_id, user_id)):
+            if one in self.candidates:
+                self.candidates[one].pop(other, None)
+
+    def remove(self, user_id: str, friend_id: str) -> None:
+        if not self.are_friends(user_id, friend_id):
+            return
+        self.adjacency[user_id].discard(friend_id)
+        self.adjacency[friend_id].discard(user_id)
+        self._link_candidates(user_id, friend_id, -1)
+        self._link_candidates(friend_id, user_id, -1)
+        # Former friends with friends in common become candidates
+        mutual_count = len(self.mutual_friends(user_id, friend_id))
+        for one, other in ((user_id, friend_id), (friend_id, user_id)):
+            if one in self.candidates and mutual_count:
+                self.candidates[one][other] = mutual_count
+
+    def remove_user(self, user_id: str) -> None:
+        """Drop a deleted user with all their friendships.
+
+        Cached candidates are dropped rather than updated, they are counted
+        again the next time they are asked for.
+        """
+        for friend_id in self.adjacency.pop(user_id, set()):
+            self.adjacency[friend_id].discard(user_id)
+        self.candidates.clear()
+
+
+# Global friend graph
+friend_graph = FriendGraph()
@@ -0,0 +1,89 @@
+"""Indexes of pending friend requests by recipient, sender and pair"""
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+
+PENDING = 'pending'
+
+
+def pair_key(user_id: str, other_user_id: str) -> Tuple[str, str]:
+    """Key of two users regardless of who sent the request"""
+    return (user_id, other_user_id) if user_id <= other_user_id else (other_user_id, user_id)
+
+
+class FriendRequestIndex:
+    """Pending friend requests by id, recipient, sender and unordered pair.
+
+    Posting lists are insertion-ordered dicts keyed by request id, so
+    requests come back in the order they were made and the size of a
+    user's incoming list is their pending count. Processed requests are
+    removed and never indexed.
+    """
+
+    def __init__(self):
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.incoming: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.outgoing: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.by_pair: Dict[Tuple[str, str], Dict[str, Dict[str, Any]]] = {}
+
+    @staticmethod
+    def _post(postings: Dict[Any, Dict[str, Dict[str, Any]]], key: Any, request: Dict[str, Any]) -> None:
+        postings.setdefault(key, {})[request['id']] = request
+
+    @staticmethod
+    def _unpost(postings: Dict[Any, Dict[str, Dict[str, Any]]], key: Any, request_id: str) -> None:
+        posting = postings.get(key)
+        if posting is not None:
+            posting.pop(request_id, None)
+            if not posting:
+                del postings[key]
+
+    def clear(self) -> None:
+        self.by_id.clear()
+        self.incoming.clear()
+        self.outgoing.clear()
+        self.by_pair.clear()
+
+    def rebuild(self, requests: Iterable[Dict[str, Any]]) -> None:
+        self.clear()
+        for request in requests:
+            self.add(request)
+
+    def add(self, request: Dict[str, Any]) -> None:
+        if request.get('status') != PENDING:
+            return
+        self.by_id[request['id']] = request
+        self._post(self.incoming, request['toUserId'], request)
+        self._post(self.outgoing, request['fromUserId'], request)
+        self._post(self.by_pair, pair_key(request['fromUserId'], request['toUserId']), request)
+
+    def remove(self, request_id: str) -> Optional[Dict[str, Any]]:
+        request = self.by_id.pop(request_id, None)
+        if request is None:
+            return None
+        self._unpost(self.incoming, request['toUserId'], request_id)
+        self._unpost(self.outgoing, request['fromUserId'], request_id)
+        self._unpost(self.by_pair, pair_key(request['fromUserId'], request['toUserId']), request_id)
+        return request
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Pending request by id"""
+        return self.by_id.get(request_id)
+
+    def incoming_requests(self, user_id: str) -> List[Dict[str, Any]]:
+        return list(self.incoming.get(user_id, {}).values())
+
+    def outgoing_requests(self, user_id: str) -> List[Dict[str, Any]]:
+        return list(self.outgoing.get(user_id, {}).values())
+
+    def between(self, user_id: str, other_user_id: str) -> List[Dict[str, Any]]:
+        """Pending requests between two users in either direction"""
+        return list(self.by_pair.get(pair_key(user_id, other_user_id), {}).values())
+
+    def incoming_count(self, user_id: str) -> int:
+        return len(self.incoming.get(user_id, ()))
+
+    def outgoing_count(self, user_id: str) -> int:
+        return len(self.outgoing.get(user_id, ()))
+
+
+# Global friend request index
+friend_request_index = FriendRequestIndex()
@@ -0,0 +1,57 @@
+"""Index of messages by participant"""
+from typing import Dict, List, Any, Iterable
+
+
+class MessageIndex:
+    """Messages by the users who sent or received them.
+
+    Posting lists are insertion-ordered dicts keyed by message id, so a
+    user's messages come back oldest first without sorting and removing
+    one does not scan the others. New messages are stamped with the current
+    time, so appending them keeps that order; rebuild() sorts stored ones.
+    """
+
+    def __init__(self):
+        self.by_participant: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    @staticmethod
+    def _participants(message: Dict[str, Any]) -> List[str]:
+        return [user_id for user_id in dict.fromkeys((message.get('fromUserId'), message.get('toUserId'))) if user_id]
+
+    def clear(self) -> None:
+        self.by_participant.clear()
+
+    def rebuild(self, messages: Iterable[Dict[str, Any]]) -> None:
+        self.clear()
+        for message in sorted(messages, key=lambda message: message.get('createdAt') or ''):
+            self.add(message)
+
+    def add(self, message: Dict[str, Any]) -> None:
+        for user_id in self._participants(message):
+            self.by_participant.setdefault(user_id, {})[message['id']] = message
+
+    def remove(self, message: Dict[str, Any]) -> None:
+        for user_id in self._participants(message):
+            posting = self.by_participant.get(user_id)
+            if posting is not None:
+                posting.pop(message['id'], None)
+                if not posting:
+                    del self.by_participant[user_id]
+
+    def messages_of(self, user_id: str, newest_first: bool = False) -> List[Dict[str, Any]]:
+        """Messages a user sent or received, oldest first unless newest_first"""
+        posting = self.by_participant.get(user_id, {}).values()
+        return list(reversed(posting) if newest_first else posting)
+
+    def conversation(self, user_id: str, other_user_id: str) -> List[Dict[str, Any]]:
+        """Messages between two users, oldest first, read from the shorter posting list"""
+        posting = min(self.by_participant.get(user_id, {}), self.by_participant.get(other_user_id, {}), key=len)
+        participants = {user_id, other_user_id}
+        return [
+            message for message in posting.values()
+            if {message.get('fromUserId'), message.get('toUserId')} == participants
+        ]
+
+
+# Global message index
+message_index = MessageIndex()
@@ -0,0 +1,114 @@
+"""Reverse index from users to the codes, comments and likes that refer to them"""
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Set, Tuple
+
+# Kinds of reference a code can hold to a user
+AUTHORED = 'codes'
+COMMENTED = 'comments'
+LIKED = 'likedCodes'
+LIKED_COMMENTS = 'likedComments'
+REFERENCE_KINDS = (AUTHORED, COMMENTED, LIKED, LIKED_COMMENTS)
+
+# (kind, user_id, item_id): item_id is the code id for codes and code likes,
+# the comment id for comments and comment likes
+Reference = Tuple[str, str, str]
+
+
+def iter_comments(code: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Every comment of a code, replies nested under a comment included"""
+    for comment in code.get('comments') or []:
+        yield comment
+        for reply in comment.get('replies') or []:
+            if isinstance(reply, dict):
+                yield reply
+
+
+def find_comment(code: Dict[str, Any], comment_id: str) -> Optional[Dict[str, Any]]:
+    return next((comment for comment in iter_comments(code) if comment.get('id') == comment_id), None)
+
+
+class UserContentIndex:
+    """Per user, the codes they wrote and the comments and likes they left.
+
+    Posting lists map item ids to the id of the code holding them, keyed by
+    user id so a rename changes nothing here. Each code also remembers the
+    references it was filed under; update() files a code again after any
+    change to its author, comments or likes and only touches the references
+    that differ, so keeping the index current costs the size of one code.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, Dict[str, str]]] = {kind: {} for kind in REFERENCE_KINDS}
+        # code_id -> references the code is currently filed under
+        self.references: Dict[str, Set[Reference]] = {}
+
+    @staticmethod
+    def _code_references(code: Dict[str, Any]) -> Set[Reference]:
+        references = set()
+        if code.get('authorId'):
+            references.add((AUTHORED, code['authorId'], code['id']))
+        for user_id in code.get('likes') or []:
+            references.add((LIKED, user_id, code['id']))
+        for comment in iter_comments(code):
+            comment_id = comment.get('id')
+            if not comment_id:
+                continue
+            if comment.get('authorId'):
+                references.add((COMMENTED, comment['authorId'], comment_id))
+            for user_id in comment.get('likes') or []:
+                references.add((LIKED_COMMENTS, user_id, comment_id))
+        return references
+
+    def _post(self, reference: Reference, code_id: str) -> None:
+        kind, user_id, item_id = reference
+        self.postings[kind].setdefault(user_id, {})[item_id] = code_id
+
+    def _unpost(self, reference: Reference) -> None:
+        kind, user_id, item_id = reference
+        posting = self.postings[kind].get(user_id)
+        if posting is not None:
+            posting.pop(item_id, None)
+            if not posting:
+                del self.postings[kind][user_id]
+
+    def clear(self) -> None:
+        for postings in self.postings.values():
+            postings.clear()
+        self.references.clear()
+
+    def rebuild(self, codes: Iterable[Dict[str, Any]]) -> None:
+        self.clear()
+        for code in codes:
+            self.update(code)
+
+    def update(self, code: Dict[str, Any]) -> None:
+        """File a new or changed code under the users it refers to"""
+        references = self._code_references(code)
+        previous = self.references.get(code['id'], set())
+        for reference in previous - references:
+            self._unpost(reference)
+        for reference in references - previous:
+            self._post(reference, code['id'])
+        self.references[code['id']] = references
+
+    def remove(self, code_id: str) -> None:
+        for reference in self.references.pop(code_id, ()):
+            self._unpost(reference)
+
+    def items_of(self, kind: str, user_id: str) -> Dict[str, str]:
+        """item id -> code id of one kind of reference to a user"""
+        return self.postings[kind].get(user_id, {})
+
+    def codes_of(self, user_id: str) -> List[str]:
+        """Ids of the codes a user wrote"""
+        return list(self.items_of(AUTHORED, user_id))
+
+    def touched_codes(self, user_id: str) -> List[str]:
+        """Ids of the codes with a comment or like of a user, in no particular order"""
+        code_ids: Set[str] = set()
+        for kind in (COMMENTED, LIKED, LIKED_COMMENTS):
+            code_ids.update(self.items_of(kind, user_id).values())
+        return list(code_ids)
+
+
+# Global user content index
+user_content_index = UserContentIndex()
@@ -0,0 +1,272 @@
+"""N-gram inverted index for user search"""
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple, Any, Optional, Iterable
+
+
+NGRAM_SIZE = 3
+# Boundary markers so values shorter than NGRAM_SIZE still produce grams
+VALUE_START = '\x02'
+VALUE_END = '\x03'
+# Postings up to this size are intersected eagerly, larger ones lazily
+INTERSECT_THRESHOLD = 50000
+
+
+def normalize_user_id(user_id: str) -> str:
+    """Normalize a numeric user ID to 12 digits with leading zeros"""
+    user_id = str(user_id or '').strip()
+    return user_id.zfill(12) if user_id.isdigit() else user_id
+
+
+def _ngrams(value: str) -> Set[str]:
+    """Padded trigrams of a value"""
+    padded = f'{VALUE_START}{value}{VALUE_END}'
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+class NgramIndex:
+    """Trigram inverted index from values to document keys.
+
+    Terms shorter than a trigram are answered through short_grams, which
+    maps every 1 and 2 character substring to the trigrams containing it,
+    so short queries never fall back to scanning documents.
+    """
+
+    def __init__(self):
+        # trigram -> Set[key]
+        self.postings: Dict[str, Set[str]] = {}
+        # 1-2 character term -> Set[trigram]
+        self.short_grams: Dict[str, Set[str]] = defaultdict(set)
+        # key -> indexed values
+        self.values: Dict[str, Tuple[str, ...]] = {}
+        # Sorted (value, key) pairs for exact and prefix matches
+        self.sorted_values: List[Tuple[str, str]] = []
+
+    def add(self, key: str, values: Iterable[str], keep_sorted: bool = True) -> None:
+        """Index the given values under a key.
+
+        Bulk loads pass keep_sorted=False and call sort() once at the end.
+        """
+        self.remove(key)
+        values = tuple(dict.fromkeys(v for v in values if v))
+        self.values[key] = values
+        for value in values:
+            for gram in _ngrams(value):
+                posting = self.postings.get(gram)
+                if posting is None:
+                    posting = self.postings[gram] = set()
+                    self._register_short_grams(gram)
+                posting.add(key)
+            if keep_sorted:
+                insort(self.sorted_values, (value, key))
+            else:
+                self.sorted_values.append((value, key))
+
+    def _register_short_grams(self, gram: str) -> None:
+        for size in range(1, NGRAM_SIZE):
+            for start in range(NGRAM_SIZE - size + 1):
+                term = gram[start:start + size]
+                if VALUE_START not in term and VALUE_END not in term:
+                    self.short_grams[term].add(gram)
+
+    def sort(self) -> None:
+        """Restore the sorted value list after a bulk load"""
+        self.sorted_values.sort()
+
+    def remove(self, key: str) -> None:
+        """Remove a key and all of its values from the index"""
+        values = self.values.pop(key, None)
+        if not values:
+            return
+        for value in values:
+            for gram in _ngrams(value):
+                posting = self.postings.get(gram)
+                if posting is not None:
+                    posting.discard(key)
+            position = bisect_left(self.sorted_values, (value, key))
+            if position < len(self.sorted_values) and self.sorted_values[position] == (value, key):
+                self.sorted_values.pop(position)
+
+    def clear(self) -> None:
+        """Remove everything from the index"""
+        self.postings.clear()
+        self.short_grams.clear()
+        self.values.clear()
+        self.sorted_values.clear()
+
+    def prefix_matches(self, term: str):
+        """Yield (key, is_exact) for values starting with term, exact matches first"""
+        position = bisect_left(self.sorted_values, (term, ''))
+        while position < len(self.sorted_values):
+            value, key = self.sorted_values[position]
+            if not value.startswith(term):
+                break
+            yield key, value == term
+            position += 1
+
+    def substring_matches(self, term: str):
+        """Yield keys having a value that contains term (a key may repeat)"""
+        if len(term) < NGRAM_SIZE:
+            # Every trigram containing the term is an exact hit
+            for gram in self.short_grams.get(term, ()):
+                yield from self.postings.get(gram, ())
+            return
+
+        postings = []
+        for gram in {term[i:i + NGRAM_SIZE] for i in range(len(term) - NGRAM_SIZE + 1)}:
+            posting = self.postings.get(gram)
+            if not posting:
+                return
+            postings.append(posting)
+        postings.sort(key=len)
+
+        if len(postings[0]) <= INTERSECT_THRESHOLD:
+            # Small candidate set, let the C set intersection do the work
+            candidates = postings[0].intersection(*postings[1:])
+        else:
+            # Huge postings only, walk lazily so callers can stop at their limit
+            candidates = (key for key in postings[0] if all(key in posting for posting in postings[1:]))
+
+        for key in candidates:
+            # Grams only narrow the candidates down, verify the real substring
+            if len(term) == NGRAM_SIZE or any(term in value for value in self.values.get(key, ())):
+                yield key
+
+
+class UserSearchIndex:
+    """Search index over username, email and id of every user.
+
+    Usernames and emails share one n-gram index, ids have their own so numeric
+    queries only match ids (the same split the linear search used to make).
+    Results are ranked exact matches first, then prefix matches, then any
+    substring match.
+    """
+
+    def __init__(self):
+        self.users: Dict[str, Dict[str, Any]] = {}
+        # normalized id -> user id, for lookups with or without leading zeros
+        self.normalized_ids: Dict[str, str] = {}
+        # exact username -> user id, the first user stored under it
+        self.usernames: Dict[str, str] = {}
+        # user id -> username it is listed under in usernames
+        self.listed_usernames: Dict[str, str] = {}
+        self.text_index = NgramIndex()
+        self.id_index = NgramIndex()
+
+    def rebuild(self, users: Iterable[Dict[str, Any]]) -> None:
+        """Rebuild the index from scratch"""
+        self.users.clear()
+        self.normalized_ids.clear()
+        self.usernames.clear()
+        self.listed_usernames.clear()
+        self.text_index.clear()
+        self.id_index.clear()
+        for user in users:
+            self.add(user, keep_sorted=False)
+        self.text_index.sort()
+        self.id_index.sort()
+
+    def add(self, user: Dict[str, Any], keep_sorted: bool = True) -> None:
+        """Add or re-index a user"""
+        user_id = str(user.get('id', ''))
+        if not user_id:
+            return
+        self.users[user_id] = user
+        self.normalized_ids.setdefault(normalize_user_id(user_id), user_id)
+        self._unlist_username(user_id)
+        if user.get('username'):
+            self.listed_usernames[user_id] = user['username']
+            self.usernames.setdefault(user['username'], user_id)
+        self.text_index.add(user_id, (
+            (user.get('username') or '').strip().lower(),
+            (user.get('email') or '').strip().lower(),
+        ), keep_sorted=keep_sorted)
+        self.id_index.add(user_id, (normalize_user_id(user_id), user_id), keep_sorted=keep_sorted)
+
+    def update(self, user: Dict[str, Any]) -> None:
+        """Re-index a user after its username or email changed"""
+        self.add(user)
+
+    def remove(self, user_id: str) -> None:
+        """Remove a user from the index"""
+        user_id = str(user_id)
+        self.users.pop(user_id, None)
+        normalized_id = normalize_user_id(user_id)
+        if self.normalized_ids.get(normalized_id) == user_id:
+            del self.normalized_ids[normalized_id]
+        self._unlist_username(user_id)
+        self.text_index.remove(user_id)
+        self.id_index.remove(user_id)
+
+    def _unlist_username(self, user_id: str) -> None:
+        username = self.listed_usernames.pop(user_id, None)
+        if username is not None and self.usernames.get(username) == user_id:
+            del self.usernames[username]
+
+    def get_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        """Get an indexed user by exact username"""
+        return self.users.get(self.usernames.get(username or '', ''))
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get an indexed user by ID, with or without leading zeros"""
+        user_id = str(user_id or '').strip()
+        user = self.users.get(user_id)
+        if user is None:
+            user = self.users.get(self.normalized_ids.get(normalize_user_id(user_id), ''))
+        return user
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return users matching query, best matches first"""
+        search_term = (query or '').strip()
+        if not search_term:
+            return []
+
+        if search_term.isdigit():
+            # A zero-padded ID can only match exactly, partial ID matches use the
+            # raw digits, and a full-length ID has nothing left to match partially
+            index = self.id_index
+            normalized_id = normalize_user_id(search_term)
+            terms = [normalized_id, search_term]
+            substring_terms = [search_term] if len(search_term) < len(normalized_id) else []
+        else:
+            index = self.text_index
+            terms = substring_terms = [search_term.lower()]
+
+        exact: List[str] = []
+        prefix: List[str] = []
+        seen: Set[str] = set()
+
+        # Exact and prefix matches come from the sorted value list, where the
+        # exact value always sorts first within its prefix range
+        for term in terms:
+            for key, is_exact in index.prefix_matches(term):
+                if key in seen:
+                    continue
+                seen.add(key)
+                if is_exact:
+                    exact.append(key)
+                else:
+                    prefix.append(key)
+                    if limit is not None and len(prefix) >= limit:
+                        break
+        ranked = exact + prefix
+
+        # Substring matches fill whatever room is left
+        for term in substring_terms:
+            if limit is not None and len(ranked) >= limit:
+                break
+            for key in index.substring_matches(term):
+                if key in seen:
+                    continue
+                seen.add(key)
+                ranked.append(key)
+                if limit is not None and len(ranked) >= limit:
+                    break
+
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [self.users[key] for key in ranked if key in self.users]
+
+
+# Global user search index
+user_index = UserSearchIndex()
@@ -3,14 +3,23 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
 from datetime import datetime
 import uvicorn
 import os
 
 # Import database and config
 from database import load_data, codes
-from config import FIRESTORE_SYNC_AVAILABLE, FIRESTORE_INIT
+from config import FIRESTORE_SYNC_AVAILABLE, FIRESTORE_INIT, BLOB_GC_INTERVAL_MINUTES
+from indexes import rebuild_indexes, save_indexes
+from services.avatar_service import AvatarService
+from services.media_pipeline import media_pipeline
+from services.upload_service import UploadService
+from services.blob_store import blob_store
+from services.account_deletion import AccountDeletionService
+from services.job_runner import job_runner
+from utils.serialization import FastJSONResponse
+from utils.compression import CompressionMiddleware
+from utils.response_cache import response_cache
 
 # Import routes
 from routes import api_router
@@ -26,6 +35,44 @@ async def lifespan(app: FastAPI):
     load_data()
     print(f"Loaded {len(codes)} codes from file")
     
+    # Move avatars still stored inline as data URIs out to files
+    from database import users
+    migrated_avatars = AvatarService.migrate_inline_avatars(users)
+    if migrated_avatars:
+        save_users()
+        print(f"Migrated {migrated_avatars} inline avatars to files")
+    
+    # Give codes and comments stored with only a username their author's id
+    from services.code_service import CodeService
+    linked_authors = CodeService.link_author_ids(users)
+    if linked_authors:
+        save_codes()
+        print(f"Linked {linked_authors} codes and comments to their authors")
+    
+    # Keep only pending friend requests in the hot set
+    from services.friend_service import FriendService
+    archived_requests = FriendService.archive_processed_requests()
+    if archived_requests:
+        print(f"Archived {archived_requests} processed friend requests")
+    rebuild_indexes()
+    
+    # Refill the activity feeds, which are only kept in memory
+    from services.activity_feed import activity_feed
+    activity_feed.backfill(codes)
+    
+    # Count which stored attachment blobs are still referenced
+    from database import messages
+    blob_store.load(messages)
+    
+    # Finish account deletions a previous run was interrupted in
+    resumed_deletions = AccountDeletionService.resume_pending()
+    if resumed_deletions:
+        print(f"Resumed {resumed_deletions} account deletions")
+    
+    # Start the thumbnail workers and render whatever is still missing
+    media_pipeline.start()
+    media_pipeline.backfill(users, messages)
+    
     # Initialize Firestore if available
     if FIRESTORE_SYNC_AVAILABLE and FIRESTORE_INIT:
         try:
@@ -44,15 +91,32 @@ async def lifespan(app: FastAPI):
                 save_messages()
                 save_friend_requests()
                 save_passwords()
+                save_indexes()
+                UploadService.expire_sessions()
                 print("Auto-saved all data")
             except Exception as e:
                 print(f"Error in auto-save: {e}")
     
+    # Remove attachment blobs no message references any more
+    async def collect_blobs():
+        while True:
+            await asyncio.sleep(BLOB_GC_INTERVAL_MINUTES * 60)
+            try:
+                removed = blob_store.collect()
+                if removed:
+                    print(f"Removed {removed} unreferenced attachment blobs")
+            except Exception as e:
+                print(f"Error collecting attachment blobs: {e}")
+    
     # Start auto-save task
     auto_save_task = asyncio.create_task(auto_save())
+    blob_gc_task = asyncio.create_task(collect_blobs())
     
     yield
     
+    # Stop background jobs, an unfinished account deletion resumes on next start
+    await job_runner.shutdown()
+    
     # Shutdown - save all data before closing
     try:
         save_codes()
@@ -61,16 +125,20 @@ async def lifespan(app: FastAPI):
         save_messages()
         save_friend_requests()
         save_passwords()
+        save_indexes()
         print("All data saved on shutdown")
     except Exception as e:
         print(f"Error saving data on shutdown: {e}")
     
-    # Cancel auto-save task
-    auto_save_task.cancel()
-    try:
-        await auto_save_task
-    except asyncio.CancelledError:
-        pass
+    # Cancel background tasks
+    for task in (auto_save_task, blob_gc_task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    
+    await media_pipeline.shutdown()
     
     # Shutdown (if needed)
     pass
@@ -80,7 +148,8 @@ async def lifespan(app: FastAPI):
 app = FastAPI(
     title="Kazakh Hub API",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # CORS middleware
@@ -90,8 +159,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count"],
 )
 
+# Negotiated gzip/br/zstd compression of text responses
+app.add_middleware(CompressionMiddleware)
+
 # Request logging middleware
 @app.middleware("http")
 async def log_requests(request, call_next):
@@ -127,28 +200,60 @@ async def api_root():
             "codes": {
                 "getAll": "GET /api/codes",
                 "getOne": "GET /api/codes/{id}",
+                "batch": "POST /api/codes/batch",
+                "archive": "GET /api/codes/{id}/archive",
                 "create": "POST /api/codes",
+                "bulk": "POST /api/codes/bulk",
                 "update": "PUT /api/codes/{id}",
+                "patch": "PATCH /api/codes/{id}",
+                "versions": "GET /api/codes/{id}/versions",
+                "version": "GET /api/codes/{id}/versions/{version}",
                 "delete": "DELETE /api/codes/{id}"
             },
             "users": {
                 "current": "GET /api/user",
-                "profile": "GET /api/users/{id}"
+                "profile": "GET /api/users/{id}",
+                "batch": "POST /api/users/batch",
+                "activity": "GET /api/users/{id}/activity",
+                "delete": "DELETE /api/user"
+            },
+            "feed": {
+                "get": "GET /api/feed/{user_id}?cursor={cursor}"
+            },
+            "jobs": {
+                "get": "GET /api/jobs/{job_id}"
             },
             "messages": {
                 "getAll": "GET /api/messages/{user_id}",
                 "getConversation": "GET /api/messages/{user_id}/{friend_id}",
                 "create": "POST /api/messages",
+                "upload": "POST /api/messages/upload",
+                "forward": "POST /api/messages/forward",
                 "markRead": "PUT /api/messages/{message_id}/read"
             },
             "friends": {
                 "getAll": "GET /api/friends/{user_id}",
                 "add": "POST /api/friends/{user_id}/add",
-                "remove": "DELETE /api/friends/{user_id}/remove/{friend_id}"
+                "remove": "DELETE /api/friends/{user_id}/remove/{friend_id}",
+                "suggestions": "GET /api/friends/{user_id}/suggestions",
+                "mutual": "GET /api/friends/{user_id}/mutual/{other_user_id}"
             },
             "chats": {
                 "getAll": "GET /api/chats/{user_id}"
             },
+            "avatars": {
+                "get": "GET /api/avatars/{user_id}"
+            },
+            "media": {
+                "get": "GET /api/uploads/{path}"
+            },
+            "uploads": {
+                "start": "POST /api/uploads/sessions",
+                "status": "GET /api/uploads/sessions/{upload_id}",
+                "append": "PUT /api/uploads/sessions/{upload_id}?offset={offset}",
+                "complete": "POST /api/uploads/sessions/{upload_id}/complete",
+                "cancel": "DELETE /api/uploads/sessions/{upload_id}"
+            },
             "websocket": {
                 "connect": "WS /api/ws/{user_id}"
             }
@@ -158,19 +263,16 @@ async def api_root():
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "ok", "message": "Kazakh Hub API is running"}
+    return {"status": "ok", "message": "Kazakh Hub API is running", "responseCache": response_cache.stats()}
 
 # Include API routes
 app.include_router(api_router)
 
-# Mount static files for uploads
-if os.path.exists("uploads"):
-    app.mount("/api/uploads", StaticFiles(directory="uploads"), name="uploads")
-
 # Include WebSocket endpoint directly (WebSocket doesn't work well with APIRouter)
 from fastapi import WebSocket, WebSocketDisconnect
 from database import messages, save_messages
 from websocket import manager
+from utils.versions import versions
 
 @app.websocket("/api/ws/{user_id}")
 async def websocket_endpoint(websocket: WebSocket, user_id: str):
@@ -190,6 +292,7 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
                     message = next((msg for msg in messages if msg['id'] == message_id), None)
                     if message and message.get('status') == 'sent':
                         message['status'] = 'delivered'
+                        versions.bump('messages', message.get('fromUserId'), message.get('toUserId'))
                         save_messages()
             elif message_type == 'typing':
                 # Forward typing indicator to recipient
@@ -4,19 +4,26 @@ from .user import (
     UserLogin,
     UserUpdate,
     ChangePassword,
-    DeleteUserRequest
+    DeleteUserRequest,
+    UserBatchRequest
 )
 from .code import (
     CodeCreate,
+    CodeBulkFolder,
+    CodeBulkImport,
     CodeUpdate,
+    CodePatch,
+    TextEdit,
     CommentCreate,
     CommentUpdate,
     LikeRequest,
     ViewRequest,
-    DeleteMultipleRequest
+    DeleteMultipleRequest,
+    CodeBatchRequest
 )
-from .message import MessageCreate
+from .message import MessageCreate, MessageForward
 from .friend import FriendRequestCreate
+from .upload import UploadSessionCreate, UploadSessionComplete
 
 __all__ = [
     "UserRegister",
@@ -24,14 +31,23 @@ __all__ = [
     "UserUpdate",
     "ChangePassword",
     "DeleteUserRequest",
+    "UserBatchRequest",
     "CodeCreate",
+    "CodeBulkFolder",
+    "CodeBulkImport",
     "CodeUpdate",
+    "CodePatch",
+    "TextEdit",
     "CommentCreate",
     "CommentUpdate",
     "LikeRequest",
     "ViewRequest",
     "DeleteMultipleRequest",
+    "CodeBatchRequest",
     "MessageCreate",
+    "MessageForward",
     "FriendRequestCreate",
+    "UploadSessionCreate",
+    "UploadSessionComplete",
 ]
 
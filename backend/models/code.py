@@ -8,6 +8,7 @@ class CodeCreate(BaseModel):
     content: str
     language: str
     author: str
+    authorId: Optional[str] = None  # Looked up by author when missing
     description: Optional[str] = None
     tags: Optional[List[str]] = []
     folderId: Optional[str] = None
@@ -16,16 +17,49 @@ class CodeCreate(BaseModel):
     folderStructure: Optional[Any] = None
 
 
+class CodeBulkFolder(BaseModel):
+    title: str
+    author: str
+    authorId: Optional[str] = None
+    content: str = ''  # Summary of the folder, generated when empty
+    language: str = 'folder'
+    description: Optional[str] = None
+    tags: Optional[List[str]] = ['folder']
+    folderStructure: Optional[Any] = None  # Built from the files when missing
+
+
+class CodeBulkImport(BaseModel):
+    folder: Optional[CodeBulkFolder] = None  # Files are created inside it when given
+    files: List[CodeCreate]
+
+
 class CodeUpdate(BaseModel):
     title: Optional[str] = None
     content: Optional[str] = None
     language: Optional[str] = None
     description: Optional[str] = None
     tags: Optional[List[str]] = None
+    baseVersion: Optional[int] = None  # Rejected with 409 if the code has moved on
+
+
+class TextEdit(BaseModel):
+    start: int  # Character offsets into the base version's content, end exclusive
+    end: int
+    text: str = ''
+
+
+class CodePatch(BaseModel):
+    baseVersion: int
+    edits: List[TextEdit] = []  # Sorted, non-overlapping
+    title: Optional[str] = None
+    language: Optional[str] = None
+    description: Optional[str] = None
+    tags: Optional[List[str]] = None
 
 
 class CommentCreate(BaseModel):
     author: str
+    authorId: Optional[str] = None  # Looked up by author when missing
     content: str
     parentId: Optional[str] = None
 
@@ -45,3 +79,7 @@ class ViewRequest(BaseModel):
 class DeleteMultipleRequest(BaseModel):
     ids: List[str]
 
+
+class CodeBatchRequest(BaseModel):
+    ids: List[str]
+
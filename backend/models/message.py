@@ -11,3 +11,14 @@ class MessageCreate(BaseModel):
     attachments: Optional[List[Dict[str, Any]]] = None  # List of attachment objects
     metadata: Optional[Dict[str, Any]] = None  # Additional metadata (location, sticker info, etc.)
 
+
+
+class MessageForward(BaseModel):
+    fromUserId: str
+    toUserId: str
+    sha256: str  # Content hash of an attachment the sender already has
+    filename: str
+    mimeType: Optional[str] = None
+    type: Optional[str] = "file"  # image, audio, video, file
+    content: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
@@ -0,0 +1,18 @@
+"""Upload-related Pydantic models"""
+from pydantic import BaseModel
+from typing import Optional, Dict, Any
+
+
+class UploadSessionCreate(BaseModel):
+    fromUserId: str
+    toUserId: str
+    filename: str
+    size: int  # Total file size in bytes
+    mimeType: Optional[str] = None
+    messageType: Optional[str] = "file"  # image, audio, video, file
+    content: Optional[str] = None  # Message text sent along with the file
+    metadata: Optional[Dict[str, Any]] = None
+
+
+class UploadSessionComplete(BaseModel):
+    sha256: Optional[str] = None  # Checksum of the whole file, verified if given
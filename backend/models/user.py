@@ -1,6 +1,6 @@
 """User-related Pydantic models"""
 from pydantic import BaseModel, field_validator
-from typing import Optional
+from typing import List, Optional
 from utils.validators import validate_email
 
 
@@ -69,3 +69,6 @@ class DeleteUserRequest(BaseModel):
             return validate_email(v)
         return v
 
+
+class UserBatchRequest(BaseModel):
+    ids: List[str]
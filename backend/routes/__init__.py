@@ -1,6 +1,6 @@
 """API routes"""
 from fastapi import APIRouter
-from . import auth, codes, users, messages, friends, chats
+from . import auth, codes, users, messages, friends, chats, avatars, uploads, media, jobs, feed
 
 # Create main router
 api_router = APIRouter(prefix="/api")
@@ -12,6 +12,12 @@ api_router.include_router(users.router, tags=["users"])
 api_router.include_router(messages.router, tags=["messages"])
 api_router.include_router(friends.router, tags=["friends"])
 api_router.include_router(chats.router, tags=["chats"])
+api_router.include_router(avatars.router, tags=["avatars"])
+api_router.include_router(uploads.router, tags=["uploads"])
+api_router.include_router(jobs.router, tags=["jobs"])
+api_router.include_router(feed.router, tags=["feed"])
+# After uploads, so upload session routes win over the catch-all file path
+api_router.include_router(media.router, tags=["media"])
 
 __all__ = ["api_router"]
 
@@ -0,0 +1,32 @@
+"""Avatar routes"""
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse
+from typing import Optional
+from services.user_service import UserService
+from services.avatar_service import AvatarService
+from utils.http_cache import IMMUTABLE_CACHE_CONTROL, is_not_modified, not_modified
+
+router = APIRouter()
+
+
+@router.get("/avatars/{user_id}")
+async def get_avatar(user_id: str, request: Request, v: Optional[str] = Query(None)):
+    """Get a user's avatar image"""
+    user = UserService.find_user_by_id(user_id)
+    avatar = AvatarService.get_avatar_file(user) if user else None
+    if not avatar:
+        raise HTTPException(status_code=404, detail="Avatar not found")
+    
+    etag = f'"{avatar["hash"]}"'
+    # Only the URL for the current version may be cached for good
+    cache_control = IMMUTABLE_CACHE_CONTROL if v == avatar['hash'] else "no-cache"
+    if is_not_modified(request, etag):
+        response = not_modified(etag)
+        response.headers['Cache-Control'] = cache_control
+        return response
+    
+    return FileResponse(
+        avatar['path'],
+        media_type=avatar['mimeType'],
+        headers={'ETag': etag, 'Cache-Control': cache_control}
+    )
@@ -1,12 +1,35 @@
 """Chat routes"""
-from fastapi import APIRouter
-from services.chat_service import ChatService
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import Optional
+from services.chat_service import ChatService, CHAT_PROJECTION_FIELDS
+from utils.versions import versions
+from utils.http_cache import make_etag, is_not_modified, not_modified
+from utils.projection import ProjectedJSONResponse, parse_fields
+from utils.response_cache import response_cache
 
 router = APIRouter()
 
 
 @router.get("/chats/{user_id}")
-async def get_chats(user_id: str):
+async def get_chats(user_id: str, request: Request, fields: Optional[str] = Query(None)):
     """Get list of all chats (conversations) for a user"""
-    return ChatService.get_chats(user_id)
+    try:
+        field_names = parse_fields(fields, CHAT_PROJECTION_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Chats depend on the user's messages and friends, and on partner profiles
+    etag = make_etag(
+        'chats', user_id,
+        versions.record_version('messages', user_id),
+        versions.record_version('friends', user_id),
+        versions.collection_version('users'),
+        field_names
+    )
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    return response_cache.fetch(
+        ('chats', user_id, field_names),
+        [('messages', user_id), ('friends', user_id), ('users', None)],
+        lambda: ProjectedJSONResponse(ChatService.get_chats(user_id, fields=field_names), headers={'ETag': etag})
+    ).response()
 
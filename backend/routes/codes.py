@@ -1,30 +1,142 @@
 """Code routes"""
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import Optional
-from models import CodeCreate, CodeUpdate, CommentCreate, CommentUpdate, LikeRequest, ViewRequest, DeleteMultipleRequest
-from services.code_service import CodeService
+from urllib.parse import quote
+from pydantic import ValidationError
+from models import (
+    CodeCreate, CodeUpdate, CodePatch, CommentCreate, CommentUpdate, LikeRequest, ViewRequest,
+    DeleteMultipleRequest, CodeBulkImport, CodeBatchRequest
+)
+from services.code_service import CodeService, CodeVersionConflictError, CODE_PROJECTION_FIELDS
+from services.code_import_service import CodeImportService, BulkImportTooLargeError
+from indexes import SORT_ORDERS
+from utils.versions import versions
+from utils.http_cache import make_etag, is_not_modified, not_modified
+from utils.response_cache import response_cache
+from utils.zip_stream import stream_zip
+from utils.projection import ProjectedJSONResponse, ProjectedNDJSONResponse, parse_fields, wants_ndjson
+from config import BATCH_LOOKUP_MAX_IDS
 
 router = APIRouter()
 
 
+def _parse_code_fields(fields: Optional[str]):
+    """fields= of code endpoints, stored or derived (likeCount, commentCount, hasContent)"""
+    try:
+        return parse_fields(fields, CODE_PROJECTION_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/codes")
 async def get_codes(
+    request: Request,
     folderId: Optional[str] = Query(None),
     limit: Optional[int] = Query(None, ge=1, le=1000),
     offset: Optional[int] = Query(0, ge=0),
-    includeContent: Optional[bool] = Query(False)
+    includeContent: Optional[bool] = Query(False),
+    tag: Optional[str] = Query(None),
+    language: Optional[str] = Query(None),
+    author: Optional[str] = Query(None),
+    sort: Optional[str] = Query(None, pattern=f"^({'|'.join(SORT_ORDERS)})$"),
+    fields: Optional[str] = Query(None),
+    stream: bool = Query(False)
 ):
-    """Get codes, optionally filtered by folder with pagination support"""
-    return CodeService.get_codes(folderId, limit=limit, offset=offset, include_content=includeContent)
+    """Get codes, optionally filtered by folder, tag, language and author, sorted and paginated.
+    
+    With ?stream=1 or Accept: application/x-ndjson the codes are streamed
+    one per line and the total count is sent in X-Total-Count.
+    """
+    field_names = _parse_code_fields(fields)
+    streamed = wants_ndjson(request, stream)
+    etag = make_etag(
+        'codes', versions.collection_version('codes'),
+        folderId, limit, offset, includeContent, tag, language, author, sort, field_names, streamed
+    )
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    
+    def list_codes():
+        return CodeService.get_codes(
+            folderId,
+            limit=limit,
+            offset=offset,
+            include_content=includeContent,
+            tag=tag,
+            language=language,
+            author=author,
+            sort=sort,
+            fields=field_names
+        )
+    
+    if streamed:
+        result = list_codes()
+        return ProjectedNDJSONResponse(result['codes'], headers={'ETag': etag, 'X-Total-Count': str(result['total'])})
+    return response_cache.fetch(
+        ('codes', folderId, limit, offset, includeContent, tag, language, author, sort, field_names),
+        [('codes', None)],
+        lambda: ProjectedJSONResponse(list_codes(), headers={'ETag': etag})
+    ).response()
+
+
+@router.get("/codes/facets")
+async def get_code_facets():
+    """Get code counts per tag and language"""
+    return CodeService.get_facets()
+
+
+@router.get("/codes/search")
+async def search_codes(
+    q: str = Query(..., min_length=1),
+    language: Optional[str] = Query(None),
+    tag: Optional[str] = Query(None),
+    author: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    fields: Optional[str] = Query(None)
+):
+    """Search codes by title, description, tags and content"""
+    field_names = _parse_code_fields(fields)
+    return ProjectedJSONResponse(CodeService.search_codes(
+        q, limit=limit, offset=offset, language=language, tag=tag, author=author, fields=field_names
+    ))
+
+
+@router.post("/codes/batch")
+async def get_codes_batch(request: CodeBatchRequest, fields: Optional[str] = Query(None)):
+    """Get many codes by ID in one request, in request order with null for unknown IDs"""
+    field_names = _parse_code_fields(fields)
+    if len(request.ids) > BATCH_LOOKUP_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_LOOKUP_MAX_IDS} IDs per request")
+    return ProjectedJSONResponse(CodeService.get_codes_by_ids(request.ids, fields=field_names))
 
 
 @router.get("/codes/{code_id}")
-async def get_code(code_id: str):
+async def get_code(code_id: str, request: Request, fields: Optional[str] = Query(None)):
     """Get a code by ID"""
+    field_names = _parse_code_fields(fields)
+    etag = make_etag('code', code_id, versions.record_version('codes', code_id), field_names)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
     code = CodeService.find_code_by_id(code_id)
     if not code:
         raise HTTPException(status_code=404, detail="Code file not found")
-    return code
+    return ProjectedJSONResponse(CodeService.project_code(code, field_names), headers={'ETag': etag})
+
+
+@router.get("/codes/{code_id}/archive")
+async def download_folder_archive(code_id: str):
+    """Download a folder and its files as a zip, streamed as it is built"""
+    folder = CodeService.find_code_by_id(code_id)
+    if not folder or not folder.get('isFolder'):
+        raise HTTPException(status_code=404, detail="Folder not found")
+    
+    entries = CodeService.folder_archive_entries(folder)
+    # Plain ASCII name for old clients, the real (often Kazakh) one in filename*
+    ascii_title = folder['title'].encode('ascii', 'ignore').decode().replace('"', '').strip() or 'folder'
+    disposition = f"attachment; filename=\"{ascii_title}.zip\"; filename*=UTF-8''{quote(folder['title'] + '.zip')}"
+    return StreamingResponse(stream_zip(entries), media_type='application/zip', headers={'Content-Disposition': disposition})
 
 
 @router.post("/codes")
@@ -32,7 +144,7 @@ async def create_code(code_data: CodeCreate):
     """Create a new code"""
     try:
         code_dict = code_data.model_dump()
-        return CodeService.create_code(code_dict)
+        return await CodeService.create_code(code_dict)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -40,12 +152,53 @@ async def create_code(code_data: CodeCreate):
         raise HTTPException(status_code=500, detail="Қате орын алды! Сервер қатесі.")
 
 
+def _version_conflict(e: CodeVersionConflictError) -> JSONResponse:
+    """409 telling the client which version to rebase on"""
+    return JSONResponse(status_code=409, content={'detail': str(e), 'version': e.current_version})
+
+
 @router.put("/codes/{code_id}")
 async def update_code(code_id: str, code_data: CodeUpdate):
     """Update a code"""
     try:
         code_dict = {k: v for k, v in code_data.model_dump().items() if v is not None}
-        return CodeService.update_code(code_id, code_dict)
+        base_version = code_dict.pop('baseVersion', None)
+        return CodeService.update_code(code_id, code_dict, base_version)
+    except CodeVersionConflictError as e:
+        return _version_conflict(e)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.patch("/codes/{code_id}")
+async def patch_code(code_id: str, patch: CodePatch):
+    """Update a code with range edits against baseVersion instead of the whole content"""
+    if not CodeService.find_code_by_id(code_id):
+        raise HTTPException(status_code=404, detail="Code file not found")
+    try:
+        code_dict = {k: v for k, v in patch.model_dump(exclude={'baseVersion', 'edits'}).items() if v is not None}
+        edits = [edit.model_dump() for edit in patch.edits]
+        return CodeService.patch_code(code_id, patch.baseVersion, edits, code_dict)
+    except CodeVersionConflictError as e:
+        return _version_conflict(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/codes/{code_id}/versions")
+async def list_code_versions(code_id: str):
+    """List the versions of a code, newest first"""
+    try:
+        return CodeService.list_versions(code_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/codes/{code_id}/versions/{version}")
+async def get_code_version(code_id: str, version: int):
+    """Get a code as it was at an earlier version"""
+    try:
+        return CodeService.get_version(code_id, version)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
@@ -55,8 +208,7 @@ async def delete_code(code_id: str):
     """Delete a code"""
     try:
         CodeService.delete_code(code_id)
-        from fastapi.responses import JSONResponse
-        return JSONResponse(status_code=204)
+        return Response(status_code=204)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
@@ -71,6 +223,48 @@ async def delete_multiple_codes(request: DeleteMultipleRequest):
     return {"message": f"{deleted_count} код(тар) жойылды", "deletedCount": deleted_count}
 
 
+ZIP_CONTENT_TYPES = ('application/zip', 'application/x-zip-compressed')
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-seq')
+
+
+@router.post("/codes/bulk")
+async def bulk_import_codes(
+    request: Request,
+    author: Optional[str] = Query(None),
+    title: Optional[str] = Query(None),
+    description: Optional[str] = Query(None)
+):
+    """Import a folder with its files, or many files, in one commit.
+    
+    The body is JSON ({"folder": ..., "files": [...]}), NDJSON with one code
+    per line (a first line with isFolder starts the folder), or a zip
+    archive of a folder (author and optional title/description as query
+    parameters). Returns a result per file.
+    """
+    content_type = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    try:
+        if content_type in ZIP_CONTENT_TYPES:
+            if not author:
+                raise HTTPException(status_code=400, detail="author is required for zip imports")
+            return await CodeImportService.import_zip(request.stream(), author, title, description)
+        if content_type in NDJSON_CONTENT_TYPES:
+            return await CodeImportService.import_ndjson(request.stream(), author)
+        
+        try:
+            bulk_data = CodeBulkImport.model_validate(await request.json())
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False, include_input=False))
+        except ValueError:
+            raise HTTPException(status_code=422, detail="Invalid JSON body")
+        return await CodeImportService.import_json(bulk_data.folder, bulk_data.files)
+    except HTTPException:
+        raise
+    except BulkImportTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.post("/codes/{code_id}/like")
 async def like_code(code_id: str, request: LikeRequest):
     """Like a code"""
@@ -102,7 +296,9 @@ async def view_code(code_id: str, request: ViewRequest):
 async def add_comment(code_id: str, comment_data: CommentCreate):
     """Add a comment to a code"""
     try:
-        return CodeService.add_comment(code_id, comment_data.author, comment_data.content, comment_data.parentId)
+        return CodeService.add_comment(
+            code_id, comment_data.author, comment_data.content, comment_data.parentId, comment_data.authorId
+        )
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
@@ -0,0 +1,19 @@
+"""Activity feed routes"""
+from fastapi import APIRouter, Query
+from typing import Optional
+from services.activity_feed import activity_feed
+
+router = APIRouter()
+
+
+@router.get("/feed/{user_id}")
+async def get_feed(
+    user_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[int] = Query(None, ge=1)
+):
+    """Get friends' new codes, comments and likes, newest first.
+    
+    Pass the returned nextCursor as cursor to get the next page.
+    """
+    return activity_feed.read(user_id, limit=limit, cursor=cursor)
@@ -1,16 +1,69 @@
 """Friend routes"""
-from fastapi import APIRouter, HTTPException, Body
-from typing import Dict
+from fastapi import APIRouter, HTTPException, Body, Query, Request
+from typing import Dict, Optional
 from models import FriendRequestCreate
 from services.friend_service import FriendService
+from services.user_service import USER_PROJECTION_FIELDS
+from utils.versions import versions
+from utils.http_cache import make_etag, is_not_modified, not_modified
+from utils.projection import ProjectedJSONResponse, parse_fields
+from utils.response_cache import response_cache
 
 router = APIRouter()
 
 
+def _parse_user_fields(fields: Optional[str]):
+    try:
+        return parse_fields(fields, USER_PROJECTION_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/friends/{user_id}")
-async def get_friends(user_id: str):
+async def get_friends(user_id: str, request: Request, fields: Optional[str] = Query(None)):
     """Get all friends for a user"""
-    return FriendService.get_friends(user_id)
+    field_names = _parse_user_fields(fields)
+    # The list embeds friend profiles, so any user change invalidates it too
+    etag = make_etag(
+        'friends', user_id,
+        versions.record_version('friends', user_id),
+        versions.collection_version('users'),
+        field_names
+    )
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    return response_cache.fetch(
+        ('friends', user_id, field_names),
+        [('friends', user_id), ('users', None)],
+        lambda: ProjectedJSONResponse(FriendService.get_friends(user_id, fields=field_names), headers={'ETag': etag})
+    ).response()
+
+
+@router.get("/friends/{user_id}/suggestions")
+async def get_friend_suggestions(
+    user_id: str,
+    request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = Query(None)
+):
+    """Suggest friends of friends, ranked by number of mutual friends"""
+    field_names = _parse_user_fields(fields)
+    # Any friendship can add or remove a path to the user
+    etag = make_etag(
+        'friendSuggestions', user_id, limit, field_names,
+        versions.collection_version('friends'),
+        versions.collection_version('users')
+    )
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    return ProjectedJSONResponse(FriendService.get_suggestions(user_id, limit, fields=field_names), headers={'ETag': etag})
+
+
+@router.get("/friends/{user_id}/mutual/{other_user_id}")
+async def get_mutual_friends(user_id: str, other_user_id: str, fields: Optional[str] = Query(None)):
+    """Get the friends two users have in common"""
+    field_names = _parse_user_fields(fields)
+    return ProjectedJSONResponse(FriendService.get_mutual_friends(user_id, other_user_id, fields=field_names))
 
 
 @router.post("/friends/{user_id}/add")
@@ -35,9 +88,21 @@ async def remove_friend(user_id: str, friend_id: str):
 
 
 @router.get("/friend-requests/{user_id}")
-async def get_friend_requests(user_id: str):
+async def get_friend_requests(user_id: str, request: Request):
     """Get all friend requests for a user"""
-    return FriendService.get_friend_requests(user_id)
+    # Requests embed the other user's profile
+    etag = make_etag(
+        'friendRequests', user_id,
+        versions.record_version('friendRequests', user_id),
+        versions.collection_version('users')
+    )
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    return response_cache.fetch(
+        ('friendRequests', user_id),
+        [('friendRequests', user_id), ('users', None)],
+        lambda: ProjectedJSONResponse(FriendService.get_friend_requests(user_id), headers={'ETag': etag})
+    ).response()
 
 
 @router.get("/friend-requests/incoming/{user_id}")
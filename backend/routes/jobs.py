@@ -0,0 +1,14 @@
+"""Background job routes"""
+from fastapi import APIRouter, HTTPException
+from services.job_runner import job_runner
+
+router = APIRouter()
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the status and progress of a background job"""
+    job = job_runner.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
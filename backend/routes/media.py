@@ -0,0 +1,76 @@
+"""Media routes serving uploaded files"""
+import os
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, Response
+from config import UPLOAD_DIR
+from utils.http_cache import IMMUTABLE_CACHE_CONTROL, is_not_modified
+from utils.media_response import MediaFileResponse
+
+router = APIRouter()
+
+# Upload directories whose file names contain the content hash
+CONTENT_ADDRESSED_DIRS = ('blobs', 'avatars', 'thumbnails')
+
+# Types browsers may render inline, anything else is served as a download so
+# uploaded HTML or SVG never runs as a page of this origin
+INLINE_TYPE_PREFIXES = ('image/', 'audio/', 'video/')
+DOWNLOAD_TYPES = ('image/svg+xml',)
+
+
+def _resolve(file_path: str) -> Optional[str]:
+    """Path of an upload inside UPLOAD_DIR, None for anything outside or hidden"""
+    parts = file_path.replace('\\', '/').split('/')
+    if not parts or any(not part or part.startswith('.') for part in parts):
+        return None
+    root = os.path.realpath(UPLOAD_DIR)
+    path = os.path.realpath(os.path.join(root, *parts))
+    if os.path.commonpath([root, path]) != root:
+        return None
+    return path
+
+
+def _not_modified_since(request: Request, stat_result: os.stat_result) -> bool:
+    if_modified_since = request.headers.get('if-modified-since')
+    if not if_modified_since or request.headers.get('if-none-match'):
+        return False
+    try:
+        return int(stat_result.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+@router.api_route("/uploads/{file_path:path}", methods=["GET", "HEAD"])
+async def get_upload(file_path: str, request: Request):
+    """Serve an uploaded file with byte ranges and cache validators"""
+    path = _resolve(file_path)
+    try:
+        stat_result = os.stat(path) if path else None
+    except OSError:
+        stat_result = None
+    if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    if file_path.split('/', 1)[0] in CONTENT_ADDRESSED_DIRS:
+        # The name is derived from the content hash, so it is the validator
+        etag = f'"{os.path.splitext(os.path.basename(path))[0]}"'
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        etag = f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+        cache_control = "public, no-cache"
+
+    headers = {
+        'ETag': etag,
+        'Last-Modified': formatdate(stat_result.st_mtime, usegmt=True),
+        'Cache-Control': cache_control,
+        'X-Content-Type-Options': 'nosniff',
+    }
+    if is_not_modified(request, etag) or _not_modified_since(request, stat_result):
+        return Response(status_code=304, headers=headers)
+
+    media_type = guess_type(path)[0] or 'application/octet-stream'
+    if not media_type.startswith(INLINE_TYPE_PREFIXES) or media_type in DOWNLOAD_TYPES:
+        headers['Content-Disposition'] = 'attachment'
+    return MediaFileResponse(path, media_type=media_type, headers=headers, stat_result=stat_result)
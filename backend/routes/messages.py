@@ -1,34 +1,49 @@
 """Message routes"""
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Request
 from typing import Optional, List
 import json
-from models import MessageCreate
-from services.message_service import MessageService
+from models import MessageCreate, MessageForward
+from services.message_service import MessageService, MESSAGE_PROJECTION_FIELDS
 from services.friend_service import FriendService
+from services.media_pipeline import media_pipeline
+from services.upload_service import UploadService, UploadTooLargeError
+from services.blob_store import blob_store
 import os
-from datetime import datetime
+from config import UPLOAD_DIR
+from utils.projection import ProjectedJSONResponse, ProjectedNDJSONResponse, parse_fields, wants_ndjson
 
 router = APIRouter()
 
 # Create uploads directory if it doesn't exist
-UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(f"{UPLOAD_DIR}/images", exist_ok=True)
-os.makedirs(f"{UPLOAD_DIR}/audio", exist_ok=True)
-os.makedirs(f"{UPLOAD_DIR}/video", exist_ok=True)
-os.makedirs(f"{UPLOAD_DIR}/files", exist_ok=True)
+
+
+def _parse_message_fields(fields: Optional[str]):
+    try:
+        return parse_fields(fields, MESSAGE_PROJECTION_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/messages/{user_id}")
-async def get_messages(user_id: str):
-    """Get all messages for a user"""
-    return MessageService.get_user_messages(user_id)
+async def get_messages(
+    user_id: str,
+    request: Request,
+    fields: Optional[str] = Query(None),
+    stream: bool = Query(False)
+):
+    """Get all messages for a user, streamed one per line with ?stream=1 or Accept: application/x-ndjson"""
+    field_names = _parse_message_fields(fields)
+    if wants_ndjson(request, stream):
+        return ProjectedNDJSONResponse(MessageService.iter_user_messages(user_id, fields=field_names))
+    return ProjectedJSONResponse(MessageService.get_user_messages(user_id, fields=field_names))
 
 
 @router.get("/messages/{user_id}/{friend_id}")
-async def get_conversation(user_id: str, friend_id: str):
+async def get_conversation(user_id: str, friend_id: str, fields: Optional[str] = Query(None)):
     """Get conversation between two users"""
-    return MessageService.get_conversation(user_id, friend_id)
+    field_names = _parse_message_fields(fields)
+    return ProjectedJSONResponse(MessageService.get_conversation(user_id, friend_id, fields=field_names))
 
 
 @router.post("/messages")
@@ -73,38 +88,8 @@ async def upload_file(
         if not are_friends:
             raise HTTPException(status_code=403, detail="You can only message friends")
         
-        # Determine upload directory based on message type
-        upload_subdir = {
-            "image": "images",
-            "audio": "audio",
-            "video": "video",
-            "file": "files"
-        }.get(messageType, "files")
-        
-        upload_path = f"{UPLOAD_DIR}/{upload_subdir}"
-        os.makedirs(upload_path, exist_ok=True)
-        
-        # Generate unique filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_extension = os.path.splitext(file.filename)[1] if file.filename else ""
-        unique_filename = f"{timestamp}_{file.filename}"
-        file_path = os.path.join(upload_path, unique_filename)
-        
-        # Save file
-        with open(file_path, "wb") as buffer:
-            content_bytes = await file.read()
-            buffer.write(content_bytes)
-        
-        # Get file size
-        file_size = len(content_bytes)
-        
-        # Create attachment object
-        attachment = {
-            "filename": file.filename,
-            "url": f"/api/uploads/{upload_subdir}/{unique_filename}",
-            "size": file_size,
-            "mimeType": file.content_type or "application/octet-stream"
-        }
+        # Stream the file to disk, never holding it in memory
+        attachment = await UploadService.save_upload(file)
         
         # Parse metadata if provided
         metadata_dict = {}
@@ -125,11 +110,49 @@ async def upload_file(
             metadata=metadata_dict
         )
         
+        # Thumbnails are rendered in the background and pushed once ready
+        media_pipeline.schedule_attachment(message, message['attachments'][0])
+        
         return message
+    except HTTPException:
+        raise
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
 
 
+@router.post("/messages/forward")
+async def forward_attachment(forward_data: MessageForward):
+    """Send a file the sender already has by its content hash, without uploading it again"""
+    if not FriendService.are_friends(forward_data.fromUserId, forward_data.toUserId):
+        raise HTTPException(status_code=403, detail="You can only message friends")
+    
+    content_hash = (forward_data.sha256 or '').lower()
+    path = blob_store.find(content_hash, forward_data.fromUserId) if blob_store.is_hash(content_hash) else None
+    if not path:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    
+    attachment = {
+        "filename": os.path.basename(forward_data.filename.replace('\\', '/')) or 'file',
+        "url": blob_store.url(path),
+        "size": os.path.getsize(path),
+        "mimeType": forward_data.mimeType or "application/octet-stream",
+        "sha256": content_hash
+    }
+    message = await MessageService.create_message(
+        from_user_id=forward_data.fromUserId,
+        to_user_id=forward_data.toUserId,
+        content=forward_data.content or "",
+        are_friends=True,
+        message_type=forward_data.type or "file",
+        attachments=[attachment],
+        metadata=forward_data.metadata
+    )
+    media_pipeline.schedule_attachment(message, message['attachments'][0])
+    return message
+
+
 @router.put("/messages/{message_id}/read")
 async def mark_message_read(message_id: str):
     """Mark a message as read"""
@@ -0,0 +1,115 @@
+"""Resumable upload routes"""
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+from models import UploadSessionCreate, UploadSessionComplete
+from services.message_service import MessageService
+from services.friend_service import FriendService
+from services.media_pipeline import media_pipeline
+from services.upload_service import (
+    UploadService, UploadTooLargeError, UploadOffsetError, UploadSessionNotFoundError
+)
+
+router = APIRouter()
+
+
+def _upload_error(e: ValueError) -> HTTPException:
+    """Map upload service errors to HTTP errors"""
+    if isinstance(e, UploadSessionNotFoundError):
+        return HTTPException(status_code=404, detail=str(e))
+    if isinstance(e, UploadTooLargeError):
+        return HTTPException(status_code=413, detail=str(e))
+    return HTTPException(status_code=400, detail=str(e))
+
+
+def _offset_conflict(e: UploadOffsetError) -> JSONResponse:
+    """409 telling the client where to resume"""
+    return JSONResponse(
+        status_code=409,
+        content={'detail': str(e), 'offset': e.offset},
+        headers={'Upload-Offset': str(e.offset)}
+    )
+
+
+@router.post("/uploads/sessions")
+async def create_upload_session(session_data: UploadSessionCreate):
+    """Start a resumable upload"""
+    if not FriendService.are_friends(session_data.fromUserId, session_data.toUserId):
+        raise HTTPException(status_code=403, detail="You can only message friends")
+    try:
+        session = UploadService.create_session(
+            from_user_id=session_data.fromUserId,
+            to_user_id=session_data.toUserId,
+            filename=session_data.filename,
+            size=session_data.size,
+            mime_type=session_data.mimeType,
+            message_type=session_data.messageType or "file",
+            content=session_data.content,
+            metadata=session_data.metadata
+        )
+    except ValueError as e:
+        raise _upload_error(e)
+    return UploadService.session_status(session)
+
+
+@router.get("/uploads/sessions/{upload_id}")
+async def get_upload_session(upload_id: str):
+    """Get the status of a resumable upload, offset is where to continue"""
+    try:
+        session = UploadService.get_session(upload_id)
+    except ValueError as e:
+        raise _upload_error(e)
+    status = UploadService.session_status(session)
+    return JSONResponse(content=status, headers={'Upload-Offset': str(status['offset'])})
+
+
+@router.put("/uploads/sessions/{upload_id}")
+async def append_upload_chunk(upload_id: str, request: Request, offset: int = Query(..., ge=0)):
+    """Append the raw request body to a resumable upload at offset"""
+    try:
+        status = await UploadService.append_chunk(upload_id, offset, request.stream())
+    except UploadOffsetError as e:
+        return _offset_conflict(e)
+    except ValueError as e:
+        raise _upload_error(e)
+    return JSONResponse(content=status, headers={'Upload-Offset': str(status['offset'])})
+
+
+@router.post("/uploads/sessions/{upload_id}/complete")
+async def complete_upload_session(upload_id: str, complete_data: UploadSessionComplete = None):
+    """Finish a resumable upload and send it as a message"""
+    try:
+        session = UploadService.get_session(upload_id)
+        if not FriendService.are_friends(session['fromUserId'], session['toUserId']):
+            UploadService.abort_session(upload_id)
+            raise HTTPException(status_code=403, detail="You can only message friends")
+        session, attachment = await UploadService.complete_session(
+            upload_id, sha256=complete_data.sha256 if complete_data else None
+        )
+    except UploadOffsetError as e:
+        return _offset_conflict(e)
+    except ValueError as e:
+        raise _upload_error(e)
+
+    message = await MessageService.create_message(
+        from_user_id=session['fromUserId'],
+        to_user_id=session['toUserId'],
+        content=session.get('content') or "",
+        are_friends=True,
+        message_type=session['messageType'],
+        attachments=[attachment],
+        metadata=session.get('metadata') or {}
+    )
+    media_pipeline.schedule_attachment(message, message['attachments'][0])
+    return message
+
+
+@router.delete("/uploads/sessions/{upload_id}")
+async def abort_upload_session(upload_id: str):
+    """Cancel a resumable upload"""
+    try:
+        UploadService.abort_session(upload_id)
+    except UploadOffsetError as e:
+        return _offset_conflict(e)
+    except ValueError as e:
+        raise _upload_error(e)
+    return {'message': 'Upload cancelled'}
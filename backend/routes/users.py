@@ -1,29 +1,53 @@
 """User routes"""
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import Optional
-from models import UserUpdate, DeleteUserRequest
-from services.user_service import UserService
+from models import UserUpdate, DeleteUserRequest, UserBatchRequest
+from services.user_service import UserService, USER_PROJECTION_FIELDS
+from services.code_service import CodeService
+from services.blob_store import blob_store
+from services.code_history import code_history
+from services.friend_request_archive import friend_request_archive
+from services.account_deletion import AccountDeletionService
+from services.activity_feed import activity_feed
+from indexes import user_index, friend_request_index, friend_graph, message_index, clear_code_indexes
+from utils.versions import versions
+from utils.http_cache import make_etag, is_not_modified, not_modified
+from utils.projection import ProjectedJSONResponse, parse_fields
+from utils.serialization import FastJSONResponse
+from config import BATCH_LOOKUP_MAX_IDS
 from database import users, codes, friends, messages, friend_requests, passwords, save_users, save_codes, save_friends, save_messages, save_friend_requests, save_passwords
 
 router = APIRouter()
 
 
+def _parse_user_fields(fields: Optional[str]):
+    try:
+        return parse_fields(fields, USER_PROJECTION_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/user")
-async def get_current_user(email: Optional[str] = Query(None), user_id: Optional[str] = Query(None)):
+async def get_current_user(
+    email: Optional[str] = Query(None),
+    user_id: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None)
+):
     """Get current user by email or user_id. Returns 404 if not found."""
+    field_names = _parse_user_fields(fields)
     user = None
     
     # Try to find by user_id first (most specific)
     if user_id:
         user = UserService.find_user_by_id(user_id)
         if user:
-            return user
+            return ProjectedJSONResponse(UserService.project_user(user, field_names))
     
     # Try to find by email
     if email:
         user = UserService.find_user_by_email(email)
         if user:
-            return user
+            return ProjectedJSONResponse(UserService.project_user(user, field_names))
     
     # If both user_id and email were provided but user not found, return 404
     if user_id or email:
@@ -34,20 +58,47 @@ async def get_current_user(email: Optional[str] = Query(None), user_id: Optional
 
 
 @router.get("/users/search")
-async def search_users(query: Optional[str] = Query(None)):
+async def search_users(
+    query: Optional[str] = Query(None),
+    limit: Optional[int] = Query(50, ge=1, le=200),
+    fields: Optional[str] = Query(None)
+):
     """Search users by username or email"""
+    field_names = _parse_user_fields(fields)
     if not query:
         return []
-    return UserService.search_users(query)
+    return ProjectedJSONResponse(UserService.search_users(query, limit=limit, fields=field_names))
+
+
+@router.post("/users/batch")
+async def get_users_batch(request: UserBatchRequest, fields: Optional[str] = Query(None)):
+    """Get many users by ID in one request, in request order with null for unknown IDs"""
+    field_names = _parse_user_fields(fields)
+    if len(request.ids) > BATCH_LOOKUP_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_LOOKUP_MAX_IDS} IDs per request")
+    return ProjectedJSONResponse(UserService.get_users_by_ids(request.ids, fields=field_names))
 
 
 @router.get("/users/{user_id}")
-async def get_user(user_id: str):
+async def get_user(user_id: str, request: Request, fields: Optional[str] = Query(None)):
     """Get user by ID"""
+    field_names = _parse_user_fields(fields)
     user = UserService.find_user_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    etag = make_etag('user', user['id'], versions.record_version('users', user['id']), field_names)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    return ProjectedJSONResponse(UserService.project_user(user, field_names), headers={'ETag': etag})
+
+
+@router.get("/users/{user_id}/activity")
+async def get_user_activity(user_id: str, request: Request):
+    """Get the ids of the codes a user wrote and of the comments and likes they left"""
+    etag = make_etag('userActivity', user_id, versions.collection_version('codes'))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    return FastJSONResponse(CodeService.get_user_activity(user_id), headers={'ETag': etag})
 
 
 @router.put("/user")
@@ -69,52 +120,15 @@ async def update_user(user_data: UserUpdate):
         raise HTTPException(status_code=500, detail="Internal server error while updating profile")
 
 
-@router.delete("/user")
+@router.delete("/user", status_code=202)
 async def delete_user(request: DeleteUserRequest):
-    """Delete user account"""
+    """Delete user account, the user's data is removed by a background job"""
     try:
-        user_id_to_delete, username = UserService.delete_user(
+        job = AccountDeletionService.start(
             user_id=request.userId,
             email=request.email
         )
-        
-        # Delete user's codes
-        codes[:] = [code for code in codes if code.get('author') != username]
-        save_codes()
-        
-        # Delete user from friends lists
-        if user_id_to_delete in friends:
-            del friends[user_id_to_delete]
-        for friend_user_id in friends:
-            if friends[friend_user_id]:
-                friends[friend_user_id] = [id for id in friends[friend_user_id] if id != user_id_to_delete]
-        save_friends()
-        
-        # Delete user's messages
-        messages[:] = [msg for msg in messages if msg.get('fromUserId') != user_id_to_delete and msg.get('toUserId') != user_id_to_delete]
-        save_messages()
-        
-        # Delete friend requests involving this user
-        friend_requests[:] = [req for req in friend_requests if req.get('fromUserId') != user_id_to_delete and req.get('toUserId') != user_id_to_delete]
-        save_friend_requests()
-        
-        # Remove user from likes and comments in remaining codes
-        for code in codes:
-            if 'likes' in code:
-                code['likes'] = [id for id in code['likes'] if id != user_id_to_delete]
-            if 'comments' in code:
-                code['comments'] = [
-                    comment for comment in code['comments']
-                    if comment.get('author') != username
-                ]
-                for comment in code['comments']:
-                    if 'likes' in comment:
-                        comment['likes'] = [id for id in comment['likes'] if id != user_id_to_delete]
-                    if 'replies' in comment:
-                        comment['replies'] = [reply for reply in comment['replies'] if reply.get('author') != username]
-        save_codes()
-        
-        return {"message": "Account deleted successfully"}
+        return {"message": "Account deleted, removing its data", "jobId": job.id, "status": job.status}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -128,17 +142,30 @@ async def delete_all_accounts():
     try:
         users_count = len(users)
         users.clear()
+        user_index.rebuild(users)
         save_users()
         passwords.clear()
         save_passwords()
         codes.clear()
+        clear_code_indexes()
+        code_history.clear()
         save_codes()
         friends.clear()
+        friend_graph.clear()
+        activity_feed.clear()
         save_friends()
         messages.clear()
+        message_index.clear()
+        blob_store.recount(messages)
         save_messages()
         friend_requests.clear()
+        friend_request_index.clear()
+        friend_request_archive.clear()
         save_friend_requests()
+        AccountDeletionService.forget_pending()
+        
+        for collection in ('codes', 'friends', 'messages', 'friendRequests', 'users'):
+            versions.invalidate(collection)
         
         return {
             "message": f"Барлық аккаунттар жойылды",
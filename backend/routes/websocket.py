@@ -2,6 +2,7 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from database import messages, save_messages
 from websocket import manager
+from utils.versions import versions
 
 router = APIRouter()
 
@@ -24,6 +25,7 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
                     message = next((msg for msg in messages if msg['id'] == message_id), None)
                     if message and message.get('status') == 'sent':
                         message['status'] = 'delivered'
+                        versions.bump('messages', message.get('fromUserId'), message.get('toUserId'))
                         save_messages()
             elif message_type == 'typing':
                 # Forward typing indicator to recipient
@@ -4,6 +4,8 @@ from .code_service import CodeService
 from .message_service import MessageService
 from .friend_service import FriendService
 from .chat_service import ChatService
+from .avatar_service import AvatarService
+from .upload_service import UploadService
 
 __all__ = [
     "UserService",
@@ -11,5 +13,7 @@ __all__ = [
     "MessageService",
     "FriendService",
     "ChatService",
+    "AvatarService",
+    "UploadService",
 ]
 
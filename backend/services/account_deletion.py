@@ -0,0 +1,162 @@
+"""Account deletion, with the cascade over the user's data run as a background job"""
+import os
+from typing import Dict, Any, List, Optional
+from config import PENDING_DELETIONS_FILE
+from database import (
+    codes, friends, messages, friend_requests,
+    save_codes, save_friends, save_messages, save_friend_requests
+)
+from indexes import code_index, friend_graph, friend_request_index, message_index, user_content_index, unindex_code
+from services.activity_feed import activity_feed
+from services.blob_store import blob_store
+from services.code_history import code_history
+from services.friend_request_archive import friend_request_archive
+from services.job_runner import Job, job_runner
+from services.user_service import UserService
+from utils.serialization import read_json, write_json
+from utils.versions import versions
+
+JOB_TYPE = 'accountDeletion'
+
+
+def _load_pending() -> List[Dict[str, str]]:
+    try:
+        return read_json(PENDING_DELETIONS_FILE)
+    except FileNotFoundError:
+        return []
+    except Exception as e:
+        print(f'Error loading pending account deletions: {e}')
+        return []
+
+
+def _save_pending(pending: List[Dict[str, str]]) -> None:
+    if pending:
+        write_json(PENDING_DELETIONS_FILE, pending)
+    elif os.path.exists(PENDING_DELETIONS_FILE):
+        os.remove(PENDING_DELETIONS_FILE)
+
+
+class AccountDeletionService:
+    """Deletes an account at once and its data in the background.
+
+    The user and their password are removed inside the request. Everything
+    that refers to them (codes, friendships, messages, friend requests,
+    likes and comments) is removed by a job that finds the records through
+    the user content, friend and participant indexes, gives the event loop
+    a turn every few milliseconds and saves each data file once at the end.
+    Accepted deletions are written to pendingDeletions.json until their job
+    finishes, so a restart picks up an interrupted cascade again.
+    """
+
+    @staticmethod
+    def start(user_id: Optional[str] = None, email: Optional[str] = None) -> Job:
+        """Delete the user and queue the cascade, raises ValueError for an unknown user"""
+        user_id_to_delete, username = UserService.delete_user(user_id=user_id, email=email)
+        job = AccountDeletionService._submit(user_id_to_delete, username)
+        pending = _load_pending()
+        pending.append({'jobId': job.id, 'userId': user_id_to_delete, 'username': username})
+        _save_pending(pending)
+        return job
+
+    @staticmethod
+    def resume_pending() -> int:
+        """Queue again the cascades a previous process did not finish, return how many"""
+        pending = _load_pending()
+        for deletion in pending:
+            AccountDeletionService._submit(deletion['userId'], deletion['username'], deletion['jobId'])
+        return len(pending)
+
+    @staticmethod
+    def forget_pending() -> None:
+        """Drop pending cascades, when every account is deleted at once"""
+        _save_pending([])
+
+    @staticmethod
+    def _submit(user_id: str, username: str, job_id: Optional[str] = None) -> Job:
+        async def work(job: Job) -> Dict[str, int]:
+            return await AccountDeletionService._cascade(job, user_id, username)
+        return job_runner.submit(JOB_TYPE, work, job_id=job_id)
+
+    @staticmethod
+    def _remove_references(code: Dict[str, Any], user_id: str, username: str) -> None:
+        """Drop a deleted user's likes, comments and replies from a code"""
+        def written_by_user(comment: Dict[str, Any]) -> bool:
+            if 'authorId' in comment:
+                return comment['authorId'] == user_id
+            return comment.get('author') == username
+
+        if 'likes' in code:
+            code['likes'] = [id for id in code['likes'] if id != user_id]
+        if 'comments' in code:
+            code['comments'] = [comment for comment in code['comments'] if not written_by_user(comment)]
+            for comment in code['comments']:
+                if 'likes' in comment:
+                    comment['likes'] = [id for id in comment['likes'] if id != user_id]
+                if 'replies' in comment:
+                    comment['replies'] = [reply for reply in comment['replies'] if not written_by_user(reply)]
+
+    @staticmethod
+    async def _cascade(job: Job, user_id: str, username: str) -> Dict[str, int]:
+        """Remove everything that refers to a deleted user, return how many records of each kind"""
+        # Friendships first, so the user drops out of friend lists and chats
+        friend_ids = sorted(friend_graph.friends_of(user_id))
+        friend_graph.remove_user(user_id)
+        friends.pop(user_id, None)
+        activity_feed.drop_user(user_id)
+        async for friend_id in job.each('friends', friend_ids):
+            if friends.get(friend_id):
+                friends[friend_id] = [id for id in friends[friend_id] if id != user_id]
+
+        # The user's codes, and codes stored without an author id that carry their name
+        authored_ids = list(dict.fromkeys(user_content_index.codes_of(user_id) + [
+            code['id'] for code in code_index.filter(author=username, any_folder=True) if not code.get('authorId')
+        ]))
+        async for code_id in job.each('codes', authored_ids):
+            unindex_code(code_id)
+            code_history.drop(code_id)
+        if authored_ids:
+            removed = set(authored_ids)
+            codes[:] = [code for code in codes if code.get('id') not in removed]
+
+        # Messages sent or received
+        user_messages = message_index.messages_of(user_id)
+        async for message in job.each('messages', user_messages):
+            blob_store.release(message)
+            message_index.remove(message)
+        if user_messages:
+            removed = {message['id'] for message in user_messages}
+            messages[:] = [message for message in messages if message.get('id') not in removed]
+
+        # Pending friend requests, and the archived ones
+        user_requests = friend_request_index.incoming_requests(user_id) + friend_request_index.outgoing_requests(user_id)
+        async for request in job.each('friendRequests', user_requests):
+            friend_request_index.remove(request['id'])
+        if user_requests:
+            removed = {request['id'] for request in user_requests}
+            friend_requests[:] = [request for request in friend_requests if request.get('id') not in removed]
+        archived_requests = friend_request_archive.drop_user(user_id)
+
+        # Likes and comments on everyone else's codes
+        touched_codes = [code for code in map(code_index.get, user_content_index.touched_codes(user_id)) if code]
+        async for code in job.each('likesAndComments', touched_codes):
+            AccountDeletionService._remove_references(code, user_id, username)
+            user_content_index.update(code)
+
+        # One save per file
+        job.stage = 'saving'
+        save_friends()
+        save_codes()
+        save_messages()
+        save_friend_requests()
+
+        # The cascade touched records all over, invalidate them wholesale
+        for collection in ('codes', 'friends', 'messages', 'friendRequests', 'users'):
+            versions.invalidate(collection)
+
+        _save_pending([deletion for deletion in _load_pending() if deletion['jobId'] != job.id])
+        return {
+            'friends': len(friend_ids),
+            'codes': len(authored_ids),
+            'messages': len(user_messages),
+            'friendRequests': len(user_requests) + archived_requests
+        }
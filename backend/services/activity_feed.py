@@ -0,0 +1,186 @@
+"""Activity feed of what a user's friends publish"""
+import asyncio
+import heapq
+from collections import deque
+from datetime import datetime
+from itertools import count
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set
+from config import FEED_TIMELINE_SIZE, FEED_FANOUT_MAX_FOLLOWERS, FEED_BACKFILL_EVENTS
+from indexes import code_index, friend_graph, user_index
+from indexes.user_content_index import find_comment
+from websocket import manager
+
+# Kinds of feed item
+CODE_CREATED = 'code'
+COMMENT_ADDED = 'comment'
+CODE_LIKED = 'like'
+
+# Actor fields shown with each item
+FEED_ACTOR_FIELDS = ('id', 'username', 'avatar', 'avatarThumbnails')
+
+
+class ActivityFeed:
+    """Timelines of friends' new codes, comments and likes, newest first.
+
+    Fan-out on write: an event goes into the timeline of every friend of the
+    user who caused it, so reading a feed walks one bounded ring buffer.
+    Users with more than fanout_max_followers friends only write to their
+    own outbox, which their friends' reads merge in. Items hold ids and are
+    resolved when read, so deleted codes and comments, withdrawn likes and
+    former friends drop out. Only the latest like of a code by a user
+    resolves, so liking it again does not repeat it. A sequence number
+    orders the items and serves as the pagination cursor; it starts again on
+    every start, when the latest codes and comments are replayed.
+    """
+
+    def __init__(self, timeline_size: int = FEED_TIMELINE_SIZE,
+                 fanout_max_followers: int = FEED_FANOUT_MAX_FOLLOWERS):
+        self.timeline_size = timeline_size
+        self.fanout_max_followers = fanout_max_followers
+        self.timelines: Dict[str, Deque[Dict[str, Any]]] = {}
+        self.outboxes: Dict[str, Deque[Dict[str, Any]]] = {}
+        # actor_id -> {code_id: seq of their current like item}
+        self.likes: Dict[str, Dict[str, int]] = {}
+        self._sequence = count(1)
+        self.tasks: Set[asyncio.Task] = set()
+
+    def _buffer(self, buffers: Dict[str, Deque[Dict[str, Any]]], user_id: str) -> Deque[Dict[str, Any]]:
+        buffer = buffers.get(user_id)
+        if buffer is None:
+            buffer = buffers[user_id] = deque(maxlen=self.timeline_size)
+        return buffer
+
+    def publish(self, item_type: str, actor_id: Optional[str], code_id: str,
+                comment_id: Optional[str] = None, created_at: Optional[str] = None,
+                push: bool = True) -> None:
+        """Record an event in the feeds of the actor's friends and push it to those online"""
+        if not actor_id:
+            return
+        item = {
+            'seq': next(self._sequence),
+            'type': item_type,
+            'actorId': actor_id,
+            'codeId': code_id,
+            'commentId': comment_id,
+            'createdAt': created_at or datetime.now().isoformat()
+        }
+        if item_type == CODE_LIKED:
+            self.likes.setdefault(actor_id, {})[code_id] = item['seq']
+        followers = friend_graph.friends_of(actor_id)
+        if len(followers) > self.fanout_max_followers:
+            self._buffer(self.outboxes, actor_id).appendleft(item)
+        else:
+            for follower_id in followers:
+                self._buffer(self.timelines, follower_id).appendleft(item)
+        if push:
+            if len(manager.active_connections) < len(followers):
+                online = [user_id for user_id in manager.active_connections if user_id in followers]
+            else:
+                online = [follower_id for follower_id in followers if manager.is_user_online(follower_id)]
+            if online:
+                self._spawn(self._push(item, online))
+
+    def withdraw_like(self, actor_id: str, code_id: str) -> None:
+        """Drop a withdrawn like from the feeds it went into"""
+        likes = self.likes.get(actor_id)
+        if likes is not None:
+            likes.pop(code_id, None)
+            if not likes:
+                del self.likes[actor_id]
+
+    def _spawn(self, coroutine) -> None:
+        try:
+            task = asyncio.get_running_loop().create_task(coroutine)
+        except RuntimeError:
+            # Called outside the server, there is nobody to push to
+            coroutine.close()
+            return
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _push(self, item: Dict[str, Any], user_ids: List[str]) -> None:
+        resolved = self._resolve(item)
+        if resolved is None:
+            return
+        for user_id in user_ids:
+            await manager.send_personal_message({'type': 'feed_item', 'item': resolved}, user_id)
+
+    def _resolve(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """An item with its actor, code and comment, None once any of them is gone"""
+        actor = user_index.get(item['actorId'])
+        code = code_index.get(item['codeId'])
+        if actor is None or code is None:
+            return None
+        resolved = {
+            'seq': item['seq'],
+            'type': item['type'],
+            'createdAt': item['createdAt'],
+            'actor': {field: actor[field] for field in FEED_ACTOR_FIELDS if field in actor},
+            'code': {'id': code['id'], 'title': code.get('title'), 'language': code.get('language')}
+        }
+        if item['type'] == COMMENT_ADDED:
+            comment = find_comment(code, item['commentId'])
+            if comment is None:
+                return None
+            resolved['comment'] = {'id': comment['id'], 'content': comment.get('content')}
+        elif item['type'] == CODE_LIKED and (
+                self.likes.get(item['actorId'], {}).get(item['codeId']) != item['seq']
+                or item['actorId'] not in (code.get('likes') or [])):
+            return None
+        return resolved
+
+    def read(self, user_id: str, limit: int = 20, cursor: Optional[int] = None) -> Dict[str, Any]:
+        """A page of a user's feed, items older than cursor when given.
+
+        nextCursor is the cursor of the following page, None on the last one.
+        """
+        friend_ids = friend_graph.friends_of(user_id)
+        sources: List[Iterable[Dict[str, Any]]] = [self.timelines.get(user_id, ())]
+        sources.extend(outbox for actor_id, outbox in self.outboxes.items() if actor_id in friend_ids)
+
+        items = []
+        next_cursor = None
+        for item in heapq.merge(*sources, key=lambda item: -item['seq']):
+            if cursor is not None and item['seq'] >= cursor:
+                continue
+            if item['actorId'] not in friend_ids:
+                continue
+            resolved = self._resolve(item)
+            if resolved is None:
+                continue
+            if len(items) == limit:
+                next_cursor = items[-1]['seq']
+                break
+            items.append(resolved)
+        return {'items': items, 'nextCursor': next_cursor}
+
+    def backfill(self, codes: Iterable[Dict[str, Any]], max_events: int = FEED_BACKFILL_EVENTS) -> int:
+        """Replay the latest codes and comments into empty timelines, return how many"""
+        events = []
+        for code in codes:
+            # Files of a folder are announced by their folder
+            if code.get('authorId') and code.get('folderId') is None:
+                events.append((code.get('createdAt') or '', CODE_CREATED, code['authorId'], code['id'], None))
+            for comment in code.get('comments') or []:
+                if comment.get('authorId') and comment.get('id'):
+                    events.append((comment.get('createdAt') or '', COMMENT_ADDED, comment['authorId'],
+                                   code['id'], comment['id']))
+        latest = heapq.nlargest(max_events, events, key=lambda event: event[0])
+        for created_at, item_type, actor_id, code_id, comment_id in reversed(latest):
+            self.publish(item_type, actor_id, code_id, comment_id, created_at, push=False)
+        return len(latest)
+
+    def drop_user(self, user_id: str) -> None:
+        """Forget a deleted user's timeline and outbox, their items elsewhere stop resolving"""
+        self.timelines.pop(user_id, None)
+        self.outboxes.pop(user_id, None)
+        self.likes.pop(user_id, None)
+
+    def clear(self) -> None:
+        self.timelines.clear()
+        self.outboxes.clear()
+        self.likes.clear()
+
+
+# Global activity feed
+activity_feed = ActivityFeed()
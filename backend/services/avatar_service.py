@@ -0,0 +1,146 @@
+"""Avatar service for storing and locating avatar images"""
+import base64
+import binascii
+import glob
+import hashlib
+import os
+import re
+from typing import Optional, Dict, Any, List
+from urllib.parse import urlparse, parse_qs
+from config import AVATAR_DIR, AVATAR_THUMBNAIL_DIR, AVATAR_TYPES, MAX_AVATAR_SIZE
+
+_DATA_URI_RE = re.compile(r'^data:(image/[\w.+-]+);base64,(.*)$', re.DOTALL)
+
+# Prefix of avatar URLs stored in user records
+AVATAR_URL_PREFIX = '/api/avatars/'
+
+
+class AvatarService:
+    """Service for avatar files.
+
+    Avatars are stored as uploads/avatars/<userId>-<hash><ext> and user records
+    only carry /api/avatars/<userId>?v=<hash>, so the URL changes exactly when
+    the image does and can be cached indefinitely.
+    """
+    
+    @staticmethod
+    def avatar_url(user_id: str, content_hash: str) -> str:
+        """Versioned URL of a user's avatar"""
+        return f'{AVATAR_URL_PREFIX}{user_id}?v={content_hash}'
+    
+    @staticmethod
+    def is_avatar_url(value: Optional[str]) -> bool:
+        """Check whether a value is an avatar URL issued by this server"""
+        return isinstance(value, str) and value.startswith(AVATAR_URL_PREFIX)
+    
+    @staticmethod
+    def is_current_avatar(user: Dict[str, Any], value: Optional[str]) -> bool:
+        """Check whether value points at the user's current avatar (clients may send it back absolute)"""
+        if not isinstance(value, str) or not AvatarService.is_avatar_url(user.get('avatar')):
+            return False
+        parsed = urlparse(value)
+        return f'{parsed.path}?{parsed.query}' == user['avatar']
+    
+    @staticmethod
+    def _user_files(user_id: str, directory: str = AVATAR_DIR) -> List[str]:
+        return glob.glob(os.path.join(directory, f'{glob.escape(str(user_id))}-*'))
+    
+    @staticmethod
+    def _avatar_hash(avatar: Optional[str]) -> str:
+        if not AvatarService.is_avatar_url(avatar):
+            return ''
+        return parse_qs(urlparse(avatar).query).get('v', [''])[0]
+    
+    @staticmethod
+    def store_data_uri(user_id: str, data_uri: str) -> str:
+        """Decode a data:image URI to a file and return its versioned URL"""
+        match = _DATA_URI_RE.match(data_uri.strip())
+        if not match:
+            raise ValueError("Invalid avatar format")
+        
+        mime_type = match.group(1).lower()
+        extension = AVATAR_TYPES.get(mime_type)
+        if not extension:
+            raise ValueError(f"Unsupported avatar type: {mime_type}")
+        
+        try:
+            image_bytes = base64.b64decode(match.group(2))
+        except (binascii.Error, ValueError):
+            raise ValueError("Invalid avatar format")
+        if not image_bytes:
+            raise ValueError("Invalid avatar format")
+        if len(image_bytes) > MAX_AVATAR_SIZE:
+            raise ValueError(f"Avatar is too large. Maximum size: {MAX_AVATAR_SIZE // (1024 * 1024)}MB")
+        
+        content_hash = hashlib.sha256(image_bytes).hexdigest()[:16]
+        file_path = os.path.join(AVATAR_DIR, f'{user_id}-{content_hash}{extension}')
+        
+        os.makedirs(AVATAR_DIR, exist_ok=True)
+        if not os.path.exists(file_path):
+            tmp_path = f'{file_path}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(image_bytes)
+            os.replace(tmp_path, file_path)
+        
+        # Drop the previous avatar files of this user
+        for old_path in AvatarService._user_files(user_id):
+            if old_path != file_path:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+        
+        avatar_url = AvatarService.avatar_url(user_id, content_hash)
+        AvatarService.delete_thumbnails(user_id, keep=avatar_url)
+        return avatar_url
+    
+    @staticmethod
+    def delete_avatar(user_id: str) -> None:
+        """Remove all avatar files of a user"""
+        for path in AvatarService._user_files(user_id):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        AvatarService.delete_thumbnails(user_id)
+    
+    @staticmethod
+    def delete_thumbnails(user_id: str, keep: Optional[str] = None) -> None:
+        """Remove avatar thumbnails of a user, except those of the avatar URL keep"""
+        keep_hash = AvatarService._avatar_hash(keep)
+        keep_prefix = os.path.join(AVATAR_THUMBNAIL_DIR, f'{user_id}-{keep_hash}_') if keep_hash else None
+        for path in AvatarService._user_files(user_id, AVATAR_THUMBNAIL_DIR):
+            if keep_prefix and path.startswith(keep_prefix):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
+    @staticmethod
+    def get_avatar_file(user: Dict[str, Any]) -> Optional[Dict[str, str]]:
+        """Locate the current avatar file of a user"""
+        content_hash = AvatarService._avatar_hash(user.get('avatar'))
+        if not content_hash:
+            return None
+        
+        mime_types = {extension: mime_type for mime_type, extension in AVATAR_TYPES.items()}
+        for extension, mime_type in mime_types.items():
+            path = os.path.join(AVATAR_DIR, f"{user['id']}-{content_hash}{extension}")
+            if os.path.exists(path):
+                return {'path': path, 'hash': content_hash, 'mimeType': mime_type}
+        return None
+    
+    @staticmethod
+    def migrate_inline_avatars(users: List[Dict[str, Any]]) -> int:
+        """Move inline data:image avatars of loaded users to files, returns the number migrated"""
+        migrated = 0
+        for user in users:
+            avatar = user.get('avatar')
+            if isinstance(avatar, str) and avatar.startswith('data:image'):
+                try:
+                    user['avatar'] = AvatarService.store_data_uri(user['id'], avatar)
+                    migrated += 1
+                except Exception as e:
+                    print(f"Error migrating avatar of user {user.get('id')}: {e}")
+        return migrated
@@ -0,0 +1,159 @@
+"""Content-addressed storage for message attachments"""
+import glob
+import os
+import re
+import time
+from collections import Counter
+from typing import Dict, Any, Optional, Iterable, List
+from config import BLOB_DIR, UPLOAD_DIR, IMAGE_THUMBNAIL_DIR, BLOB_GC_GRACE_MINUTES
+
+_HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+# Longest file extension kept on blob names (used for the served content type)
+_MAX_EXTENSION = 16
+
+
+class BlobStore:
+    """Attachment files stored once per content hash.
+
+    A blob lives at <root>/<first two hex chars>/<sha256><ext> and is shared by
+    every message attachment with the same bytes. Reference counts and the
+    users that can see a blob are derived from messages on startup and kept
+    up to date as messages are created and deleted. Blobs nobody references
+    any more are removed by collect() once they have been unused for a grace
+    period, which also covers files stored for a message still being created.
+    """
+
+    def __init__(self, root: str = BLOB_DIR):
+        self.root = root
+        # sha256 -> blob path
+        self.blobs: Dict[str, str] = {}
+        # sha256 -> number of attachments referencing it
+        self.refs: Counter = Counter()
+        # sha256 -> {user_id: number of referencing messages}, who may forward it
+        self.owners: Dict[str, Counter] = {}
+        # sha256 -> time the blob became unreferenced
+        self.unreferenced_since: Dict[str, float] = {}
+
+    @staticmethod
+    def is_hash(value: Optional[str]) -> bool:
+        return isinstance(value, str) and bool(_HASH_RE.match(value))
+
+    @staticmethod
+    def url(path: str) -> str:
+        """Upload URL of a blob"""
+        return '/api/uploads/' + os.path.relpath(path, UPLOAD_DIR).replace(os.sep, '/')
+
+    def _path(self, content_hash: str, filename: Optional[str]) -> str:
+        extension = os.path.splitext(filename or '')[1].lower()
+        if len(extension) > _MAX_EXTENSION or not extension[1:].isalnum():
+            extension = ''
+        return os.path.join(self.root, content_hash[:2], f'{content_hash}{extension}')
+
+    def load(self, messages: Iterable[Dict[str, Any]]) -> None:
+        """Scan stored blobs and count their references in messages"""
+        self.blobs.clear()
+        for path in glob.glob(os.path.join(self.root, '??', '*')):
+            content_hash = os.path.splitext(os.path.basename(path))[0]
+            if self.is_hash(content_hash):
+                self.blobs[content_hash] = path
+        self.recount(messages)
+
+    def recount(self, messages: Iterable[Dict[str, Any]]) -> None:
+        """Recompute reference counts from scratch"""
+        self.refs.clear()
+        self.owners.clear()
+        for message in messages:
+            self.retain(message)
+        now = time.time()
+        self.unreferenced_since = {
+            content_hash: self.unreferenced_since.get(content_hash, now)
+            for content_hash in self.blobs if not self.refs[content_hash]
+        }
+
+    def store(self, tmp_path: str, content_hash: str, filename: Optional[str] = None) -> str:
+        """Move a finished upload into the store, dropping it if the blob already exists.
+
+        Returns the blob path.
+        """
+        path = self.blobs.get(content_hash)
+        if path and os.path.exists(path):
+            os.remove(tmp_path)
+            # Restart the grace period, the uploader has yet to reference it
+            if not self.refs[content_hash]:
+                self.unreferenced_since[content_hash] = time.time()
+            return path
+
+        path = self._path(content_hash, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        self.blobs[content_hash] = path
+        if not self.refs[content_hash]:
+            self.unreferenced_since[content_hash] = time.time()
+        return path
+
+    def attachment_hash(self, attachment: Any) -> Optional[str]:
+        """Hash of the blob an attachment points at, None for anything else"""
+        if not isinstance(attachment, dict):
+            return None
+        content_hash = attachment.get('sha256')
+        path = self.blobs.get(content_hash) if self.is_hash(content_hash) else None
+        # Attachments are client-supplied on POST /messages, only count the real URL
+        if not path or attachment.get('url') != self.url(path):
+            return None
+        return content_hash
+
+    def _message_hashes(self, message: Dict[str, Any]) -> List[str]:
+        hashes = [self.attachment_hash(attachment) for attachment in message.get('attachments') or []]
+        return [content_hash for content_hash in hashes if content_hash]
+
+    def retain(self, message: Dict[str, Any]) -> None:
+        """Count the blob references of a new message"""
+        participants = [user_id for user_id in (message.get('fromUserId'), message.get('toUserId')) if user_id]
+        for content_hash in self._message_hashes(message):
+            self.refs[content_hash] += 1
+            self.owners.setdefault(content_hash, Counter()).update(participants)
+            self.unreferenced_since.pop(content_hash, None)
+
+    def release(self, message: Dict[str, Any]) -> None:
+        """Drop the blob references of a deleted message"""
+        participants = [user_id for user_id in (message.get('fromUserId'), message.get('toUserId')) if user_id]
+        for content_hash in self._message_hashes(message):
+            self.refs[content_hash] -= 1
+            owners = self.owners.get(content_hash)
+            if owners is not None:
+                owners.subtract(participants)
+                self.owners[content_hash] = +owners
+            if self.refs[content_hash] <= 0:
+                del self.refs[content_hash]
+                self.owners.pop(content_hash, None)
+                self.unreferenced_since[content_hash] = time.time()
+
+    def find(self, content_hash: str, user_id: str) -> Optional[str]:
+        """Path of a blob the user already has in one of their conversations"""
+        path = self.blobs.get(content_hash)
+        if not path or not self.owners.get(content_hash, {}).get(user_id):
+            return None
+        return path if os.path.exists(path) else None
+
+    def collect(self, grace_seconds: float = BLOB_GC_GRACE_MINUTES * 60) -> int:
+        """Remove blobs unreferenced for longer than the grace period, returns the number removed"""
+        cutoff = time.time() - grace_seconds
+        removed = 0
+        for content_hash, since in list(self.unreferenced_since.items()):
+            if since > cutoff or self.refs[content_hash]:
+                continue
+            path = self.blobs.pop(content_hash, None)
+            del self.unreferenced_since[content_hash]
+            for stale_path in [path] + glob.glob(os.path.join(IMAGE_THUMBNAIL_DIR, f'{content_hash}_*')):
+                if not stale_path:
+                    continue
+                try:
+                    os.remove(stale_path)
+                except OSError:
+                    pass
+            removed += 1
+        return removed
+
+
+# Global attachment blob store
+blob_store = BlobStore()
@@ -1,14 +1,18 @@
 """Chat service for business logic"""
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from database import messages, users, friends
+from utils.projection import ALL_FIELDS, project
+
+CHAT_FIELDS = ('partnerId', 'partner', 'lastMessage', 'unreadCount', 'lastMessageTime')
+CHAT_PROJECTION_FIELDS = (ALL_FIELDS,) + CHAT_FIELDS
 
 
 class ChatService:
     """Service for chat-related operations"""
     
     @staticmethod
-    def get_chats(user_id: str) -> List[Dict[str, Any]]:
-        """Get list of all chats (conversations) for a user"""
+    def get_chats(user_id: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Get list of all chats (conversations) for a user, optionally only some fields of each"""
         # Get all unique conversation partners from messages
         conversation_partners = set()
         for msg in messages:
@@ -54,7 +58,8 @@ class ChatService:
                     'id': partner['id'],
                     'username': partner['username'],
                     'email': partner['email'],
-                    'avatar': partner.get('avatar')
+                    'avatar': partner.get('avatar'),
+                    'avatarThumbnails': partner.get('avatarThumbnails')
                 },
                 'lastMessage': last_message,
                 'unreadCount': unread_count,
@@ -67,5 +72,7 @@ class ChatService:
             x.get('lastMessageTime', '') if x.get('lastMessageTime') else '',
             x.get('partner', {}).get('username', '')
         ), reverse=True)
+        if fields:
+            return project(chats, fields)
         return chats
 
@@ -0,0 +1,101 @@
+"""Version history of codes stored as reverse deltas"""
+import os
+from typing import Dict, Any, List, Optional
+from config import CODE_HISTORY_DIR
+from utils.text_delta import apply_edits, edit_size
+from utils.serialization import dumps, loads
+
+# Fields whose earlier values are kept alongside the content
+HISTORY_FIELDS = ('title', 'language', 'description', 'tags')
+
+
+class CodeHistory:
+    """Earlier versions of codes.
+
+    Only the current content lives in codes.json. Every update appends one
+    line to <root>/<code_id>.jsonl holding the reverse delta that turns the
+    new version back into the previous one, plus the previous values of the
+    metadata fields that changed. A version is rebuilt by applying the
+    deltas from the current content backwards, so storage and the write per
+    update grow with the size of the change rather than the file.
+    """
+
+    def __init__(self, root: str = CODE_HISTORY_DIR):
+        self.root = root
+
+    def _path(self, code_id: str) -> str:
+        return os.path.join(self.root, f'{code_id}.jsonl')
+
+    def record(self, code_id: str, version: int, updated_at: Optional[str], edits: List[Any],
+               fields: Dict[str, Any]) -> None:
+        """Remember how to get back to version from the next one"""
+        os.makedirs(self.root, exist_ok=True)
+        entry = {'version': version, 'updatedAt': updated_at, 'edits': edits, 'fields': fields}
+        with open(self._path(code_id), 'ab') as f:
+            f.write(dumps(entry) + b'\n')
+
+    def entries(self, code_id: str) -> List[Dict[str, Any]]:
+        """History entries of a code, oldest first"""
+        try:
+            with open(self._path(code_id), 'rb') as f:
+                return [loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def list_versions(self, code: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Summary of every version of a code, newest first"""
+        versions = [{
+            'version': code.get('version', 1),
+            'updatedAt': code.get('updatedAt'),
+            'current': True
+        }]
+        for entry in reversed(self.entries(code['id'])):
+            versions.append({
+                'version': entry['version'],
+                'updatedAt': entry['updatedAt'],
+                'current': False,
+                # Characters the next version replaced, 0 for metadata-only edits
+                'deltaSize': edit_size(entry['edits']),
+                'changedFields': sorted(entry['fields'])
+            })
+        return versions
+
+    def get_version(self, code: Dict[str, Any], version: int) -> Optional[Dict[str, Any]]:
+        """The code as it was at version, None if that version is unknown"""
+        current_version = code.get('version', 1)
+        if version == current_version:
+            return code
+        if version > current_version or version < 1:
+            return None
+
+        snapshot = {key: value for key, value in code.items() if key != 'content'}
+        content = code.get('content') or ''
+        for entry in reversed(self.entries(code['id'])):
+            if entry['version'] < version:
+                break
+            content, _ = apply_edits(content, entry['edits'])
+            snapshot.update(entry['fields'])
+            snapshot['updatedAt'] = entry['updatedAt']
+            if entry['version'] == version:
+                snapshot['version'] = version
+                snapshot['content'] = content
+                return snapshot
+        return None
+
+    def drop(self, *code_ids: str) -> None:
+        """Forget the history of deleted codes"""
+        for code_id in code_ids:
+            try:
+                os.remove(self._path(code_id))
+            except FileNotFoundError:
+                pass
+
+    def clear(self) -> None:
+        """Forget every history, when all codes are deleted"""
+        if os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                if name.endswith('.jsonl'):
+                    os.remove(os.path.join(self.root, name))
+
+
+code_history = CodeHistory()
@@ -0,0 +1,212 @@
+"""Bulk code import from JSON, NDJSON and zip request bodies"""
+import json
+import os
+import posixpath
+import tempfile
+import zipfile
+from typing import Dict, Any, Optional, AsyncIterator, List, Tuple
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from models import CodeCreate, CodeBulkFolder
+from services.code_service import CodeService
+from config import BULK_IMPORT_MAX_FILES, BULK_IMPORT_MAX_BYTES, LANGUAGE_EXTENSIONS
+
+# Zip bodies are kept in memory up to this size, bigger ones go to a temp file
+ZIP_SPOOL_SIZE = 8 * 1024 * 1024
+
+# One parsed entry: the code data, or the error result when it is unusable
+Entry = Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+class BulkImportTooLargeError(ValueError):
+    """Import body or unpacked archive exceeds BULK_IMPORT_MAX_BYTES"""
+
+
+def _too_large() -> BulkImportTooLargeError:
+    return BulkImportTooLargeError(f'Import is too large. Maximum size: {BULK_IMPORT_MAX_BYTES // (1024 * 1024)}MB')
+
+
+def _too_many_files() -> ValueError:
+    return ValueError(f'Too many files. Maximum per import: {BULK_IMPORT_MAX_FILES}')
+
+
+def _validation_error(e: ValidationError) -> str:
+    error = e.errors()[0]
+    field = '.'.join(str(part) for part in error['loc'])
+    return f'{field}: {error["msg"]}' if field else error['msg']
+
+
+def _error_entry(title: Optional[str], folder_path: Optional[str], error: str) -> Entry:
+    return None, {'index': None, 'title': title, 'folderPath': folder_path, 'status': 'error', 'error': error}
+
+
+class CodeImportService:
+    """Turns bulk import bodies into CodeService.bulk_create calls"""
+
+    @staticmethod
+    async def _import(folder_data: Optional[Dict[str, Any]], entries: List[Entry]) -> Dict[str, Any]:
+        """Create the usable entries and merge in the errors of the unusable ones"""
+        usable = [(index, code_data) for index, (code_data, _) in enumerate(entries) if code_data is not None]
+        if not usable:
+            raise ValueError('No valid files to import')
+
+        outcome = await CodeService.bulk_create(folder_data, [code_data for _, code_data in usable])
+        results = [error for _, error in entries]
+        for (index, _), result in zip(usable, outcome['results']):
+            results[index] = result
+        for index, result in enumerate(results):
+            result['index'] = index
+
+        outcome['results'] = results
+        outcome['failed'] = len(results) - outcome['created']
+        return outcome
+
+    @staticmethod
+    async def import_json(folder: Optional[CodeBulkFolder], files: List[CodeCreate]) -> Dict[str, Any]:
+        """Import an already validated JSON body"""
+        if len(files) > BULK_IMPORT_MAX_FILES:
+            raise _too_many_files()
+        folder_data = folder.model_dump() if folder else None
+        return await CodeImportService._import(folder_data, [(file.model_dump(), None) for file in files])
+
+    @staticmethod
+    async def _ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """Non-empty lines of a streamed body"""
+        pending = []
+        total = 0
+        async for chunk in chunks:
+            total += len(chunk)
+            if total > BULK_IMPORT_MAX_BYTES:
+                raise _too_large()
+            lines = chunk.split(b'\n')
+            if len(lines) == 1:
+                pending.append(chunk)
+                continue
+            lines[0] = b''.join(pending) + lines[0]
+            pending = [lines.pop()]
+            for line in lines:
+                if line.strip():
+                    yield line
+        tail = b''.join(pending)
+        if tail.strip():
+            yield tail
+
+    @staticmethod
+    async def import_ndjson(chunks: AsyncIterator[bytes], author: Optional[str] = None) -> Dict[str, Any]:
+        """Import one code object per line, as for POST /api/codes.
+
+        A first line with "isFolder": true is the folder the other lines go
+        into. author fills in lines that have none. Lines that do not parse
+        are reported in the results instead of failing the import.
+        """
+        folder_data = None
+        entries: List[Entry] = []
+        line_number = 0
+        async for line in CodeImportService._ndjson_lines(chunks):
+            line_number += 1
+            try:
+                item = json.loads(line)
+            except ValueError:
+                entries.append(_error_entry(None, None, f'Line {line_number} is not valid JSON'))
+                continue
+            if not isinstance(item, dict):
+                entries.append(_error_entry(None, None, f'Line {line_number} is not a JSON object'))
+                continue
+            if author and not item.get('author'):
+                item['author'] = author
+
+            if item.get('isFolder'):
+                if line_number != 1:
+                    entries.append(_error_entry(item.get('title'), None, 'Only the first line may be a folder'))
+                    continue
+                try:
+                    folder_data = CodeBulkFolder.model_validate(item).model_dump()
+                except ValidationError as e:
+                    raise ValueError(f'Invalid folder: {_validation_error(e)}')
+                continue
+
+            if len(entries) >= BULK_IMPORT_MAX_FILES:
+                raise _too_many_files()
+            try:
+                entries.append((CodeCreate.model_validate(item).model_dump(), None))
+            except ValidationError as e:
+                entries.append(_error_entry(item.get('title'), item.get('folderPath'), _validation_error(e)))
+
+        return await CodeImportService._import(folder_data, entries)
+
+    @staticmethod
+    def _unpack_zip(archive: Any) -> Tuple[Optional[str], List[Tuple[str, bytes]]]:
+        """Common root directory and (path, data) of the files in a zip"""
+        try:
+            zip_file = zipfile.ZipFile(archive)
+        except zipfile.BadZipFile:
+            raise ValueError('Body is not a valid zip archive')
+        with zip_file:
+            members = []
+            for info in zip_file.infolist():
+                path = posixpath.normpath(info.filename.replace('\\', '/')).lstrip('/')
+                parts = path.split('/')
+                # Directories, editor and OS metadata are not imported
+                if info.is_dir() or path == '.' or any(part in ('', '..', '__MACOSX') or part.startswith('.') for part in parts):
+                    continue
+                members.append((path, info))
+
+            if len(members) > BULK_IMPORT_MAX_FILES:
+                raise _too_many_files()
+            # Sizes in the directory can lie, so the limit is enforced while reading too
+            if sum(info.file_size for _, info in members) > BULK_IMPORT_MAX_BYTES:
+                raise _too_large()
+
+            files = []
+            remaining = BULK_IMPORT_MAX_BYTES
+            for path, info in members:
+                with zip_file.open(info) as member:
+                    data = member.read(remaining + 1)
+                remaining -= len(data)
+                if remaining < 0:
+                    raise _too_large()
+                files.append((path, data))
+
+        roots = {path.split('/', 1)[0] for path, _ in files if '/' in path}
+        root = roots.pop() if len(roots) == 1 and all('/' in path for path, _ in files) else None
+        return root, files
+
+    @staticmethod
+    async def import_zip(chunks: AsyncIterator[bytes], author: str, title: Optional[str] = None,
+                         description: Optional[str] = None) -> Dict[str, Any]:
+        """Import a zipped folder as a folder code with one code per text file"""
+        with tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_SIZE) as archive:
+            total = 0
+            async for chunk in chunks:
+                total += len(chunk)
+                if total > BULK_IMPORT_MAX_BYTES:
+                    raise _too_large()
+                archive.write(chunk)
+            archive.seek(0)
+            root, files = await run_in_threadpool(CodeImportService._unpack_zip, archive)
+
+        folder_title = title or root or 'folder'
+        entries: List[Entry] = []
+        for path, data in files:
+            name = posixpath.basename(path)
+            try:
+                content = data.decode('utf-8')
+            except UnicodeDecodeError:
+                entries.append(_error_entry(name, path, 'Not a UTF-8 text file'))
+                continue
+            entries.append(({
+                'title': name,
+                'content': content,
+                'language': LANGUAGE_EXTENSIONS.get(os.path.splitext(name)[1].lower(), 'other'),
+                'author': author,
+                'description': f'Файл папкадан: {folder_title}',
+                'tags': ['folder-file'],
+                'folderPath': path
+            }, None))
+
+        folder_data = CodeBulkFolder(
+            title=folder_title,
+            author=author,
+            description=description or f'{len(files)} файл бар папка'
+        ).model_dump()
+        return await CodeImportService._import(folder_data, entries)
@@ -1,9 +1,44 @@
 """Code service for business logic"""
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import json
 import uuid
 from datetime import datetime
 from database import codes, save_codes, FIRESTORE_SYNC_AVAILABLE, FIRESTORE_SYNC_CODE, FIRESTORE_DELETE_CODE
-from utils.validators import validate_file_on_server
+from config import FIRESTORE_SYNC_CODES
+from utils.validators import validate_file_on_server_async
+from utils.versions import versions
+from utils.text_delta import apply_edits, diff_edit
+from utils.projection import ALL_FIELDS, Projection, project
+from services.code_history import code_history, HISTORY_FIELDS
+from services.activity_feed import activity_feed, CODE_CREATED, COMMENT_ADDED, CODE_LIKED
+from indexes import (
+    code_index, code_search_index, code_ranking, user_content_index, user_index,
+    index_code, reindex_code, touch_code, unindex_code
+)
+from indexes.user_content_index import COMMENTED, LIKED, LIKED_COMMENTS, iter_comments, find_comment
+
+
+# Stored code fields, and fields computed from them for lean list payloads
+CODE_FIELDS = (
+    'id', 'title', 'content', 'language', 'author', 'authorId', 'description', 'tags', 'likes', 'comments',
+    'folderId', 'folderPath', 'isFolder', 'folderStructure', 'views', 'viewedBy', 'version',
+    'createdAt', 'updatedAt'
+)
+CODE_DERIVED_FIELDS = {
+    'likeCount': lambda code: len(code.get('likes') or []),
+    'commentCount': lambda code: len(code.get('comments') or []),
+    'hasContent': lambda code: bool(code.get('content')),
+}
+CODE_PROJECTION_FIELDS = (ALL_FIELDS,) + CODE_FIELDS + tuple(CODE_DERIVED_FIELDS)
+
+
+class CodeVersionConflictError(ValueError):
+    """The code changed since the version an update was based on"""
+    
+    def __init__(self, current_version: int):
+        super().__init__(f'Code was changed meanwhile, current version is {current_version}')
+        self.current_version = current_version
 
 
 class CodeService:
@@ -12,41 +47,56 @@ class CodeService:
     @staticmethod
     def find_code_by_id(code_id: str) -> Optional[Dict[str, Any]]:
         """Find code by ID"""
-        return next((code for code in codes if code['id'] == code_id), None)
+        return code_index.get(code_id)
     
     @staticmethod
     def get_codes(
         folder_id: Optional[str] = None,
         limit: Optional[int] = None,
         offset: int = 0,
-        include_content: bool = False
+        include_content: bool = False,
+        tag: Optional[str] = None,
+        language: Optional[str] = None,
+        author: Optional[str] = None,
+        sort: Optional[str] = None,
+        fields: Optional[List[str]] = None
     ) -> Dict[str, Any]:
-        """Get codes, optionally filtered by folder with pagination"""
-        # Filter codes
-        if folder_id:
-            filtered_codes = [code for code in codes if code.get('folderId') == folder_id]
-        else:
-            filtered_codes = [code for code in codes if not code.get('folderId')]
+        """Get codes, optionally filtered by folder, tag, language and author with pagination.
+        
+        Without a folder_id, root codes are listed unless a tag, language or
+        author filter is given, in which case codes from every folder match.
+        sort picks one of the precomputed orders (newest, updated, views, likes,
+        trending), otherwise codes come in insertion order. fields selects the
+        returned fields (see CODE_PROJECTION_FIELDS); codes are projections
+        to be rendered by ProjectedJSONResponse.
+        """
+        has_facet_filter = bool(tag or language or author)
+        filtered_codes = code_index.filter(
+            folder_id,
+            tag=tag,
+            language=language,
+            author=author,
+            any_folder=not folder_id and has_facet_filter
+        )
         
         total = len(filtered_codes)
         
-        # Apply pagination
-        if limit is not None:
+        # Apply sorting and pagination
+        if sort:
+            page_ids = code_ranking.page(sort, {code['id'] for code in filtered_codes}, offset=offset, limit=limit)
+            paginated_codes = [code_index.get(code_id) for code_id in page_ids]
+        elif limit is not None:
             paginated_codes = filtered_codes[offset:offset + limit]
         else:
             paginated_codes = filtered_codes[offset:]
         
-        # Remove content field if not needed (to reduce payload size)
-        if not include_content:
-            result_codes = []
-            for code in paginated_codes:
-                code_copy = {k: v for k, v in code.items() if k != 'content'}
-                code_copy['hasContent'] = bool(code.get('content'))
-                result_codes.append(code_copy)
-            paginated_codes = result_codes
+        # Leave content out unless asked for (to reduce payload size)
+        if fields is None:
+            fields = [ALL_FIELDS] if include_content else [ALL_FIELDS, 'hasContent']
+        omit = () if include_content else ('content',)
         
         return {
-            'codes': paginated_codes,
+            'codes': project(paginated_codes, fields, CODE_DERIVED_FIELDS, omit),
             'total': total,
             'limit': limit,
             'offset': offset,
@@ -54,18 +104,148 @@ class CodeService:
         }
     
     @staticmethod
-    def create_code(code_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Create a new code"""
-        validation = validate_file_on_server(code_data['title'], code_data['content'])
-        if not validation['valid']:
-            raise ValueError(validation['error'])
+    def project_code(code: Dict[str, Any], fields: Optional[List[str]] = None) -> Projection:
+        """A single code restricted to fields"""
+        return Projection(code, fields or [ALL_FIELDS], CODE_DERIVED_FIELDS)
+    
+    @staticmethod
+    def get_codes_by_ids(code_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Resolve many code IDs at once.
+        
+        Results follow the order of code_ids, with None where an ID is
+        unknown; those IDs are also listed in missing. As in get_codes,
+        content is left out unless fields asks for it.
+        """
+        if fields is None:
+            fields = [ALL_FIELDS, 'hasContent']
+        results = []
+        missing = []
+        for code_id in code_ids:
+            code = code_index.get(code_id)
+            if code:
+                results.append(Projection(code, fields, CODE_DERIVED_FIELDS, ('content',)))
+            else:
+                results.append(None)
+                missing.append(code_id)
+        return {'results': results, 'missing': missing}
+    
+    @staticmethod
+    def get_facets() -> Dict[str, Dict[str, int]]:
+        """Get code counts per tag and language"""
+        return code_index.facets()
+    
+    @staticmethod
+    def search_codes(
+        query: str,
+        limit: int = 20,
+        offset: int = 0,
+        language: Optional[str] = None,
+        tag: Optional[str] = None,
+        author: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Full-text search over code titles, descriptions, tags and content"""
+        ranked, total = code_search_index.search(
+            query, limit=limit, offset=offset, language=language, tag=tag, author=author
+        )
+        
+        fields = fields or [ALL_FIELDS, 'hasContent']
+        results = []
+        for code_id, score in ranked:
+            code = CodeService.find_code_by_id(code_id)
+            if not code:
+                continue
+            results.append(Projection(code, fields, CODE_DERIVED_FIELDS, ('content',), {'score': round(score, 4)}))
         
-        new_code = {
+        return {
+            'codes': results,
+            'total': total,
+            'limit': limit,
+            'offset': offset,
+            'hasMore': (offset + len(ranked)) < total
+        }
+    
+    @staticmethod
+    def _author(author: str, author_id: Optional[str] = None) -> Tuple[str, Optional[str]]:
+        """Username and id of the user writing as author.
+        
+        A known author_id wins and brings its user's current username, so the
+        name shown always belongs to the user the record is filed under.
+        """
+        user = user_index.get(author_id) if author_id else None
+        if user:
+            return user['username'], user['id']
+        # Clients that only send the username
+        user = user_index.get_by_username(author)
+        return author, user['id'] if user else None
+    
+    @staticmethod
+    def link_author_ids(all_users: List[Dict[str, Any]]) -> int:
+        """Give codes and comments stored before author ids the id of their author's user.
+        
+        Returns how many records got one. Authors without a user keep none.
+        """
+        user_ids = {}
+        for user in all_users:
+            user_ids.setdefault(user.get('username'), user['id'])
+        linked = 0
+        for code in codes:
+            for record in (code, *iter_comments(code)):
+                if 'authorId' not in record and record.get('author') in user_ids:
+                    record['authorId'] = user_ids[record['author']]
+                    linked += 1
+        return linked
+    
+    @staticmethod
+    def rename_author(user_id: str, username: str) -> int:
+        """Show a user's new username on their codes and comments, return how many changed"""
+        changed_code_ids = []
+        for code_id in user_content_index.codes_of(user_id):
+            code = code_index.get(code_id)
+            if code and code.get('author') != username:
+                code['author'] = username
+                reindex_code(code)
+                changed_code_ids.append(code_id)
+        renamed = len(changed_code_ids)
+        for comment_id, code_id in list(user_content_index.items_of(COMMENTED, user_id).items()):
+            code = code_index.get(code_id)
+            comment = find_comment(code, comment_id) if code else None
+            if comment and comment.get('author') != username:
+                comment['author'] = username
+                changed_code_ids.append(code_id)
+                renamed += 1
+        if changed_code_ids:
+            versions.bump('codes', *changed_code_ids)
+            save_codes()
+        return renamed
+    
+    @staticmethod
+    def get_user_activity(user_id: str) -> Dict[str, Any]:
+        """Codes a user wrote, and the comments and likes they left, by id"""
+        return {
+            'codes': user_content_index.codes_of(user_id),
+            'comments': [
+                {'codeId': code_id, 'commentId': comment_id}
+                for comment_id, code_id in user_content_index.items_of(COMMENTED, user_id).items()
+            ],
+            'likedCodes': list(user_content_index.items_of(LIKED, user_id)),
+            'likedComments': [
+                {'codeId': code_id, 'commentId': comment_id}
+                for comment_id, code_id in user_content_index.items_of(LIKED_COMMENTS, user_id).items()
+            ]
+        }
+    
+    @staticmethod
+    def _new_code(code_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a code record from validated create data"""
+        author, author_id = CodeService._author(code_data['author'], code_data.get('authorId'))
+        return {
             'id': str(uuid.uuid4()),
             'title': code_data['title'],
             'content': code_data['content'],
             'language': code_data['language'],
-            'author': code_data['author'],
+            'author': author,
+            'authorId': author_id,
             'description': code_data.get('description'),
             'tags': code_data.get('tags', []),
             'likes': [],
@@ -76,11 +256,23 @@ class CodeService:
             'folderStructure': code_data.get('folderStructure'),
             'views': 0,
             'viewedBy': [],
+            'version': 1,
             'createdAt': datetime.now().isoformat(),
             'updatedAt': datetime.now().isoformat()
         }
+    
+    @staticmethod
+    async def create_code(code_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a new code"""
+        validation = await validate_file_on_server_async(code_data['title'], code_data['content'])
+        if not validation['valid']:
+            raise ValueError(validation['error'])
+        
+        new_code = CodeService._new_code(code_data)
         
         codes.append(new_code)
+        index_code(new_code)
+        versions.bump('codes', new_code['id'])
         save_codes()
         
         # Firestore sync
@@ -90,26 +282,177 @@ class CodeService:
             except Exception as e:
                 print(f'Warning: Firestore sync failed for new code: {e}')
         
+        # Files of a folder are announced by their folder
+        if new_code['folderId'] is None:
+            activity_feed.publish(CODE_CREATED, new_code['authorId'], new_code['id'], created_at=new_code['createdAt'])
+        
         return new_code
     
     @staticmethod
-    def update_code(code_id: str, code_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Update a code"""
-        code = CodeService.find_code_by_id(code_id)
-        if not code:
-            raise ValueError("Code file not found")
-        
-        if code_data.get('title') is not None:
-            code['title'] = code_data['title']
-        if code_data.get('content') is not None:
-            code['content'] = code_data['content']
-        if code_data.get('language') is not None:
-            code['language'] = code_data['language']
-        if code_data.get('description') is not None:
-            code['description'] = code_data['description']
-        if code_data.get('tags') is not None:
-            code['tags'] = code_data['tags']
+    def folder_structure(files: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Folder structure of files keyed by path, in the shape the frontend builds"""
+        structure = {}
+        for file in files:
+            path = file.get('folderPath') or file['title']
+            parts = path.split('/')
+            for depth in range(1, len(parts)):
+                folder_path = '/'.join(parts[:depth])
+                structure.setdefault(folder_path, {'type': 'folder', 'name': parts[depth - 1]})
+            structure[path] = {
+                'type': 'file',
+                'name': file['title'],
+                'size': len(file['content'].encode('utf-8')),
+                'language': file['language']
+            }
+        return structure
+    
+    @staticmethod
+    async def bulk_create(folder_data: Optional[Dict[str, Any]], files_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Create a folder and its files, or a batch of loose files, in one commit.
+        
+        Every file is validated concurrently (large ones in worker threads);
+        the valid ones are indexed, codes.json is written once and Firestore
+        gets one batched write in the background. Invalid files do not stop
+        the import, they are reported in the per-file results.
+        """
+        if not files_data:
+            raise ValueError("No files to import")
+        
+        if folder_data is not None:
+            validation = await validate_file_on_server_async(folder_data['title'], folder_data['content'])
+            if not validation['valid']:
+                raise ValueError(validation['error'])
+        validations = await asyncio.gather(*(
+            validate_file_on_server_async(file_data['title'], file_data['content'])
+            for file_data in files_data
+        ))
+        
+        folder = None
+        valid_files = [f for f, v in zip(files_data, validations) if v['valid']]
+        if folder_data is not None and valid_files:
+            structure = folder_data.get('folderStructure') or CodeService.folder_structure(valid_files)
+            # Same summary the folder upload in the frontend stores as content
+            content = folder_data.get('content') or json.dumps({
+                'structure': structure,
+                'fileCount': len(valid_files),
+                'totalSize': sum(len(f['content'].encode('utf-8')) for f in valid_files)
+            }, indent=2, ensure_ascii=False)
+            folder = CodeService._new_code({
+                **folder_data,
+                'content': content,
+                'isFolder': True,
+                'folderStructure': structure
+            })
+        
+        created = [folder] if folder else []
+        results = []
+        for index, (file_data, validation) in enumerate(zip(files_data, validations)):
+            result = {'index': index, 'title': file_data['title'], 'folderPath': file_data.get('folderPath')}
+            if not validation['valid']:
+                result.update(status='error', error=validation['error'])
+            else:
+                new_code = CodeService._new_code({
+                    **file_data,
+                    'isFolder': False,
+                    'folderId': folder['id'] if folder else file_data.get('folderId')
+                })
+                created.append(new_code)
+                result.update(status='created', id=new_code['id'])
+            results.append(result)
+        
+        codes.extend(created)
+        for new_code in created:
+            index_code(new_code)
+        versions.bump('codes', *(new_code['id'] for new_code in created))
+        save_codes(sync_firestore=False)
+        
+        # One batched Firestore write instead of a request per code
+        if FIRESTORE_SYNC_AVAILABLE and FIRESTORE_SYNC_CODES and created:
+            asyncio.get_running_loop().run_in_executor(None, FIRESTORE_SYNC_CODES, created)
+
+        # Files of a folder are announced by their folder
+        for new_code in created:
+            if new_code['folderId'] is None:
+                activity_feed.publish(CODE_CREATED, new_code['authorId'], new_code['id'], created_at=new_code['createdAt'])
+
+        created_count = sum(1 for result in results if result['status'] == 'created')
+        return {
+            'folder': folder,
+            'created': created_count,
+            'failed': len(results) - created_count,
+            'results': results
+        }
+    
+    @staticmethod
+    def _archive_name(code: Dict[str, Any], folder_title: str) -> str:
+        """Zip entry name of a folder file, its folderPath without unsafe parts"""
+        path = code.get('folderPath') or f"{folder_title}/{code['title']}"
+        parts = [part for part in path.replace('\\', '/').split('/') if part not in ('', '.', '..')]
+        return '/'.join(parts) or code['id']
+    
+    @staticmethod
+    def _modified_at(code: Dict[str, Any]) -> datetime:
+        try:
+            return datetime.fromisoformat(code.get('updatedAt') or code.get('createdAt')).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            return datetime.now()
+    
+    @staticmethod
+    def folder_archive_entries(folder: Dict[str, Any]) -> List[Tuple[str, str, datetime]]:
+        """(entry name, content, modified) of every file in a folder tree.
+        
+        Entries reference the stored content strings, nothing is copied, so
+        they can be zipped lazily while streaming.
+        """
+        entries = []
+        names = set()
+        pending = [folder]
+        seen = {folder['id']}
+        while pending:
+            current = pending.pop()
+            for code in code_index.folder_children(current['id']):
+                if code['id'] in seen:
+                    continue
+                seen.add(code['id'])
+                if code.get('isFolder'):
+                    pending.append(code)
+                    continue
+                name = CodeService._archive_name(code, folder['title'])
+                stem, dot, extension = name.rpartition('.')
+                if not dot or '/' in extension:
+                    stem, dot, extension = name, '', ''
+                copy = 1
+                while name in names:
+                    copy += 1
+                    name = f'{stem} ({copy}){dot}{extension}'
+                names.add(name)
+                entries.append((name, code.get('content') or '', CodeService._modified_at(code)))
+        return entries
+    
+    @staticmethod
+    def _check_version(code: Dict[str, Any], base_version: Optional[int]) -> None:
+        """Reject updates based on an outdated version (optimistic concurrency)"""
+        if base_version is not None and base_version != code.get('version', 1):
+            raise CodeVersionConflictError(code.get('version', 1))
+    
+    @staticmethod
+    def _commit_update(code: Dict[str, Any], content: Optional[str], reverse_edits: List[Any],
+                       code_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a new version of code, keeping the way back in its history"""
+        previous_fields = {}
+        for field in HISTORY_FIELDS:
+            if code_data.get(field) is not None and code_data[field] != code.get(field):
+                previous_fields[field] = code.get(field)
+                code[field] = code_data[field]
+        
+        version = code.get('version', 1)
+        code_history.record(code['id'], version, code.get('updatedAt'), reverse_edits, previous_fields)
+        if content is not None:
+            code['content'] = content
+        code['version'] = version + 1
         code['updatedAt'] = datetime.now().isoformat()
+        reindex_code(code)
+        versions.bump('codes', code['id'])
         
         save_codes()
         
@@ -122,6 +465,49 @@ class CodeService:
         
         return code
     
+    @staticmethod
+    def update_code(code_id: str, code_data: Dict[str, Any], base_version: Optional[int] = None) -> Dict[str, Any]:
+        """Update a code, replacing its content when given"""
+        code = CodeService.find_code_by_id(code_id)
+        if not code:
+            raise ValueError("Code file not found")
+        CodeService._check_version(code, base_version)
+        
+        content = code_data.get('content')
+        reverse_edits = diff_edit(code.get('content') or '', content) if content is not None else []
+        return CodeService._commit_update(code, content, reverse_edits, code_data)
+    
+    @staticmethod
+    def patch_code(code_id: str, base_version: int, edits: List[Dict[str, Any]],
+                   code_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Update a code by applying range edits to the version they were made against"""
+        code = CodeService.find_code_by_id(code_id)
+        if not code:
+            raise ValueError("Code file not found")
+        CodeService._check_version(code, base_version)
+        
+        content, reverse_edits = apply_edits(code.get('content') or '', edits)
+        return CodeService._commit_update(code, content if edits else None, reverse_edits, code_data)
+    
+    @staticmethod
+    def list_versions(code_id: str) -> List[Dict[str, Any]]:
+        """Versions of a code, newest first"""
+        code = CodeService.find_code_by_id(code_id)
+        if not code:
+            raise ValueError("Code file not found")
+        return code_history.list_versions(code)
+    
+    @staticmethod
+    def get_version(code_id: str, version: int) -> Dict[str, Any]:
+        """A code as it was at an earlier version"""
+        code = CodeService.find_code_by_id(code_id)
+        if not code:
+            raise ValueError("Code file not found")
+        snapshot = code_history.get_version(code, version)
+        if snapshot is None:
+            raise ValueError("Version not found")
+        return snapshot
+    
     @staticmethod
     def delete_code(code_id: str) -> List[str]:
         """Delete a code and return list of deleted IDs"""
@@ -134,13 +520,17 @@ class CodeService:
         # If it's a folder, delete all files in the folder first
         folder_files = []
         if code.get('isFolder'):
-            folder_files = [c for c in codes if c.get('folderId') == code_id]
+            folder_files = code_index.folder_children(code_id)
             for file in folder_files:
                 codes.remove(file)
+                unindex_code(file['id'])
                 deleted_ids.append(file['id'])
         
         # Delete the code itself
         codes.remove(code)
+        unindex_code(code_id)
+        versions.bump('codes', *deleted_ids)
+        code_history.drop(*deleted_ids)
         save_codes()
         
         # Firestore delete
@@ -158,14 +548,17 @@ class CodeService:
     def delete_multiple_codes(code_ids: List[str]) -> int:
         """Delete multiple codes"""
         deleted_count = 0
-        codes_to_delete = [c for c in codes if c['id'] in code_ids]
+        codes_to_delete = [code for code in map(code_index.get, code_ids) if code]
         
         # First, delete all files in folders that are being deleted
         for code in codes_to_delete:
             if code.get('isFolder'):
-                folder_files = [c for c in codes if c.get('folderId') == code['id']]
+                folder_files = code_index.folder_children(code['id'])
                 for file in folder_files:
                     codes.remove(file)
+                    unindex_code(file['id'])
+                    versions.bump('codes', file['id'])
+                    code_history.drop(file['id'])
                     deleted_count += 1
         
         # Then delete the codes themselves
@@ -173,6 +566,9 @@ class CodeService:
             code = CodeService.find_code_by_id(code_id)
             if code:
                 codes.remove(code)
+                unindex_code(code_id)
+                versions.bump('codes', code_id)
+                code_history.drop(code_id)
                 deleted_count += 1
                 
                 # Firestore delete
@@ -198,6 +594,9 @@ class CodeService:
         if user_id not in code['likes']:
             code['likes'].append(user_id)
             code['updatedAt'] = datetime.now().isoformat()
+            touch_code(code, 'like')
+            user_content_index.update(code)
+            versions.bump('codes', code_id)
             save_codes()
             
             # Firestore sync
@@ -206,6 +605,8 @@ class CodeService:
                     FIRESTORE_SYNC_CODE(code)
                 except Exception as e:
                     print(f'Warning: Firestore sync failed for like: {e}')
+            
+            activity_feed.publish(CODE_LIKED, user_id, code_id)
         
         return code
     
@@ -219,8 +620,12 @@ class CodeService:
         if 'likes' not in code:
             code['likes'] = []
         
+        was_liked = user_id in code['likes']
         code['likes'] = [id for id in code['likes'] if id != user_id]
         code['updatedAt'] = datetime.now().isoformat()
+        touch_code(code, 'unlike' if was_liked else None)
+        user_content_index.update(code)
+        versions.bump('codes', code_id)
         save_codes()
         
         # Firestore sync
@@ -230,6 +635,9 @@ class CodeService:
             except Exception as e:
                 print(f'Warning: Firestore sync failed for unlike: {e}')
         
+        if was_liked:
+            activity_feed.withdraw_like(user_id, code_id)
+        
         return code
     
     @staticmethod
@@ -249,6 +657,8 @@ class CodeService:
                 code['viewedBy'].append(user_id)
                 code['views'] = (code.get('views', 0) or 0) + 1
                 code['updatedAt'] = datetime.now().isoformat()
+                touch_code(code, 'view')
+                versions.bump('codes', code_id)
                 save_codes()
                 
                 # Firestore sync
@@ -260,6 +670,8 @@ class CodeService:
         else:
             code['views'] = (code.get('views', 0) or 0) + 1
             code['updatedAt'] = datetime.now().isoformat()
+            touch_code(code, 'view')
+            versions.bump('codes', code_id)
             save_codes()
             
             # Firestore sync
@@ -272,7 +684,8 @@ class CodeService:
         return code
     
     @staticmethod
-    def add_comment(code_id: str, author: str, content: str, parent_id: Optional[str] = None) -> Dict[str, Any]:
+    def add_comment(code_id: str, author: str, content: str, parent_id: Optional[str] = None,
+                    author_id: Optional[str] = None) -> Dict[str, Any]:
         """Add a comment to a code"""
         code = CodeService.find_code_by_id(code_id)
         if not code:
@@ -281,9 +694,11 @@ class CodeService:
         if 'comments' not in code:
             code['comments'] = []
         
+        author, author_id = CodeService._author(author, author_id)
         new_comment = {
             'id': str(uuid.uuid4()),
             'author': author,
+            'authorId': author_id,
             'content': content,
             'createdAt': datetime.now().isoformat(),
             'replies': [],
@@ -293,6 +708,9 @@ class CodeService:
         
         code['comments'].append(new_comment)
         code['updatedAt'] = datetime.now().isoformat()
+        touch_code(code)
+        user_content_index.update(code)
+        versions.bump('codes', code_id)
         save_codes()
         
         # Firestore sync
@@ -302,6 +720,8 @@ class CodeService:
             except Exception as e:
                 print(f'Warning: Firestore sync failed for comment: {e}')
         
+        activity_feed.publish(COMMENT_ADDED, new_comment['authorId'], code_id, new_comment['id'], new_comment['createdAt'])
+        
         return code
     
     @staticmethod
@@ -320,6 +740,8 @@ class CodeService:
         
         comment['content'] = content
         code['updatedAt'] = datetime.now().isoformat()
+        touch_code(code)
+        versions.bump('codes', code_id)
         save_codes()
         
         # Firestore sync
@@ -347,6 +769,9 @@ class CodeService:
         
         code['comments'].pop(comment_index)
         code['updatedAt'] = datetime.now().isoformat()
+        touch_code(code)
+        user_content_index.update(code)
+        versions.bump('codes', code_id)
         save_codes()
         
         # Firestore sync
@@ -379,6 +804,9 @@ class CodeService:
             comment['likes'].append(user_id)
         
         code['updatedAt'] = datetime.now().isoformat()
+        touch_code(code)
+        user_content_index.update(code)
+        versions.bump('codes', code_id)
         save_codes()
         
         # Firestore sync
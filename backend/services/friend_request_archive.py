@@ -0,0 +1,65 @@
+"""Processed friend requests, kept out of the pending set"""
+import os
+from typing import Dict, Any, Iterable, Optional
+from config import FRIEND_REQUESTS_ARCHIVE_FILE
+from utils.serialization import dumps, loads
+
+
+class FriendRequestArchive:
+    """Accepted, rejected and cancelled friend requests.
+
+    friendRequests.json and the request indexes only hold pending requests.
+    Once processed a request is appended here as one JSON line and no
+    longer loaded at startup. The file is read only to tell a processed
+    request from an unknown one, or rewritten when an account is deleted.
+    """
+
+    def __init__(self, path: str = FRIEND_REQUESTS_ARCHIVE_FILE):
+        self.path = path
+
+    def append(self, requests: Iterable[Dict[str, Any]]) -> int:
+        """Archive requests, return how many were written"""
+        lines = [dumps(request) + b'\n' for request in requests]
+        if lines:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'ab') as f:
+                f.writelines(lines)
+        return len(lines)
+
+    def _read(self) -> Iterable[Dict[str, Any]]:
+        try:
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    if line.strip():
+                        yield loads(line)
+        except FileNotFoundError:
+            return
+
+    def find(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """An archived request by id"""
+        return next((request for request in self._read() if request.get('id') == request_id), None)
+
+    def drop_user(self, user_id: str) -> int:
+        """Forget every request a deleted user sent or received, return how many"""
+        kept = []
+        dropped = 0
+        for request in self._read():
+            if request.get('fromUserId') == user_id or request.get('toUserId') == user_id:
+                dropped += 1
+            else:
+                kept.append(request)
+        if dropped:
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.writelines(dumps(request) + b'\n' for request in kept)
+            os.replace(tmp_path, self.path)
+        return dropped
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+friend_request_archive = FriendRequestArchive()
@@ -3,26 +3,26 @@ from typing import List, Dict, Any, Optional
 import uuid
 from datetime import datetime
 from database import friends, friend_requests, users, save_friends, save_friend_requests
+from indexes import user_index, friend_request_index, friend_graph
+from services.friend_request_archive import friend_request_archive
+from utils.versions import versions
+from utils.projection import Projection, project
+from services.user_service import PUBLIC_USER_FIELDS
 
 
 class FriendService:
     """Service for friend-related operations"""
     
     @staticmethod
-    def get_friends(user_id: str) -> List[Dict[str, Any]]:
-        """Get all friends for a user"""
+    def get_friends(user_id: str, fields: Optional[List[str]] = None) -> List[Projection]:
+        """Get all friends for a user, with their public profile fields or the given ones"""
         user_friends = friends.get(user_id, [])
         friends_list = []
         for friend_id in user_friends:
             friend = next((u for u in users if u['id'] == friend_id), None)
             if friend:
-                friends_list.append({
-                    'id': friend['id'],
-                    'username': friend['username'],
-                    'email': friend['email'],
-                    'avatar': friend.get('avatar')
-                })
-        return friends_list
+                friends_list.append(friend)
+        return project(friends_list, fields or PUBLIC_USER_FIELDS)
     
     @staticmethod
     def add_friend(user_id: str, friend_id: str) -> None:
@@ -44,6 +44,9 @@ class FriendService:
         if user_id not in friends[friend_id]:
             friends[friend_id].append(user_id)
             save_friends()
+        
+        friend_graph.add(user_id, friend_id)
+        versions.bump('friends', user_id, friend_id)
     
     @staticmethod
     def remove_friend(user_id: str, friend_id: str) -> None:
@@ -55,12 +58,85 @@ class FriendService:
         if friend_id in friends:
             friends[friend_id] = [id for id in friends[friend_id] if id != user_id]
             save_friends()
+        
+        friend_graph.remove(user_id, friend_id)
+        versions.bump('friends', user_id, friend_id)
     
     @staticmethod
     def are_friends(user_id: str, friend_id: str) -> bool:
         """Check if two users are friends"""
-        user_friends = friends.get(user_id, [])
-        return friend_id in user_friends
+        return friend_graph.are_friends(user_id, friend_id)
+    
+    @staticmethod
+    def get_suggestions(user_id: str, limit: int = 20, fields: Optional[List[str]] = None) -> List[Projection]:
+        """Friends of friends who are not friends yet, most mutual friends first.
+        
+        Each suggestion is the user's public profile (or the given fields)
+        plus mutualFriendCount.
+        """
+        suggestions = []
+        for candidate_id, mutual_count in friend_graph.suggestions(user_id, limit):
+            candidate = user_index.get(candidate_id)
+            if candidate:
+                suggestions.append(Projection(candidate, fields or PUBLIC_USER_FIELDS,
+                                              extra={'mutualFriendCount': mutual_count}))
+        return suggestions
+    
+    @staticmethod
+    def get_mutual_friends(user_id: str, other_user_id: str, fields: Optional[List[str]] = None) -> List[Projection]:
+        """Friends two users have in common"""
+        mutual_friends = []
+        for friend_id in sorted(friend_graph.mutual_friends(user_id, other_user_id)):
+            friend = user_index.get(friend_id)
+            if friend:
+                mutual_friends.append(friend)
+        return project(mutual_friends, fields or PUBLIC_USER_FIELDS)
+    
+    @staticmethod
+    def _user_summary(user_id: str) -> Optional[Dict[str, Any]]:
+        user = user_index.get(user_id)
+        if not user:
+            return None
+        return {
+            'id': user['id'],
+            'username': user['username'],
+            'email': user['email'],
+            'avatar': user.get('avatar'),
+            'avatarThumbnails': user.get('avatarThumbnails')
+        }
+    
+    @staticmethod
+    def archive_processed_requests() -> int:
+        """Move requests that are no longer pending out of friendRequests.json, on startup"""
+        processed = [req for req in friend_requests if req.get('status') != 'pending']
+        if not processed:
+            return 0
+        friend_request_archive.append(processed)
+        friend_requests[:] = [req for req in friend_requests if req.get('status') == 'pending']
+        save_friend_requests()
+        return len(processed)
+    
+    @staticmethod
+    def _find_pending_request(request_id: str) -> Dict[str, Any]:
+        request = friend_request_index.get(request_id)
+        if request:
+            return request
+        if friend_request_archive.find(request_id):
+            raise ValueError("Request already processed")
+        raise ValueError("Friend request not found")
+    
+    @staticmethod
+    def _process_requests(requests: List[Dict[str, Any]], status: str) -> None:
+        """Give pending requests their final status and move them to the archive"""
+        processed_at = datetime.now().isoformat()
+        processed_ids = set()
+        for request in requests:
+            request['status'] = status
+            request['processedAt'] = processed_at
+            friend_request_index.remove(request['id'])
+            processed_ids.add(request['id'])
+        friend_requests[:] = [req for req in friend_requests if req['id'] not in processed_ids]
+        friend_request_archive.append(requests)
     
     @staticmethod
     def create_friend_request(from_user_id: str, to_user_id: str) -> Dict[str, Any]:
@@ -72,15 +148,8 @@ class FriendService:
         if FriendService.are_friends(from_user_id, to_user_id):
             raise ValueError("Already friends")
         
-        # Check if request already exists
-        existing_request = next((
-            req for req in friend_requests
-            if ((req.get('fromUserId') == from_user_id and req.get('toUserId') == to_user_id) or
-                (req.get('fromUserId') == to_user_id and req.get('toUserId') == from_user_id)) and
-               req.get('status') == 'pending'
-        ), None)
-        
-        if existing_request:
+        # Check if a request already exists in either direction
+        if friend_request_index.between(from_user_id, to_user_id):
             raise ValueError("Friend request already exists")
         
         new_request = {
@@ -92,31 +161,25 @@ class FriendService:
         }
         
         friend_requests.append(new_request)
+        friend_request_index.add(new_request)
+        versions.bump('friendRequests', from_user_id, to_user_id)
         save_friend_requests()
         return new_request
     
     @staticmethod
     def get_friend_requests(user_id: str) -> List[Dict[str, Any]]:
-        """Get all friend requests for a user"""
-        requests = [
-            req for req in friend_requests
-            if (req.get('toUserId') == user_id and req.get('status') == 'pending') or
-               (req.get('fromUserId') == user_id and req.get('status') == 'pending')
-        ]
+        """Get all pending friend requests for a user, incoming and outgoing, oldest first"""
+        requests = friend_request_index.incoming_requests(user_id) + friend_request_index.outgoing_requests(user_id)
+        requests.sort(key=lambda req: req.get('createdAt', ''))
         
         requests_with_users = []
         for req in requests:
             other_user_id = req['fromUserId'] if req['fromUserId'] != user_id else req['toUserId']
-            other_user = next((u for u in users if u['id'] == other_user_id), None)
+            other_user = FriendService._user_summary(other_user_id)
             if other_user:
                 requests_with_users.append({
                     **req,
-                    'otherUser': {
-                        'id': other_user['id'],
-                        'username': other_user['username'],
-                        'email': other_user['email'],
-                        'avatar': other_user.get('avatar')
-                    },
+                    'otherUser': other_user,
                     'isIncoming': req.get('toUserId') == user_id
                 })
         
@@ -125,118 +188,66 @@ class FriendService:
     @staticmethod
     def get_incoming_friend_requests(user_id: str) -> List[Dict[str, Any]]:
         """Get incoming friend requests for a user"""
-        incoming_requests = [
-            req for req in friend_requests
-            if req.get('toUserId') == user_id and req.get('status') == 'pending'
-        ]
-        
         requests_with_users = []
-        for req in incoming_requests:
-            from_user = next((u for u in users if u['id'] == req['fromUserId']), None)
+        for req in friend_request_index.incoming_requests(user_id):
+            from_user = FriendService._user_summary(req['fromUserId'])
             if from_user:
-                requests_with_users.append({
-                    **req,
-                    'fromUser': {
-                        'id': from_user['id'],
-                        'username': from_user['username'],
-                        'email': from_user['email'],
-                        'avatar': from_user.get('avatar')
-                    }
-                })
+                requests_with_users.append({**req, 'fromUser': from_user})
         
         return requests_with_users
     
     @staticmethod
     def get_outgoing_friend_requests(user_id: str) -> List[Dict[str, Any]]:
         """Get outgoing friend requests for a user"""
-        outgoing_requests = [
-            req for req in friend_requests
-            if req.get('fromUserId') == user_id and req.get('status') == 'pending'
-        ]
-        
         requests_with_users = []
-        for req in outgoing_requests:
-            to_user = next((u for u in users if u['id'] == req['toUserId']), None)
+        for req in friend_request_index.outgoing_requests(user_id):
+            to_user = FriendService._user_summary(req['toUserId'])
             if to_user:
-                requests_with_users.append({
-                    **req,
-                    'toUser': {
-                        'id': to_user['id'],
-                        'username': to_user['username'],
-                        'email': to_user['email'],
-                        'avatar': to_user.get('avatar')
-                    }
-                })
+                requests_with_users.append({**req, 'toUser': to_user})
         
         return requests_with_users
     
     @staticmethod
     def get_incoming_friend_request_count(user_id: str) -> int:
         """Get count of incoming friend requests"""
-        incoming_count = sum(
-            1 for req in friend_requests
-            if req.get('toUserId') == user_id and req.get('status') == 'pending'
-        )
-        return incoming_count
+        return friend_request_index.incoming_count(user_id)
     
     @staticmethod
     def accept_friend_request(request_id: str) -> Dict[str, Any]:
         """Accept a friend request"""
-        request = next((req for req in friend_requests if req['id'] == request_id), None)
-        if not request:
-            raise ValueError("Friend request not found")
-        
-        if request.get('status') != 'pending':
-            raise ValueError("Request already processed")
-        
-        request['status'] = 'accepted'
+        request = FriendService._find_pending_request(request_id)
         
         # Add to friends list
         FriendService.add_friend(request['fromUserId'], request['toUserId'])
         
         # Егер екінші жақтан да сұрау болса, оны да автоматты түрде қабылдау
-        reverse_request = next((
-            req for req in friend_requests
-            if req.get('fromUserId') == request['toUserId'] and
-               req.get('toUserId') == request['fromUserId'] and
-               req.get('status') == 'pending'
-        ), None)
-        
-        if reverse_request:
-            reverse_request['status'] = 'accepted'
+        FriendService._process_requests(
+            friend_request_index.between(request['fromUserId'], request['toUserId']), 'accepted'
+        )
         
+        versions.bump('friendRequests', request['fromUserId'], request['toUserId'])
         save_friend_requests()
         return request
     
     @staticmethod
     def reject_friend_request(request_id: str) -> Dict[str, Any]:
         """Reject a friend request"""
-        request = next((req for req in friend_requests if req['id'] == request_id), None)
-        if not request:
-            raise ValueError("Friend request not found")
-        
-        if request.get('status') != 'pending':
-            raise ValueError("Request already processed")
-        
-        request['status'] = 'rejected'
+        request = FriendService._find_pending_request(request_id)
+        FriendService._process_requests([request], 'rejected')
+        versions.bump('friendRequests', request['fromUserId'], request['toUserId'])
         save_friend_requests()
         return request
     
     @staticmethod
     def cancel_friend_request(request_id: str, user_id: str) -> Dict[str, Any]:
         """Cancel a friend request (for outgoing requests)"""
-        request = next((req for req in friend_requests if req['id'] == request_id), None)
-        if not request:
-            raise ValueError("Friend request not found")
+        request = FriendService._find_pending_request(request_id)
         
         # Only allow canceling if user is the sender
         if request.get('fromUserId') != user_id:
             raise ValueError("You can only cancel your own friend requests")
         
-        if request.get('status') != 'pending':
-            raise ValueError("Request already processed")
-        
-        request['status'] = 'cancelled'
+        FriendService._process_requests([request], 'cancelled')
+        versions.bump('friendRequests', request['fromUserId'], request['toUserId'])
         save_friend_requests()
         return request
-
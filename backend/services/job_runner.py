@@ -0,0 +1,137 @@
+"""Background jobs for work too long to finish inside a request"""
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Sequence, Set
+from config import JOB_SLICE_MS, JOB_RETENTION_MINUTES
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+
+class Job:
+    """State and progress of one background job"""
+
+    __slots__ = ('id', 'type', 'status', 'stage', 'done', 'total', 'result', 'error',
+                 'created_at', 'started_at', 'finished_at', 'finished')
+
+    def __init__(self, job_type: str, job_id: Optional[str] = None):
+        self.id = job_id or str(uuid.uuid4())
+        self.type = job_type
+        self.status = QUEUED
+        self.stage: Optional[str] = None
+        self.done = 0
+        self.total = 0
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        # Monotonic time the job finished, for expiry
+        self.finished: Optional[float] = None
+
+    async def each(self, stage: str, items: Sequence[Any],
+                   slice_seconds: float = JOB_SLICE_MS / 1000) -> AsyncIterator[Any]:
+        """Hand out items one by one as one stage of the job.
+
+        Progress is counted per item and the event loop gets a turn every
+        slice_seconds, so requests keep being served while the job runs.
+        """
+        self.stage = stage
+        self.done = 0
+        self.total = len(items)
+        slice_end = time.perf_counter() + slice_seconds
+        for item in items:
+            yield item
+            self.done += 1
+            if time.perf_counter() >= slice_end:
+                await asyncio.sleep(0)
+                slice_end = time.perf_counter() + slice_seconds
+
+    def finish(self, status: str) -> None:
+        self.status = status
+        self.finished_at = datetime.now().isoformat()
+        self.finished = time.monotonic()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'type': self.type,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': {'done': self.done, 'total': self.total},
+            'result': self.result,
+            'error': self.error,
+            'createdAt': self.created_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at
+        }
+
+
+class JobRunner:
+    """Runs submitted jobs in the background one at a time.
+
+    Jobs run on the event loop in submission order, so two cascades never
+    interleave their changes to the shared data. Finished jobs stay
+    queryable for retention_seconds.
+    """
+
+    def __init__(self, retention_seconds: float = JOB_RETENTION_MINUTES * 60):
+        self.retention_seconds = retention_seconds
+        self.jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self.tasks: Set[asyncio.Task] = set()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def submit(self, job_type: str, work: Callable[[Job], Awaitable[Any]],
+               job_id: Optional[str] = None) -> Job:
+        """Queue work(job), whose return value becomes the job's result"""
+        self._expire()
+        job = Job(job_type, job_id)
+        self.jobs[job.id] = job
+        task = asyncio.get_running_loop().create_task(self._run(job, work))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return job
+
+    async def _run(self, job: Job, work: Callable[[Job], Awaitable[Any]]) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            job.status = RUNNING
+            job.started_at = datetime.now().isoformat()
+            try:
+                job.result = await work(job)
+            except asyncio.CancelledError:
+                job.error = 'Cancelled'
+                job.finish(FAILED)
+                raise
+            except Exception as e:
+                print(f'Error in {job.type} job {job.id}: {e}')
+                job.error = str(e)
+                job.finish(FAILED)
+            else:
+                job.finish(COMPLETED)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._expire()
+        return self.jobs.get(job_id)
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.retention_seconds
+        for job_id in [job.id for job in self.jobs.values() if job.finished is not None and job.finished < cutoff]:
+            del self.jobs[job_id]
+
+    async def shutdown(self) -> None:
+        """Cancel queued and running jobs"""
+        for task in list(self.tasks):
+            task.cancel()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+# Global job runner
+job_runner = JobRunner()
@@ -0,0 +1,196 @@
+"""Background media pipeline rendering image thumbnails in worker processes"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, Set, List, Iterable
+from config import (
+    UPLOAD_DIR, AVATAR_THUMBNAIL_DIR, IMAGE_THUMBNAIL_DIR,
+    AVATAR_THUMBNAIL_SIZES, IMAGE_THUMBNAIL_SIZES, MEDIA_WORKERS
+)
+from database import save_users, save_messages
+from services.avatar_service import AvatarService
+from utils.images import PILLOW_AVAILABLE, render_thumbnails, thumbnail_name
+from utils.versions import versions
+from websocket import manager
+
+UPLOAD_URL_PREFIX = '/api/uploads/'
+
+
+def upload_url(path: str) -> str:
+    """URL of a file inside the uploads directory"""
+    return UPLOAD_URL_PREFIX + os.path.relpath(path, UPLOAD_DIR).replace(os.sep, '/')
+
+
+def upload_path(url: Optional[str]) -> Optional[str]:
+    """Local path of an /api/uploads/ URL, None for anything else"""
+    if not isinstance(url, str) or not url.startswith(UPLOAD_URL_PREFIX):
+        return None
+    relative = os.path.normpath(url[len(UPLOAD_URL_PREFIX):])
+    if relative.startswith('..') or os.path.isabs(relative):
+        return None
+    return os.path.join(UPLOAD_DIR, relative)
+
+
+class MediaPipeline:
+    """Renders avatar and image attachment thumbnails off the event loop.
+
+    Work runs in a process pool so image decoding never blocks requests.
+    Finished thumbnails are recorded as {size: url} under the user's
+    avatarThumbnails or the attachment's thumbnails and are served from the
+    uploads mount. Without Pillow the pipeline stays disabled and clients
+    keep using the full-size images.
+    """
+
+    def __init__(self, workers: int = MEDIA_WORKERS):
+        self.workers = workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.tasks: Set[asyncio.Task] = set()
+        # output path prefix -> render in flight, shared by identical requests
+        self.rendering: Dict[str, asyncio.Future] = {}
+
+    @property
+    def available(self) -> bool:
+        return self.executor is not None
+
+    def start(self) -> None:
+        """Start the worker pool"""
+        if self.executor is None and PILLOW_AVAILABLE:
+            # Spawned workers do not inherit the event loop or server threads
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+
+    async def shutdown(self) -> None:
+        """Cancel pending work and stop the worker pool"""
+        executor, self.executor = self.executor, None
+        for task in list(self.tasks):
+            task.cancel()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _spawn(self, coroutine) -> None:
+        try:
+            task = asyncio.get_running_loop().create_task(coroutine)
+        except RuntimeError:
+            # Called outside the server (scripts), thumbnails are backfilled on next start
+            coroutine.close()
+            return
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _render(self, source_path: str, output_dir: str, base_name: str,
+                      sizes: Iterable[int]) -> Optional[Dict[str, str]]:
+        """Render thumbnails in a worker, returns {size: url} or None on failure"""
+        executor = self.executor
+        if executor is None:
+            return None
+        key = os.path.join(output_dir, base_name)
+        pending = self.rendering.get(key)
+        if pending is None:
+            pending = asyncio.get_running_loop().run_in_executor(
+                executor, render_thumbnails, source_path, output_dir, base_name, tuple(sizes)
+            )
+            self.rendering[key] = pending
+            pending.add_done_callback(lambda _: self.rendering.pop(key, None))
+        try:
+            # Shielded so one cancelled waiter does not cancel the shared render
+            rendered = await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f'Error rendering thumbnails for {source_path}: {e}')
+            return None
+        return {str(size): upload_url(os.path.join(output_dir, name)) for size, name in sorted(rendered.items())}
+
+    def schedule_avatar(self, user: Dict[str, Any]) -> None:
+        """Queue thumbnails for a user's current avatar"""
+        if self.available:
+            self._spawn(self._avatar_thumbnails(user))
+
+    async def _avatar_thumbnails(self, user: Dict[str, Any], save: bool = True) -> bool:
+        avatar_url = user.get('avatar')
+        avatar = AvatarService.get_avatar_file(user)
+        if not avatar:
+            return False
+        base_name = f"{user['id']}-{avatar['hash']}"
+        thumbnails = await self._render(avatar['path'], AVATAR_THUMBNAIL_DIR, base_name, AVATAR_THUMBNAIL_SIZES)
+        if not thumbnails:
+            return False
+        if user.get('avatar') != avatar_url:
+            # Avatar was replaced or removed while rendering
+            AvatarService.delete_thumbnails(user['id'], keep=user.get('avatar'))
+            return False
+        user['avatarThumbnails'] = thumbnails
+        versions.bump('users', user['id'])
+        if save:
+            save_users()
+        return True
+
+    def schedule_attachment(self, message: Dict[str, Any], attachment: Dict[str, Any]) -> None:
+        """Queue thumbnails for an uploaded image attachment"""
+        if self.available and (attachment.get('mimeType') or '').startswith('image/'):
+            self._spawn(self._attachment_thumbnails(message, attachment))
+
+    async def _attachment_thumbnails(self, message: Dict[str, Any], attachment: Dict[str, Any],
+                                     save: bool = True) -> bool:
+        source_path = upload_path(attachment.get('url'))
+        if not source_path or not os.path.exists(source_path):
+            return False
+        base_name = os.path.splitext(os.path.basename(source_path))[0]
+        existing = {size: os.path.join(IMAGE_THUMBNAIL_DIR, thumbnail_name(base_name, size)) for size in IMAGE_THUMBNAIL_SIZES}
+        if all(os.path.exists(path) for path in existing.values()):
+            # Same content stored before (blobs are named by hash), reuse its thumbnails
+            thumbnails = {str(size): upload_url(path) for size, path in sorted(existing.items())}
+        else:
+            thumbnails = await self._render(source_path, IMAGE_THUMBNAIL_DIR, base_name, IMAGE_THUMBNAIL_SIZES)
+        if not thumbnails:
+            return False
+        attachment['thumbnails'] = thumbnails
+        participants = [message.get('fromUserId'), message.get('toUserId')]
+        versions.bump('messages', *participants)
+        if save:
+            save_messages()
+            for user_id in dict.fromkeys(participants):
+                await manager.send_personal_message({
+                    'type': 'attachment_thumbnails',
+                    'messageId': message['id'],
+                    'attachments': message['attachments']
+                }, user_id)
+        return True
+
+    def backfill(self, users: List[Dict[str, Any]], messages: List[Dict[str, Any]]) -> None:
+        """Queue thumbnails for avatars and image attachments that have none yet"""
+        if self.available:
+            self._spawn(self._backfill(users, messages))
+
+    async def _backfill(self, users: List[Dict[str, Any]], messages: List[Dict[str, Any]]) -> None:
+        user_jobs = [
+            self._avatar_thumbnails(user, save=False) for user in users
+            if AvatarService.is_avatar_url(user.get('avatar')) and not user.get('avatarThumbnails')
+        ]
+        message_jobs = [
+            self._attachment_thumbnails(message, attachment, save=False)
+            for message in messages
+            for attachment in message.get('attachments') or []
+            if isinstance(attachment, dict) and not attachment.get('thumbnails')
+            and (attachment.get('mimeType') or '').startswith('image/')
+        ]
+        if not user_jobs and not message_jobs:
+            return
+
+        # One save per file once everything is rendered
+        user_results = await asyncio.gather(*user_jobs)
+        message_results = await asyncio.gather(*message_jobs)
+        if any(user_results):
+            save_users()
+        if any(message_results):
+            save_messages()
+        print(f"Generated thumbnails for {sum(user_results)} avatars and {sum(message_results)} images")
+
+
+# Global media pipeline
+media_pipeline = MediaPipeline()
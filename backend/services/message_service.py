@@ -1,33 +1,41 @@
 """Message service for business logic"""
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 import uuid
 from datetime import datetime
 from database import messages, save_messages, FIRESTORE_SYNC_AVAILABLE, FIRESTORE_SYNC_MESSAGE
 from websocket import manager
+from utils.versions import versions
+from services.blob_store import blob_store
+from indexes import message_index
+from utils.projection import ALL_FIELDS, Projection, project
+
+MESSAGE_FIELDS = (
+    'id', 'fromUserId', 'toUserId', 'content', 'type', 'attachments', 'metadata',
+    'createdAt', 'status', 'read', 'readAt'
+)
+MESSAGE_PROJECTION_FIELDS = (ALL_FIELDS,) + MESSAGE_FIELDS
 
 
 class MessageService:
     """Service for message-related operations"""
     
     @staticmethod
-    def get_user_messages(user_id: str) -> List[Dict[str, Any]]:
-        """Get all messages for a user"""
-        user_messages = [
-            msg for msg in messages
-            if msg.get('fromUserId') == user_id or msg.get('toUserId') == user_id
-        ]
-        user_messages.sort(key=lambda x: x.get('createdAt', ''), reverse=True)
-        return user_messages
+    def get_user_messages(user_id: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Get all messages for a user, newest first, optionally only some fields of each"""
+        return list(MessageService.iter_user_messages(user_id, fields=fields))
     
     @staticmethod
-    def get_conversation(user_id: str, friend_id: str) -> List[Dict[str, Any]]:
-        """Get conversation between two users"""
-        conversation_messages = [
-            msg for msg in messages
-            if (msg.get('fromUserId') == user_id and msg.get('toUserId') == friend_id) or
-               (msg.get('fromUserId') == friend_id and msg.get('toUserId') == user_id)
-        ]
-        conversation_messages.sort(key=lambda x: x.get('createdAt', ''))
+    def iter_user_messages(user_id: str, fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Messages for a user, newest first, projected one at a time as they are consumed"""
+        for message in message_index.messages_of(user_id, newest_first=True):
+            yield Projection(message, fields) if fields else message
+    
+    @staticmethod
+    def get_conversation(user_id: str, friend_id: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Get conversation between two users, optionally only some fields of each message"""
+        conversation_messages = message_index.conversation(user_id, friend_id)
+        if fields:
+            return project(conversation_messages, fields)
         return conversation_messages
     
     @staticmethod
@@ -54,6 +62,9 @@ class MessageService:
         }
         
         messages.append(new_message)
+        message_index.add(new_message)
+        blob_store.retain(new_message)
+        versions.bump('messages', from_user_id, to_user_id)
         save_messages()
         
         # Firestore sync
@@ -72,6 +83,7 @@ class MessageService:
         # Update status to delivered if recipient is online
         if manager.is_user_online(to_user_id):
             new_message['status'] = 'delivered'
+            versions.bump('messages', from_user_id, to_user_id)
             save_messages()
         
         return new_message
@@ -86,6 +98,7 @@ class MessageService:
         message['read'] = True
         message['status'] = 'read'
         message['readAt'] = datetime.now().isoformat()
+        versions.bump('messages', message.get('fromUserId'), message.get('toUserId'))
         save_messages()
         
         # Firestore sync
@@ -116,6 +129,7 @@ class MessageService:
                 updated_count += 1
         
         if updated_count > 0:
+            versions.bump('messages', user_id, friend_id)
             save_messages()
             
             # Notify sender via WebSocket
@@ -0,0 +1,320 @@
+"""Upload service for streaming uploaded files to disk"""
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Any, Optional, AsyncIterator, BinaryIO, Tuple
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+from services.blob_store import blob_store
+from config import (
+    UPLOAD_TMP_DIR, MAX_FILE_SIZE, UPLOAD_READ_SIZE,
+    UPLOAD_SESSION_CHUNK_SIZE, UPLOAD_SESSION_TTL_HOURS
+)
+
+_SESSION_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+# Resumable upload sessions: upload_id -> session info (also stored as <id>.json)
+upload_sessions: Dict[str, Dict[str, Any]] = {}
+# upload_id -> (offset, running sha256), valid while the process lives
+_session_hashes: Dict[str, Any] = {}
+# upload_ids with a chunk being written right now
+_active_sessions = set()
+
+
+class UploadTooLargeError(ValueError):
+    """Upload exceeds the allowed or declared size"""
+
+
+class UploadOffsetError(ValueError):
+    """Chunk does not start where the stored upload ends"""
+
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+class UploadSessionNotFoundError(ValueError):
+    """Resumable upload session does not exist or has expired"""
+
+
+def _size_limit_message() -> str:
+    return f"File is too large. Maximum size: {MAX_FILE_SIZE // (1024 * 1024)}MB"
+
+
+class UploadService:
+    """Service for uploaded message attachments.
+
+    Uploads are streamed in UPLOAD_READ_SIZE chunks into UPLOAD_TMP_DIR while
+    being hashed and size-checked, then renamed into the blob store in one
+    step, so a file is never held in memory and never visible half-written.
+    Bytes that are already stored are dropped instead of written twice.
+    """
+
+    @staticmethod
+    def _tmp_path(name: str) -> str:
+        os.makedirs(UPLOAD_TMP_DIR, exist_ok=True)
+        return os.path.join(UPLOAD_TMP_DIR, name)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    async def _read_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+        while True:
+            chunk = await file.read(UPLOAD_READ_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+    @staticmethod
+    async def _write_chunks(chunks: AsyncIterator[bytes], out: BinaryIO, limit: int,
+                            hasher=None, too_large_message: Optional[str] = None) -> int:
+        """Write chunks to out, failing as soon as more than limit bytes arrive"""
+        written = 0
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            written += len(chunk)
+            if written > limit:
+                raise UploadTooLargeError(too_large_message or _size_limit_message())
+            out.write(chunk)
+            if hasher is not None:
+                hasher.update(chunk)
+        return written
+
+    @staticmethod
+    def _place(tmp_path: str, filename: Optional[str], mime_type: Optional[str], size: int,
+               content_hash: str) -> Dict[str, Any]:
+        """Move a finished upload into the blob store and describe it as an attachment"""
+        # Never trust client paths, only the last component is kept
+        filename = os.path.basename((filename or '').replace('\\', '/')) or 'file'
+        path = blob_store.store(tmp_path, content_hash, filename)
+        return {
+            "filename": filename,
+            "url": blob_store.url(path),
+            "size": size,
+            "mimeType": mime_type or "application/octet-stream",
+            "sha256": content_hash
+        }
+
+    @staticmethod
+    async def save_upload(file: UploadFile) -> Dict[str, Any]:
+        """Stream an uploaded file to disk and return its attachment"""
+        tmp_path = UploadService._tmp_path(f'{uuid.uuid4().hex}.part')
+        hasher = hashlib.sha256()
+        try:
+            with open(tmp_path, 'wb') as out:
+                size = await UploadService._write_chunks(
+                    UploadService._read_chunks(file), out, MAX_FILE_SIZE, hasher
+                )
+            return UploadService._place(
+                tmp_path, file.filename, file.content_type, size, hasher.hexdigest()
+            )
+        except BaseException:
+            UploadService._remove(tmp_path)
+            raise
+
+    # Resumable uploads
+
+    @staticmethod
+    def _session_paths(upload_id: str):
+        return UploadService._tmp_path(f'{upload_id}.json'), UploadService._tmp_path(f'{upload_id}.data')
+
+    @staticmethod
+    def _save_session(session: Dict[str, Any]) -> None:
+        session['updatedAt'] = time.time()
+        meta_path, _ = UploadService._session_paths(session['id'])
+        with open(f'{meta_path}.tmp', 'w', encoding='utf-8') as f:
+            json.dump(session, f, ensure_ascii=False)
+        os.replace(f'{meta_path}.tmp', meta_path)
+
+    @staticmethod
+    def _drop_session(upload_id: str) -> None:
+        upload_sessions.pop(upload_id, None)
+        _session_hashes.pop(upload_id, None)
+        for path in UploadService._session_paths(upload_id):
+            UploadService._remove(path)
+
+    @staticmethod
+    def session_status(session: Dict[str, Any]) -> Dict[str, Any]:
+        """Public view of a session, offset is where the next chunk must start"""
+        _, data_path = UploadService._session_paths(session['id'])
+        offset = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+        return {
+            'uploadId': session['id'],
+            'filename': session['filename'],
+            'size': session['size'],
+            'offset': offset,
+            'chunkSize': UPLOAD_SESSION_CHUNK_SIZE,
+            'complete': offset == session['size']
+        }
+
+    @staticmethod
+    def create_session(from_user_id: str, to_user_id: str, filename: str, size: int,
+                       mime_type: Optional[str] = None, message_type: str = "file",
+                       content: Optional[str] = None,
+                       metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Start a resumable upload of size bytes"""
+        if size <= 0:
+            raise ValueError("File size must be positive")
+        if size > MAX_FILE_SIZE:
+            raise UploadTooLargeError(_size_limit_message())
+
+        session = {
+            'id': uuid.uuid4().hex,
+            'fromUserId': from_user_id,
+            'toUserId': to_user_id,
+            'filename': filename,
+            'size': size,
+            'mimeType': mime_type,
+            'messageType': message_type,
+            'content': content,
+            'metadata': metadata or {},
+            'createdAt': datetime.now().isoformat()
+        }
+        _, data_path = UploadService._session_paths(session['id'])
+        open(data_path, 'wb').close()
+        UploadService._save_session(session)
+        upload_sessions[session['id']] = session
+        _session_hashes[session['id']] = (0, hashlib.sha256())
+        return session
+
+    @staticmethod
+    def get_session(upload_id: str) -> Dict[str, Any]:
+        """Get a session, loading it from disk after a restart"""
+        session = upload_sessions.get(upload_id)
+        if session is not None:
+            return session
+        if not _SESSION_ID_RE.match(upload_id or ''):
+            raise UploadSessionNotFoundError("Upload not found")
+        meta_path, data_path = UploadService._session_paths(upload_id)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            raise UploadSessionNotFoundError("Upload not found")
+        if not os.path.exists(data_path):
+            UploadService._drop_session(upload_id)
+            raise UploadSessionNotFoundError("Upload not found")
+        upload_sessions[upload_id] = session
+        return session
+
+    @staticmethod
+    async def append_chunk(upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """Append a chunk starting at offset, returns the new status.
+
+        Bytes written before a dropped connection are kept, the client
+        resumes from the offset reported by the session status.
+        """
+        session = UploadService.get_session(upload_id)
+        _, data_path = UploadService._session_paths(upload_id)
+        current = os.path.getsize(data_path)
+        if upload_id in _active_sessions:
+            raise UploadOffsetError("Another chunk is being uploaded", current)
+        if offset != current:
+            raise UploadOffsetError(f"Expected chunk at offset {current}", current)
+
+        hashed_offset, hasher = _session_hashes.get(upload_id, (None, None))
+        if hashed_offset != current:
+            # Lost after a restart, recomputed when the upload is finalized
+            hasher = None
+
+        _active_sessions.add(upload_id)
+        try:
+            with open(data_path, 'ab') as out:
+                try:
+                    await UploadService._write_chunks(
+                        chunks, out, session['size'] - current, hasher,
+                        too_large_message="Chunk exceeds the declared file size"
+                    )
+                finally:
+                    out.flush()
+                    written = out.tell()
+                    if hasher is not None:
+                        _session_hashes[upload_id] = (written, hasher)
+                    else:
+                        _session_hashes.pop(upload_id, None)
+            UploadService._save_session(session)
+        finally:
+            _active_sessions.discard(upload_id)
+        return UploadService.session_status(session)
+
+    @staticmethod
+    def _file_hash(path: str) -> str:
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(UPLOAD_READ_SIZE), b''):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    @staticmethod
+    async def complete_session(upload_id: str, sha256: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Finish an upload, returns (session, attachment).
+
+        If the client sends the sha256 of the whole file it is checked
+        against the stored bytes and a mismatching upload is discarded.
+        """
+        session = UploadService.get_session(upload_id)
+        _, data_path = UploadService._session_paths(upload_id)
+        size = os.path.getsize(data_path)
+        if upload_id in _active_sessions or size != session['size']:
+            raise UploadOffsetError("Upload is not complete", size)
+
+        hashed_offset, hasher = _session_hashes.get(upload_id, (None, None))
+        if hashed_offset == size:
+            content_hash = hasher.hexdigest()
+        else:
+            content_hash = await run_in_threadpool(UploadService._file_hash, data_path)
+
+        if sha256 and sha256.lower() != content_hash:
+            UploadService._drop_session(upload_id)
+            raise ValueError("Checksum mismatch, upload discarded")
+
+        attachment = UploadService._place(
+            data_path, session['filename'], session.get('mimeType'), size, content_hash
+        )
+        UploadService._drop_session(upload_id)
+        return session, attachment
+
+    @staticmethod
+    def abort_session(upload_id: str) -> None:
+        """Cancel an upload and remove its data"""
+        UploadService.get_session(upload_id)
+        if upload_id in _active_sessions:
+            raise UploadOffsetError("A chunk is being uploaded", 0)
+        UploadService._drop_session(upload_id)
+
+    @staticmethod
+    def expire_sessions() -> int:
+        """Remove stale sessions and leftovers of interrupted uploads, returns the number removed"""
+        if not os.path.isdir(UPLOAD_TMP_DIR):
+            return 0
+        cutoff = time.time() - UPLOAD_SESSION_TTL_HOURS * 3600
+        removed = 0
+        for name in os.listdir(UPLOAD_TMP_DIR):
+            upload_id = name.split('.', 1)[0]
+            if upload_id in _active_sessions:
+                continue
+            if name.endswith('.data') and os.path.exists(os.path.join(UPLOAD_TMP_DIR, f'{upload_id}.json')):
+                # Removed together with its session
+                continue
+            path = os.path.join(UPLOAD_TMP_DIR, name)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+            except OSError:
+                continue
+            if name.endswith('.json'):
+                UploadService._drop_session(upload_id)
+            else:
+                UploadService._remove(path)
+            removed += 1
+        return removed
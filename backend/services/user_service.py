@@ -4,6 +4,16 @@ import uuid
 import random
 from database import users, passwords, save_users, save_passwords
 from utils.validators import validate_email
+from indexes import user_index
+from utils.versions import versions
+from services.avatar_service import AvatarService
+from services.media_pipeline import media_pipeline
+from services.code_service import CodeService
+from utils.projection import ALL_FIELDS, Projection, project
+
+# Profile fields shown to other users (search results, friend lists)
+PUBLIC_USER_FIELDS = ('id', 'username', 'email', 'avatar', 'avatarThumbnails')
+USER_PROJECTION_FIELDS = (ALL_FIELDS,) + PUBLIC_USER_FIELDS
 
 
 class UserService:
@@ -15,24 +25,8 @@ class UserService:
         if not user_id:
             return None
         
-        search_id = user_id.strip()
-        # Normalize the search ID to 12 digits with leading zeros if it's numeric
-        normalized_search_id = search_id.zfill(12) if search_id.isdigit() else search_id
-        
-        # Search through users, normalizing each ID for comparison
-        for u in users:
-            stored_id = str(u.get('id', ''))
-            # Normalize stored ID to 12 digits with leading zeros if it's numeric
-            normalized_stored_id = stored_id.zfill(12) if stored_id.isdigit() else stored_id
-            
-            # Match using normalized IDs (handles leading zero differences)
-            if normalized_stored_id == normalized_search_id:
-                return u
-            # Fallback: direct match (for non-numeric IDs or exact matches)
-            if stored_id == search_id:
-                return u
-        
-        return None
+        # The index matches exact IDs first, then IDs normalized to 12 digits
+        return user_index.get(user_id)
     
     @staticmethod
     def find_user_by_username(username: str) -> Optional[Dict[str, Any]]:
@@ -89,6 +83,8 @@ class UserService:
         }
         
         users.append(new_user)
+        user_index.add(new_user)
+        versions.bump('users', user_id)
         
         # Only save password if it's provided and not empty
         if password and password.strip():
@@ -102,6 +98,7 @@ class UserService:
             # Remove user from list if save failed
             if new_user in users:
                 users.remove(new_user)
+            user_index.remove(user_id)
             raise Exception(f"Failed to save user to database: {str(e)}")
         
         return new_user
@@ -132,8 +129,10 @@ class UserService:
         if not user:
             raise ValueError("User not found")
         
-        if username is not None and username.strip():
+        renamed = False
+        if username is not None and username.strip() and username.strip() != user['username']:
             user['username'] = username.strip()
+            renamed = True
         
         if email is not None and email.strip():
             email_taken = next((u for u in users if u['id'] != user['id'] and u['email'] == email.strip()), None)
@@ -143,13 +142,27 @@ class UserService:
         
         if avatar is not None:
             if avatar == '' or avatar is None:
+                AvatarService.delete_avatar(user['id'])
                 user['avatar'] = None
+                user.pop('avatarThumbnails', None)
             elif isinstance(avatar, str) and avatar.startswith('data:image'):
-                user['avatar'] = avatar
+                avatar_url = AvatarService.store_data_uri(user['id'], avatar)
+                if avatar_url != user.get('avatar'):
+                    user['avatar'] = avatar_url
+                    user.pop('avatarThumbnails', None)
+                    media_pipeline.schedule_avatar(user)
+            elif AvatarService.is_current_avatar(user, avatar):
+                # Client echoed the current avatar URL back, nothing to change
+                pass
             else:
                 raise ValueError("Invalid avatar format")
         
+        user_index.update(user)
+        versions.bump('users', user['id'])
         save_users()
+        if renamed:
+            # Codes and comments keep the author's id, only the name shown changes
+            CodeService.rename_author(user['id'], user['username'])
         return user
     
     @staticmethod
@@ -169,6 +182,9 @@ class UserService:
         
         # Delete user from users array
         users.remove(user)
+        user_index.remove(user_id_to_delete)
+        AvatarService.delete_avatar(user_id_to_delete)
+        versions.bump('users', user_id_to_delete)
         save_users()
         
         # Delete password
@@ -179,53 +195,35 @@ class UserService:
         return user_id_to_delete, user['username']
     
     @staticmethod
-    def search_users(query: str) -> List[Dict[str, Any]]:
-        """Search users by username, email, or ID"""
+    def search_users(query: str, limit: Optional[int] = None,
+                     fields: Optional[List[str]] = None) -> List[Projection]:
+        """Search users by username, email, or ID (exact, then prefix, then partial matches)"""
         if not query or len(query.strip()) < 1:
             return []
         
-        search_term = query.strip()
-        search_term_lower = search_term.lower()
-        
-        # Check if query is numeric (ID search)
-        is_numeric_query = search_term.isdigit()
-        
-        # Normalize numeric search term to 12 digits
-        normalized_search_id = None
-        if is_numeric_query:
-            normalized_search_id = search_term.zfill(12)
-        
-        matching_users = []
-        for user in users:
-            matched = False
-            stored_id = str(user.get('id', ''))
-            
-            # Exact ID match if query is numeric (with normalization)
-            if is_numeric_query:
-                # Normalize stored ID for comparison
-                normalized_stored_id = stored_id.zfill(12) if stored_id.isdigit() else stored_id
-                if normalized_stored_id == normalized_search_id or stored_id == search_term:
-                    matched = True
-                # Partial ID match
-                elif normalized_search_id in normalized_stored_id or search_term in stored_id:
-                    matched = True
-            # Partial match for username or email
-            elif not is_numeric_query:
-                user_email = user.get('email', '').strip().lower()
-                user_username = user.get('username', '').strip().lower()
-                if search_term_lower in user_username or search_term_lower in user_email:
-                    matched = True
-            # Partial ID match (for non-numeric queries that might contain numbers)
-            elif search_term_lower in stored_id.lower():
-                matched = True
-            
-            if matched:
-                matching_users.append({
-                    'id': user['id'],
-                    'username': user['username'],
-                    'email': user['email'],
-                    'avatar': user.get('avatar')
-                })
-        
-        return matching_users
-
+        return project(user_index.search(query, limit=limit), fields or PUBLIC_USER_FIELDS)
+    
+    @staticmethod
+    def project_user(user: Dict[str, Any], fields: Optional[List[str]] = None) -> Projection:
+        """A user restricted to fields"""
+        return Projection(user, fields or [ALL_FIELDS])
+    
+    @staticmethod
+    def get_users_by_ids(user_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Resolve many user IDs at once, for authors, likers and chat partners.
+        
+        Results follow the order of user_ids, with None where an ID is
+        unknown; those IDs are also listed in missing. Users carry their
+        public profile fields unless fields says otherwise.
+        """
+        fields = fields or PUBLIC_USER_FIELDS
+        results = []
+        missing = []
+        for user_id in user_ids:
+            user = user_index.get(user_id) if user_id else None
+            if user:
+                results.append(Projection(user, fields))
+            else:
+                results.append(None)
+                missing.append(user_id)
+        return {'results': results, 'missing': missing}
@@ -1,5 +1,9 @@
 """Utility functions"""
-from .validators import validate_email, validate_file_on_server
+from .validators import validate_email, validate_file_on_server, validate_file_on_server_async
+from .versions import VersionRegistry, versions
 
-__all__ = ["validate_email", "validate_file_on_server"]
+__all__ = [
+    "validate_email", "validate_file_on_server", "validate_file_on_server_async",
+    "VersionRegistry", "versions"
+]
 
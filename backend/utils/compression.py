@@ -0,0 +1,257 @@
+"""Negotiated response compression"""
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from config import (
+    COMPRESSION_ENCODINGS, COMPRESSION_LEVELS, COMPRESSION_MIN_SIZE,
+    COMPRESSION_THREAD_THRESHOLD, COMPRESSION_CACHE_BYTES, COMPRESSIBLE_TYPES
+)
+
+# brotli and zstandard are optional, gzip is always available
+try:
+    import brotli
+except ImportError:
+    brotli = None
+    print("Warning: brotli not available. Responses will not be compressed with br.")
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+    print("Warning: zstandard not available. Responses will not be compressed with zstd.")
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        # Sync flush so every streamed chunk can be decoded as it arrives
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b'') -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b'') -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, data: bytes = b'') -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+ENCODERS = {'gzip': _GzipEncoder}
+if brotli is not None:
+    ENCODERS['br'] = _BrotliEncoder
+if zstandard is not None:
+    ENCODERS['zstd'] = _ZstdEncoder
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """The preferred available encoding the client accepts, None for identity"""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    wildcard = accepted.get('*', 0.0)
+    for encoding in COMPRESSION_ENCODINGS:
+        if encoding in ENCODERS and accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress a whole body"""
+    return ENCODERS[encoding](COMPRESSION_LEVELS[encoding]).finish(data)
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.split(';')[0].strip().lower().startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressedBodyCache:
+    """Compressed bodies by (ETag, encoding), least recently used dropped first.
+
+    An ETag names exactly one body of one URL, so a repeated fetch of an
+    unchanged code costs a dictionary lookup instead of a compression.
+    """
+
+    def __init__(self, max_bytes: int = COMPRESSION_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: 'OrderedDict[Tuple[str, str], bytes]' = OrderedDict()
+
+    def get(self, etag: str, encoding: str) -> Optional[bytes]:
+        key = (etag, encoding)
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+        return body
+
+    def put(self, etag: str, encoding: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        key = (etag, encoding)
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self._entries[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, dropped = self._entries.popitem(last=False)
+            self.size -= len(dropped)
+
+
+class CompressionMiddleware:
+    """Compress text responses with gzip, br or zstd as negotiated.
+
+    Bodies below COMPRESSION_MIN_SIZE, types outside COMPRESSIBLE_TYPES,
+    already encoded responses and file responses with byte ranges are sent
+    as they are. Large bodies are compressed in the thread pool, streamed
+    bodies chunk by chunk. A compressed response gets a weak ETag, which
+    the conditional GET checks still match.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE,
+                 cache: Optional[CompressedBodyCache] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache if cache is not None else CompressedBodyCache()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or scope['method'] == 'HEAD':
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self, encoding, send).run(scope, receive)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[Message] = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def run(self, scope: Scope, receive: Receive) -> None:
+        await self.middleware.app(scope, receive, self.wrapped_send)
+
+    def _eligible(self, message: Message) -> bool:
+        headers = Headers(raw=message['headers'])
+        return (
+            message['status'] not in (204, 206, 304)
+            and 'content-encoding' not in headers
+            and 'accept-ranges' not in headers
+            and is_compressible(headers.get('content-type', ''))
+        )
+
+    def _encoded_headers(self, start: Message, length: Optional[int]) -> None:
+        headers = MutableHeaders(raw=start['headers'])
+        headers['Content-Encoding'] = self.encoding
+        if length is None:
+            del headers['Content-Length']
+        else:
+            headers['Content-Length'] = str(length)
+        etag = headers.get('etag')
+        if etag and not etag.startswith('W/'):
+            headers['ETag'] = f'W/{etag}'
+        headers.add_vary_header('Accept-Encoding')
+
+    async def _compress(self, body: bytes) -> bytes:
+        if len(body) >= COMPRESSION_THREAD_THRESHOLD:
+            return await run_in_threadpool(compress, body, self.encoding)
+        return compress(body, self.encoding)
+
+    async def _chunk(self, body: bytes, final: bool) -> bytes:
+        method = self.encoder.finish if final else self.encoder.chunk
+        if len(body) >= COMPRESSION_THREAD_THRESHOLD:
+            return await run_in_threadpool(method, body)
+        return method(body)
+
+    async def wrapped_send(self, message: Message) -> None:
+        message_type = message['type']
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        if message_type == 'http.response.start':
+            if self._eligible(message):
+                self.start = message
+            else:
+                self.passthrough = True
+                await self.send(message)
+            return
+
+        if message_type != 'http.response.body':
+            # Extensions such as pathsend carry no body to compress
+            self.passthrough = True
+            if self.start is not None:
+                await self.send(self.start)
+                self.start = None
+            await self.send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if self.start is not None and not more_body:
+            # Whole body in one message
+            start, self.start = self.start, None
+            if len(body) < self.middleware.minimum_size:
+                MutableHeaders(raw=start['headers']).add_vary_header('Accept-Encoding')
+                await self.send(start)
+                await self.send(message)
+                return
+            etag = Headers(raw=start['headers']).get('etag')
+            cacheable = start['status'] == 200 and etag is not None and not etag.startswith('W/')
+            compressed = self.middleware.cache.get(etag, self.encoding) if cacheable else None
+            if compressed is None:
+                compressed = await self._compress(body)
+                if cacheable:
+                    self.middleware.cache.put(etag, self.encoding, compressed)
+            self._encoded_headers(start, len(compressed))
+            await self.send(start)
+            await self.send({'type': 'http.response.body', 'body': compressed})
+            return
+
+        if self.start is not None:
+            # First chunk of a streamed body
+            start, self.start = self.start, None
+            self.encoder = ENCODERS[self.encoding](COMPRESSION_LEVELS[self.encoding])
+            self._encoded_headers(start, None)
+            await self.send(start)
+
+        await self.send({
+            'type': 'http.response.body',
+            'body': await self._chunk(body, not more_body),
+            'more_body': more_body
+        })
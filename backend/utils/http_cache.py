@@ -0,0 +1,31 @@
+"""HTTP validator helpers for conditional GET"""
+import hashlib
+from typing import Any
+from fastapi import Request, Response
+from utils.versions import versions
+
+# Content-addressed URLs never change content, a year is the conventional "forever"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def make_etag(*parts: Any) -> str:
+    """Build a strong ETag from version numbers and request parameters"""
+    digest = hashlib.blake2b(repr((versions.epoch,) + parts).encode('utf-8'), digest_size=12)
+    return f'"{digest.hexdigest()}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Check whether the client's If-None-Match already holds etag"""
+    if_none_match = request.headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return any((tag[2:] if tag.startswith('W/') else tag) == etag for tag in candidates)
+
+
+def not_modified(etag: str) -> Response:
+    """Empty 304 response carrying the validator"""
+    return Response(status_code=304, headers={'ETag': etag})
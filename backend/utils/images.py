@@ -0,0 +1,49 @@
+"""Image thumbnail rendering (runs inside media worker processes)"""
+import os
+from typing import Dict, Iterable
+
+# Pillow is optional, without it no thumbnails are generated and clients
+# keep using the full-size images
+try:
+    from PIL import Image, ImageOps
+    PILLOW_AVAILABLE = True
+except ImportError:
+    Image = None
+    ImageOps = None
+    PILLOW_AVAILABLE = False
+    print("Warning: Pillow not available. Image thumbnails will be disabled.")
+
+THUMBNAIL_FORMAT = 'WEBP'
+THUMBNAIL_EXTENSION = '.webp'
+THUMBNAIL_QUALITY = 80
+
+
+def thumbnail_name(base_name: str, size: int) -> str:
+    """File name of the thumbnail of base_name at size"""
+    return f'{base_name}_{size}{THUMBNAIL_EXTENSION}'
+
+
+def render_thumbnails(source_path: str, output_dir: str, base_name: str,
+                      sizes: Iterable[int]) -> Dict[int, str]:
+    """Write thumbnails of an image fitting size x size boxes.
+
+    Images are never upscaled, animated images use their first frame.
+    Returns size -> thumbnail file name inside output_dir.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    thumbnails = {}
+    with Image.open(source_path) as image:
+        image.seek(0)
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.getbands() else 'RGB')
+        for size in sorted(sizes, reverse=True):
+            # Each size is downscaled from the previous one, the biggest from the source
+            image.thumbnail((size, size), Image.LANCZOS)
+            name = thumbnail_name(base_name, size)
+            path = os.path.join(output_dir, name)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            image.save(tmp_path, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+            os.replace(tmp_path, path)
+            thumbnails[size] = name
+    return thumbnails
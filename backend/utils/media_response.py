@@ -0,0 +1,128 @@
+"""File response with byte ranges and zero-copy delivery"""
+import re
+from typing import Optional, Tuple
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, PlainTextResponse
+from starlette.types import Scope, Receive, Send
+
+# Read size when the server cannot send files itself
+MEDIA_CHUNK_SIZE = 1024 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    """Requested byte range lies outside the file"""
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single byte range into [start, end).
+
+    None means there is no single range to serve: no header, or multiple
+    ranges, which media players never ask for and are left to FileResponse.
+    """
+    if not range_header:
+        return None
+    match = _RANGE_RE.match(range_header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size
+    start = int(first)
+    end = min(int(last) + 1, size) if last else size
+    if start >= size or start >= end:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+class MediaFileResponse(FileResponse):
+    """FileResponse that serves single byte ranges itself.
+
+    When the ASGI server offers the http.response.zerocopysend extension the
+    kernel copies the file straight to the socket (sendfile), otherwise the
+    file is streamed in MEDIA_CHUNK_SIZE reads and dropped as soon as the
+    client disconnects, so aborted video seeks stop reading early.
+    Requires stat_result to be passed in.
+    """
+
+    chunk_size = MEDIA_CHUNK_SIZE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        extensions = scope.get('extensions') or {}
+        zerocopy = 'http.response.zerocopysend' in extensions
+        headers = Headers(scope=scope)
+        size = self.stat_result.st_size
+
+        byte_range = None
+        if self.status_code == 200 and self._range_applies(headers.get('if-range')):
+            try:
+                byte_range = parse_range(headers.get('range'), size)
+            except RangeNotSatisfiable:
+                response = PlainTextResponse(status_code=416, headers={'Content-Range': f'bytes */{size}'})
+                return await response(scope, receive, send)
+
+        if byte_range is None and not zerocopy:
+            # Plain full-file responses, including pathsend, are left to Starlette
+            return await super().__call__(scope, receive, send)
+
+        status_code = self.status_code
+        start, end = 0, size
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = 206
+            self.headers['content-range'] = f'bytes {start}-{end - 1}/{size}'
+            self.headers['content-length'] = str(end - start)
+
+        await send({'type': 'http.response.start', 'status': status_code, 'headers': self.raw_headers})
+        if scope['method'].upper() == 'HEAD' or start == end:
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        elif zerocopy:
+            with open(self.path, 'rb') as file:
+                await send({
+                    'type': 'http.response.zerocopysend',
+                    'file': file,
+                    'offset': start,
+                    'count': end - start,
+                    'more_body': False
+                })
+        else:
+            await self._stream_until_disconnect(receive, send, start, end)
+
+        if self.background is not None:
+            await self.background()
+
+    def _range_applies(self, if_range: Optional[str]) -> bool:
+        """If-Range: only send a part if the client's copy is still current"""
+        if if_range is None:
+            return True
+        return if_range == self.headers.get('etag') or if_range == self.headers.get('last-modified')
+
+    async def _stream_until_disconnect(self, receive: Receive, send: Send, start: int, end: int) -> None:
+        async with anyio.create_task_group() as task_group:
+            async def stream_range() -> None:
+                async with await anyio.open_file(self.path, mode='rb') as file:
+                    await file.seek(start)
+                    remaining = end - start
+                    while remaining > 0:
+                        chunk = await file.read(min(self.chunk_size, remaining))
+                        if not chunk:
+                            break
+                        remaining -= len(chunk)
+                        await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+                    if remaining > 0:
+                        # File shrank underneath us, end the response cleanly
+                        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+                task_group.cancel_scope.cancel()
+
+            task_group.start_soon(stream_range)
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    task_group.cancel_scope.cancel()
+                    break
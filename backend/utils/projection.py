@@ -0,0 +1,117 @@
+"""Field projection applied while responses are serialized"""
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from utils.serialization import FastJSONResponse, dumps
+
+# In a fields list, every stored field of the record
+ALL_FIELDS = '*'
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+# Streamed lines are sent in chunks of about this many bytes
+NDJSON_CHUNK_SIZE = 64 * 1024
+
+# Computed field name -> function of the record
+DerivedFields = Dict[str, Callable[[Dict[str, Any]], Any]]
+
+
+class Projection:
+    """A record that renders as only some of its fields.
+
+    Making one copies nothing: the selected and derived fields are read from
+    the stored record while ProjectedJSONResponse serializes the body.
+    """
+
+    __slots__ = ('record', 'fields', 'derived', 'omit', 'extra')
+
+    def __init__(self, record: Dict[str, Any], fields: Sequence[str], derived: Optional[DerivedFields] = None,
+                 omit: Iterable[str] = (), extra: Optional[Dict[str, Any]] = None):
+        self.record = record
+        self.fields = fields
+        self.derived = derived or {}
+        # Left out of ALL_FIELDS, still returned when asked for by name
+        self.omit = omit
+        # Request-specific values, such as a search score
+        self.extra = extra
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {}
+        for name in self.fields:
+            if name == ALL_FIELDS:
+                data.update((key, value) for key, value in self.record.items() if key not in self.omit)
+            elif name in self.derived:
+                data[name] = self.derived[name](self.record)
+            elif name in self.record:
+                data[name] = self.record[name]
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+def parse_fields(fields: Optional[str], known: Iterable[str]) -> Optional[List[str]]:
+    """Names from a comma separated fields= parameter, None when it is absent"""
+    if fields is None:
+        return None
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    known = set(known)
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(sorted(known))}")
+    return names
+
+
+def project(records: Iterable[Dict[str, Any]], fields: Sequence[str], derived: Optional[DerivedFields] = None,
+            omit: Iterable[str] = ()) -> List[Projection]:
+    """Projections of records sharing one field selection"""
+    return [Projection(record, fields, derived, omit) for record in records]
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, Projection):
+        return value.to_dict()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+class ProjectedJSONResponse(FastJSONResponse):
+    """JSON response that renders Projection objects at any depth.
+
+    Content must otherwise be plain JSON data, as loaded from the data
+    files; it goes straight to the serializer without jsonable_encoder.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content, default=_encode)
+
+
+def wants_ndjson(request: Request, stream: bool = False) -> bool:
+    """Whether a listing should be streamed, by ?stream=1 or Accept: application/x-ndjson"""
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get('accept', '')
+
+
+async def _ndjson_chunks(records: Iterable[Any]) -> AsyncIterator[bytes]:
+    lines = []
+    size = 0
+    for record in records:
+        line = dumps(record, default=_encode) + b'\n'
+        lines.append(line)
+        size += len(line)
+        if size >= NDJSON_CHUNK_SIZE:
+            yield b''.join(lines)
+            lines = []
+            size = 0
+    if lines:
+        yield b''.join(lines)
+
+
+class ProjectedNDJSONResponse(StreamingResponse):
+    """Records streamed as newline delimited JSON, one record per line.
+
+    Each record is encoded only when its chunk is about to be sent, so the
+    first bytes go out at once and memory holds one chunk rather than the
+    whole listing. Records may be Projections, as in ProjectedJSONResponse.
+    """
+
+    def __init__(self, records: Iterable[Any], status_code: int = 200, headers: Optional[Dict[str, str]] = None):
+        super().__init__(_ndjson_chunks(records), status_code=status_code, headers=headers,
+                         media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,131 @@
+"""Serialized GET responses kept until the data they were built from changes"""
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Sequence, Set, Tuple
+from fastapi import Response
+from config import RESPONSE_CACHE_BYTES, RESPONSE_CACHE_MAX_ENTRY_BYTES
+from utils.versions import VersionRegistry, versions
+
+# What a response was built from: (collection, record_id) for one record,
+# (collection, None) for anything in the collection. These are the same
+# versions the route puts into its ETag.
+Dependency = Tuple[str, Optional[str]]
+
+
+class CachedResponse:
+    """Rendered body and headers of a response, replayed without the service"""
+
+    __slots__ = ('body', 'media_type', 'headers', 'dependencies')
+
+    def __init__(self, body: bytes, media_type: Optional[str], headers: Dict[str, str],
+                 dependencies: Sequence[Dependency]):
+        self.body = body
+        self.media_type = media_type
+        self.headers = headers
+        self.dependencies = dependencies
+
+    def response(self) -> Response:
+        return Response(self.body, media_type=self.media_type, headers=self.headers)
+
+
+class ResponseCache:
+    """In-process cache of serialized responses keyed by route and parameters.
+
+    Entries list the collections and records they depend on. The cache
+    listens to the version registry and drops an entry as soon as one of
+    them is bumped, so a hit is always what the service would build now.
+    Least recently used entries go first once max_bytes is reached.
+    """
+
+    def __init__(self, registry: VersionRegistry = versions, max_bytes: int = RESPONSE_CACHE_BYTES,
+                 max_entry_bytes: int = RESPONSE_CACHE_MAX_ENTRY_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.size = 0
+        self.entries: 'OrderedDict[Hashable, CachedResponse]' = OrderedDict()
+        self.dependents: Dict[Dependency, Set[Hashable]] = defaultdict(set)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        registry.add_listener(self._on_change)
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Hashable, response: Response, dependencies: Iterable[Dependency]) -> CachedResponse:
+        """Keep a rendered response, return it as a cache entry either way"""
+        headers = {
+            name: value for name, value in response.headers.items()
+            if name not in ('content-length', 'content-type')
+        }
+        entry = CachedResponse(response.body, response.media_type, headers, tuple(dependencies))
+        if response.status_code != 200 or len(entry.body) > self.max_entry_bytes:
+            return entry
+        self._remove(key)
+        self.entries[key] = entry
+        self.size += len(entry.body)
+        for dependency in entry.dependencies:
+            self.dependents[dependency].add(key)
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+        return entry
+
+    def fetch(self, key: Hashable, dependencies: Iterable[Dependency],
+              build: Callable[[], Response]) -> CachedResponse:
+        """Cached entry for key, built and stored on a miss"""
+        entry = self.get(key)
+        if entry is None:
+            entry = self.put(key, build(), dependencies)
+        return entry
+
+    def _remove(self, key: Hashable) -> bool:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        self.size -= len(entry.body)
+        for dependency in entry.dependencies:
+            keys = self.dependents.get(dependency)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.dependents[dependency]
+        return True
+
+    def _on_change(self, collection: str, record_ids: Optional[Sequence[str]]) -> None:
+        if record_ids is None:
+            dependencies = [dependency for dependency in self.dependents if dependency[0] == collection]
+        else:
+            dependencies = [(collection, None)] + [(collection, record_id) for record_id in record_ids]
+        for dependency in dependencies:
+            for key in list(self.dependents.get(dependency, ())):
+                if self._remove(key):
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.dependents.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes': self.size,
+            'maxBytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+
+# Global response cache
+response_cache = ResponseCache()
@@ -0,0 +1,105 @@
+"""JSON encoding for API responses and data files"""
+import json
+import os
+from typing import Any, Callable, Optional
+from fastapi.responses import JSONResponse
+from config import JSON_SERIALIZER, DATA_FILE_INDENT
+
+# orjson is optional, it encodes and parses several times faster than the
+# standard json module which is used without it
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+    print("Warning: orjson not available. JSON will be encoded with the standard json module.")
+
+# Called with objects the encoder does not know, returns something it does
+Default = Optional[Callable[[Any], Any]]
+
+
+class StdlibSerializer:
+    """Serializer on the standard json module"""
+
+    name = 'json'
+
+    def dumps(self, obj: Any, default: Default = None, indent: bool = False) -> bytes:
+        return json.dumps(
+            obj,
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=2 if indent else None,
+            separators=None if indent else (',', ':'),
+            default=default
+        ).encode('utf-8')
+
+    def loads(self, data: Any) -> Any:
+        return json.loads(data)
+
+
+class OrjsonSerializer:
+    """Serializer on orjson.
+
+    Output matches StdlibSerializer for the data this app stores: UTF-8
+    without escapes, non-string keys turned into strings, two space indent.
+    """
+
+    name = 'orjson'
+
+    def dumps(self, obj: Any, default: Default = None, indent: bool = False) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=default, option=option)
+
+    def loads(self, data: Any) -> Any:
+        return orjson.loads(data)
+
+
+def get_serializer(name: str = 'auto'):
+    """Serializer by name: 'orjson', 'json', or 'auto' for orjson when installed"""
+    if name == 'json' or (name == 'auto' and not ORJSON_AVAILABLE):
+        return StdlibSerializer()
+    if name in ('orjson', 'auto'):
+        if not ORJSON_AVAILABLE:
+            raise ValueError('orjson is not installed')
+        return OrjsonSerializer()
+    raise ValueError(f'Unknown JSON serializer: {name}')
+
+
+serializer = get_serializer(JSON_SERIALIZER)
+
+
+def dumps(obj: Any, default: Default = None, indent: bool = False) -> bytes:
+    """Encode obj as UTF-8 JSON, compact unless indent"""
+    return serializer.dumps(obj, default=default, indent=indent)
+
+
+def loads(data: Any) -> Any:
+    """Parse JSON from bytes or str"""
+    return serializer.loads(data)
+
+
+def read_json(path: str) -> Any:
+    """Parse a JSON data file"""
+    with open(path, 'rb') as f:
+        return serializer.loads(f.read())
+
+
+def write_json(path: str, obj: Any, indent: bool = DATA_FILE_INDENT) -> int:
+    """Write obj to a JSON data file, return the number of bytes written"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    data = serializer.dumps(obj, indent=indent)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered by the configured serializer, the app's default response class"""
+
+    def render(self, content: Any) -> bytes:
+        return serializer.dumps(content)
@@ -0,0 +1,77 @@
+"""Character range edits between text versions"""
+from typing import Any, List, Sequence, Tuple
+
+# An edit replaces text[start:end] with text. Stored as [start, end, text].
+Edit = Tuple[int, int, str]
+
+
+def _normalize(edits: Sequence[Any]) -> List[Edit]:
+    normalized = []
+    for edit in edits:
+        if isinstance(edit, dict):
+            normalized.append((edit['start'], edit['end'], edit.get('text') or ''))
+        else:
+            start, end, text = edit
+            normalized.append((start, end, text))
+    return normalized
+
+
+def apply_edits(text: str, edits: Sequence[Any]) -> Tuple[str, List[Edit]]:
+    """Apply edits given against text, return the new text and the reverse edits.
+
+    Edits must be sorted and non-overlapping. The reverse edits turn the new
+    text back into text, so only the replaced spans are kept for history.
+    """
+    edits = _normalize(edits)
+    pieces = []
+    reverse = []
+    position = 0
+    shift = 0
+    for start, end, replacement in edits:
+        if start < position or end < start or end > len(text):
+            raise ValueError(f'Invalid edit range {start}-{end}')
+        pieces.append(text[position:start])
+        pieces.append(replacement)
+        reverse.append((start + shift, start + shift + len(replacement), text[start:end]))
+        shift += len(replacement) - (end - start)
+        position = end
+    pieces.append(text[position:])
+    return ''.join(pieces), reverse
+
+
+# Common prefix and suffix are found by comparing slices of this many
+# characters, then one character at a time inside the first differing block
+_COMPARE_BLOCK = 4096
+
+
+def _common_prefix(a: str, b: str, limit: int) -> int:
+    prefix = 0
+    while prefix + _COMPARE_BLOCK <= limit and a[prefix:prefix + _COMPARE_BLOCK] == b[prefix:prefix + _COMPARE_BLOCK]:
+        prefix += _COMPARE_BLOCK
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    return prefix
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    suffix = 0
+    while suffix + _COMPARE_BLOCK <= limit and \
+            a[len(a) - suffix - _COMPARE_BLOCK:len(a) - suffix] == b[len(b) - suffix - _COMPARE_BLOCK:len(b) - suffix]:
+        suffix += _COMPARE_BLOCK
+    while suffix < limit and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    return suffix
+
+
+def diff_edit(old: str, new: str) -> List[Edit]:
+    """Edits turning new back into old, as one span between common prefix and suffix"""
+    if old == new:
+        return []
+    prefix = _common_prefix(old, new, min(len(old), len(new)))
+    suffix = _common_suffix(old, new, min(len(old), len(new)) - prefix)
+    return [(prefix, len(new) - suffix, old[prefix:len(old) - suffix])]
+
+
+def edit_size(edits: Sequence[Any]) -> int:
+    """Characters carried by edits, what an update or a history entry costs"""
+    return sum(len(text) for _, _, text in _normalize(edits))
@@ -1,6 +1,7 @@
 """Validation utility functions"""
-import re
-from config import MAX_CONTENT_LENGTH, DANGEROUS_EXTENSIONS
+from starlette.concurrency import run_in_threadpool
+from config import MAX_CONTENT_LENGTH, DANGEROUS_EXTENSIONS, CONTENT_SCAN_THREAD_THRESHOLD
+from utils.content_scanner import find_malicious
 
 
 def validate_email(email: str) -> str:
@@ -27,17 +28,14 @@ def validate_file_on_server(title: str, content: str):
         return {'valid': False, 'error': f'Файл өлшемі тым үлкен. Максималды өлшем: {MAX_CONTENT_LENGTH / (1024 * 1024)}MB'}
     
     # Check for potentially malicious content patterns
-    malicious_patterns = [
-        re.compile(r'<script[^>]*>[\s\S]*?</script>', re.IGNORECASE),
-        re.compile(r'javascript:', re.IGNORECASE),
-        re.compile(r'on\w+\s*=', re.IGNORECASE),
-        re.compile(r'eval\s*\(', re.IGNORECASE),
-        re.compile(r'exec\s*\(', re.IGNORECASE),
-    ]
-    
-    for pattern in malicious_patterns:
-        if pattern.search(content):
-            return {'valid': False, 'error': 'Файлда қауіпті контент табылды'}
+    if find_malicious(content):
+        return {'valid': False, 'error': 'Файлда қауіпті контент табылды'}
     
     return {'valid': True}
 
+
+async def validate_file_on_server_async(title: str, content: str):
+    """Validate file on server side, scanning large content in a worker thread"""
+    if content and len(content) > CONTENT_SCAN_THREAD_THRESHOLD:
+        return await run_in_threadpool(validate_file_on_server, title, content)
+    return validate_file_on_server(title, content)
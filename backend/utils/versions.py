@@ -0,0 +1,58 @@
+"""Version counters for collections and records, bumped on every mutation"""
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Called with the collection and the changed record IDs, None when every
+# record of the collection changed
+VersionListener = Callable[[str, Optional[Sequence[str]]], None]
+
+
+class VersionRegistry:
+    """Tracks how many times each collection and each record in it has changed.
+
+    Record versions are paired with a per-collection generation, so a bulk
+    change (account deletion cascade, delete-all) can invalidate every record
+    of a collection at once with invalidate(). The epoch changes on every
+    start, which keeps validators from a previous process from matching.
+    Listeners hear about every change, for caches that drop entries eagerly.
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:12]
+        self.collections: Dict[str, int] = defaultdict(int)
+        self.generations: Dict[str, int] = defaultdict(int)
+        self.records: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.listeners: List[VersionListener] = []
+
+    def add_listener(self, listener: VersionListener) -> None:
+        """Call listener after every bump and invalidate"""
+        self.listeners.append(listener)
+
+    def bump(self, collection: str, *record_ids: str) -> None:
+        """Record a change to a collection and to the given records in it"""
+        self.collections[collection] += 1
+        changed = [str(record_id) for record_id in record_ids if record_id]
+        for record_id in changed:
+            self.records[(collection, record_id)] += 1
+        for listener in self.listeners:
+            listener(collection, changed)
+
+    def invalidate(self, collection: str) -> None:
+        """Record a change to every record of a collection"""
+        self.collections[collection] += 1
+        self.generations[collection] += 1
+        for listener in self.listeners:
+            listener(collection, None)
+
+    def collection_version(self, collection: str) -> int:
+        """Current version of a whole collection"""
+        return self.collections[collection]
+
+    def record_version(self, collection: str, record_id: str) -> Tuple[int, int]:
+        """Current version of a single record"""
+        return self.generations[collection], self.records.get((collection, str(record_id)), 0)
+
+
+# Global version registry
+versions = VersionRegistry()
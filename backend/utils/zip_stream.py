@@ -0,0 +1,57 @@
+"""Zip archives produced as a stream of chunks"""
+import zipfile
+from datetime import datetime
+from typing import Iterable, Iterator, List, Tuple
+
+# Text is encoded and compressed this many characters at a time, so memory
+# stays bounded by the chunk size rather than the archive or file size
+ZIP_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Zip timestamps cannot go before 1980
+ZIP_EPOCH = datetime(1980, 1, 1)
+
+
+class _ChunkSink:
+    """Write-only, unseekable file that collects what ZipFile writes.
+
+    Without seek ZipFile writes sizes and CRCs in data descriptors after
+    each entry, so nothing already handed out has to be patched.
+    """
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.offset = 0
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.offset
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(entries: Iterable[Tuple[str, str, datetime]]) -> Iterator[bytes]:
+    """Yield a deflated zip of (name, text, modified) entries piece by piece"""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, text, modified in entries:
+            info = zipfile.ZipInfo(name, date_time=max(modified, ZIP_EPOCH).timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, mode='w') as entry:
+                for start in range(0, len(text), ZIP_STREAM_CHUNK_SIZE):
+                    entry.write(text[start:start + ZIP_STREAM_CHUNK_SIZE].encode('utf-8', errors='replace'))
+                    if sink.chunks:
+                        yield sink.drain()
+            if sink.chunks:
+                yield sink.drain()
+    # Central directory
+    yield sink.drain()
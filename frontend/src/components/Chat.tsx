@@ -3,7 +3,7 @@ import { useTranslation } from 'react-i18next';
 import { FontAwesomeIcon } from '@fortawesome/react-fontawesome';
 import { faComment, faUserPlus, faCheckCircle } from '@fortawesome/free-solid-svg-icons';
 import { User, Message, FriendRequest } from '../utils/api';
-import { apiService } from '../utils/api';
+import { apiService, avatarThumbnail } from '../utils/api';
 import { subscribeToMessages, unsubscribe } from '../utils/realtimeService';
 import { formatDateTime } from '../utils/dateFormatter';
 import { ensureNumericId, isNumericId } from '../utils/idConverter';
@@ -345,7 +345,7 @@ const Chat: React.FC<ChatProps> = ({ isOpen, onClose }) => {
                     >
                       <div className="chat-friend-avatar">
                         {friend.avatar ? (
-                          <img src={friend.avatar} alt={friend.username} />
+                          <img src={avatarThumbnail(friend, 96)} alt={friend.username} />
                         ) : (
                           <span>{friend.username.charAt(0).toUpperCase()}</span>
                         )}
@@ -384,7 +384,7 @@ const Chat: React.FC<ChatProps> = ({ isOpen, onClose }) => {
                     <div key={user.id} className="chat-search-item">
                       <div className="chat-friend-avatar">
                         {user.avatar ? (
-                          <img src={user.avatar} alt={user.username} />
+                          <img src={avatarThumbnail(user, 96)} alt={user.username} />
                         ) : (
                           <span>{user.username.charAt(0).toUpperCase()}</span>
                         )}
@@ -418,7 +418,7 @@ const Chat: React.FC<ChatProps> = ({ isOpen, onClose }) => {
                     <div key={request.id} className="chat-request-item">
                       <div className="chat-friend-avatar">
                         {request.fromUser?.avatar ? (
-                          <img src={request.fromUser.avatar} alt={request.fromUser.username} />
+                          <img src={avatarThumbnail(request.fromUser, 96)} alt={request.fromUser.username} />
                         ) : (
                           <span>{request.fromUser?.username.charAt(0).toUpperCase()}</span>
                         )}
@@ -456,7 +456,7 @@ const Chat: React.FC<ChatProps> = ({ isOpen, onClose }) => {
                 <div className="chat-messages-friend">
                   <div className="chat-friend-avatar small">
                     {selectedFriend.avatar ? (
-                      <img src={selectedFriend.avatar} alt={selectedFriend.username} />
+                      <img src={avatarThumbnail(selectedFriend, 96)} alt={selectedFriend.username} />
                     ) : (
                       <span>{selectedFriend.username.charAt(0).toUpperCase()}</span>
                     )}
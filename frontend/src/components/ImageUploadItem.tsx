@@ -139,6 +139,7 @@ const ImageUploadItem: React.FC<ImageUploadItemProps> = ({ onSuccess }) => {
         content: imagePreview, // Base64 image data
         language: 'image',
         author: currentUser.username || 'guest',
+        authorId: currentUser.id,
         description: description || `Сурет файлы: ${selectedFile.name}`,
         tags: tags ? tags.split(',').map(t => t.trim()) : ['image', 'picture'],
       });
@@ -133,6 +133,7 @@ export const useFileUpload = (): UseFileUploadReturn => {
         content: fileInfo.content,
         language: metadata?.language || fileInfo.language,
         author: currentUser.username || 'guest',
+        authorId: currentUser.id,
         description: metadata?.description,
         tags: metadata?.tags,
       });
@@ -215,6 +216,7 @@ export const useFileUpload = (): UseFileUploadReturn => {
         content: folderContent,
         language: metadata?.language || 'folder',
         author: currentUser.username || 'current-user',
+        authorId: currentUser.id,
         description: metadata?.description || `${folderInfo.files.length} файл бар папка`,
         tags: metadata?.tags || ['folder'],
         isFolder: true,
@@ -294,6 +296,7 @@ export const useFileUpload = (): UseFileUploadReturn => {
             content: fileInfo.content,
             language: fileInfo.language,
             author: currentUser.username || 'current-user',
+            authorId: currentUser.id,
             description: `Файл папкадан: ${metadata?.title || folderInfo.name}`,
             tags: metadata?.tags || ['folder-file'],
             folderId: folderCode.id,
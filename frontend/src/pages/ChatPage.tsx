@@ -8,7 +8,7 @@ import {
   faImage, faVideo, faFile, faMicrophone, faMapMarkerAlt, faPlay, faPause
 } from '@fortawesome/free-solid-svg-icons';
 import { User, Message, FriendRequest, Chat, MessageAttachment } from '../utils/api';
-import { apiService } from '../utils/api';
+import { apiService, avatarThumbnail } from '../utils/api';
 import { websocketService, WebSocketMessage } from '../utils/websocket';
 import { formatDateTime } from '../utils/dateFormatter';
 import { ensureNumericId, isNumericId } from '../utils/idConverter';
@@ -225,6 +225,16 @@ const ChatPage: React.FC = () => {
       }
     };
 
+    const handleAttachmentThumbnails = (data: WebSocketMessage) => {
+      if (data.messageId && data.attachments) {
+        setMessages(prev => prev.map(msg =>
+          msg.id === data.messageId
+            ? { ...msg, attachments: data.attachments }
+            : msg
+        ));
+      }
+    };
+
     const handleTyping = (data: WebSocketMessage) => {
       if (data.userId && data.userId === selectedFriend?.id) {
         if (data.isTyping) {
@@ -243,12 +253,14 @@ const ChatPage: React.FC = () => {
     websocketService.on('message_read', handleMessageRead);
     websocketService.on('messages_read', handleMessagesRead);
     websocketService.on('typing', handleTyping);
+    websocketService.on('attachment_thumbnails', handleAttachmentThumbnails);
 
     return () => {
       websocketService.off('new_message', handleNewMessage);
       websocketService.off('message_read', handleMessageRead);
       websocketService.off('messages_read', handleMessagesRead);
       websocketService.off('typing', handleTyping);
+      websocketService.off('attachment_thumbnails', handleAttachmentThumbnails);
     };
   }, [currentUser?.id, selectedFriend?.id]);
 
@@ -737,10 +749,11 @@ const ChatPage: React.FC = () => {
             <div className="chat-message-media">
               {message.attachments.map((att, idx) => {
                 const imageUrl = getFullUrl(att.url);
+                const previewUrl = att.thumbnails?.['480'] ? getFullUrl(att.thumbnails['480']) : imageUrl;
                 return (
                   <div key={idx} className="chat-message-image-wrapper">
                     <img
-                      src={imageUrl}
+                      src={previewUrl}
                       alt={att.filename}
                       className="chat-message-image"
                       onClick={() => {
@@ -962,7 +975,7 @@ const ChatPage: React.FC = () => {
                     >
                       <div className="chat-friend-avatar">
                         {chat.partner.avatar ? (
-                          <img src={chat.partner.avatar} alt={chat.partner.username} />
+                          <img src={avatarThumbnail(chat.partner, 96)} alt={chat.partner.username} />
                         ) : (
                           <span>{chat.partner.username.charAt(0).toUpperCase()}</span>
                         )}
@@ -1079,7 +1092,7 @@ const ChatPage: React.FC = () => {
                       <div key={user.id} className="chat-search-item">
                         <div className="chat-friend-avatar">
                           {user.avatar ? (
-                            <img src={user.avatar} alt={user.username} />
+                            <img src={avatarThumbnail(user, 96)} alt={user.username} />
                           ) : (
                             <span>{user.username.charAt(0).toUpperCase()}</span>
                           )}
@@ -1135,7 +1148,7 @@ const ChatPage: React.FC = () => {
                         <div key={request.id} className="chat-request-item">
                           <div className="chat-friend-avatar">
                             {request.fromUser?.avatar ? (
-                              <img src={request.fromUser.avatar} alt={request.fromUser.username} />
+                              <img src={avatarThumbnail(request.fromUser, 96)} alt={request.fromUser.username} />
                             ) : (
                               <span>{request.fromUser?.username.charAt(0).toUpperCase()}</span>
                             )}
@@ -1173,7 +1186,7 @@ const ChatPage: React.FC = () => {
                         <div key={request.id} className="chat-request-item chat-request-item-outgoing">
                           <div className="chat-friend-avatar">
                             {request.toUser?.avatar ? (
-                              <img src={request.toUser.avatar} alt={request.toUser.username} />
+                              <img src={avatarThumbnail(request.toUser, 96)} alt={request.toUser.username} />
                             ) : (
                               <span>{request.toUser?.username.charAt(0).toUpperCase()}</span>
                             )}
@@ -1208,7 +1221,7 @@ const ChatPage: React.FC = () => {
                 <div className="chat-messages-friend">
                   <div className="chat-friend-avatar small">
                     {selectedFriend.avatar ? (
-                      <img src={selectedFriend.avatar} alt={selectedFriend.username} />
+                      <img src={avatarThumbnail(selectedFriend, 96)} alt={selectedFriend.username} />
                     ) : (
                       <span>{selectedFriend.username.charAt(0).toUpperCase()}</span>
                     )}
@@ -573,7 +573,8 @@ const ViewCode: React.FC = () => {
       const updatedCode = await apiService.addComment(
         code.id,
         currentUser.username,
-        commentTextToAdd
+        commentTextToAdd,
+        currentUser.id
       );
       setCode(updatedCode);
     } catch (err) {
@@ -3,6 +3,7 @@ import { API_BASE_URL } from './constants';
 export interface Comment {
   id: string;
   author: string;
+  authorId?: string; // User ID of the author, stays the same when the username changes
   content: string;
   createdAt: string;
   replies?: Comment[]; // Replies to this comment
@@ -16,6 +17,7 @@ export interface CodeFile {
   content: string;
   language: string;
   author: string;
+  authorId?: string; // User ID of the author, stays the same when the username changes
   createdAt: string;
   updatedAt: string;
   tags?: string[];
@@ -28,6 +30,39 @@ export interface CodeFile {
   folderStructure?: Record<string, { type: 'file' | 'folder'; name: string; size?: number; language?: string }>; // Folder structure
   views?: number; // Total number of views
   viewedBy?: string[]; // Array of user IDs who viewed this code
+  version?: number; // Incremented on every update, send as baseVersion
+  likeCount?: number; // Derived, only when requested with fields
+  commentCount?: number; // Derived, only when requested with fields
+  hasContent?: boolean; // Derived, returned by list endpoints instead of content
+}
+
+// Replace content.slice(start, end) of the base version with text
+export interface TextEdit {
+  start: number;
+  end: number;
+  text: string;
+}
+
+export interface CodeVersion {
+  version: number;
+  updatedAt: string;
+  current: boolean;
+  deltaSize?: number;
+  changedFields?: string[];
+}
+
+export interface BulkImportResult {
+  folder: CodeFile | null;
+  created: number;
+  failed: number;
+  results: Array<{
+    index: number;
+    title: string | null;
+    folderPath: string | null;
+    status: 'created' | 'error';
+    id?: string;
+    error?: string;
+  }>;
 }
 
 export interface User {
@@ -35,6 +70,13 @@ export interface User {
   username: string;
   email: string;
   avatar?: string;
+  avatarThumbnails?: Record<string, string>; // Thumbnail size in px -> URL
+}
+
+// Batch lookups answer in request order, null where an ID is unknown
+export interface BatchResult<T> {
+  results: Array<T | null>;
+  missing: string[];
 }
 
 export interface MessageAttachment {
@@ -42,6 +84,7 @@ export interface MessageAttachment {
   url: string;
   size: number;
   mimeType: string;
+  thumbnails?: Record<string, string>; // Thumbnail size in px -> URL, images only
 }
 
 export interface Message {
@@ -65,6 +108,42 @@ export interface Message {
   readAt?: string;
 }
 
+export interface UserActivity {
+  codes: string[];
+  comments: { codeId: string; commentId: string }[];
+  likedCodes: string[];
+  likedComments: { codeId: string; commentId: string }[];
+}
+
+export interface FeedItem {
+  seq: number;
+  type: 'code' | 'comment' | 'like';
+  createdAt: string;
+  actor: Pick<User, 'id' | 'username' | 'avatar' | 'avatarThumbnails'>;
+  code: { id: string; title: string; language: string };
+  comment?: { id: string; content: string };
+}
+
+export interface FeedPage {
+  items: FeedItem[];
+  nextCursor: number | null;
+}
+
+export type JobStatus = 'queued' | 'running' | 'completed' | 'failed';
+
+export interface Job {
+  id: string;
+  type: string;
+  status: JobStatus;
+  stage: string | null;
+  progress: { done: number; total: number };
+  result: Record<string, number> | null;
+  error: string | null;
+  createdAt: string;
+  startedAt: string | null;
+  finishedAt: string | null;
+}
+
 export interface FriendRequest {
   id: string;
   fromUserId: string;
@@ -85,6 +164,71 @@ export interface Chat {
   lastMessageTime: string;
 }
 
+export interface UploadSession {
+  uploadId: string;
+  filename: string;
+  size: number;
+  offset: number;
+  chunkSize: number;
+  complete: boolean;
+}
+
+// Files above this size use the resumable upload API
+const RESUMABLE_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+const RESUMABLE_UPLOAD_RETRIES = 5;
+
+// Avatars are served by the backend as /api/avatars/... paths, which have to
+// point at the API origin rather than the frontend's
+const API_ORIGIN = API_BASE_URL.replace(/\/api\/?$/, '');
+
+function resolveAvatarUrls<T>(data: T): T {
+  if (Array.isArray(data)) {
+    data.forEach(resolveAvatarUrls);
+  } else if (data && typeof data === 'object') {
+    const record = data as Record<string, unknown>;
+    for (const key of Object.keys(record)) {
+      const value = record[key];
+      if (key === 'avatar' && typeof value === 'string' && value.startsWith('/api/')) {
+        record[key] = `${API_ORIGIN}${value}`;
+      } else if (key === 'avatarThumbnails' && value && typeof value === 'object') {
+        const thumbnails = value as Record<string, string>;
+        for (const size of Object.keys(thumbnails)) {
+          if (thumbnails[size].startsWith('/api/')) {
+            thumbnails[size] = `${API_ORIGIN}${thumbnails[size]}`;
+          }
+        }
+      } else if (value && typeof value === 'object') {
+        resolveAvatarUrls(value);
+      }
+    }
+  }
+  return data;
+}
+
+// Hex SHA-256 of a file, null where Web Crypto is unavailable (insecure origins)
+async function fileSha256(file: File): Promise<string | null> {
+  if (!globalThis.crypto?.subtle) {
+    return null;
+  }
+  const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+  return Array.from(new Uint8Array(digest), (byte) => byte.toString(16).padStart(2, '0')).join('');
+}
+
+// Smallest avatar thumbnail covering size px, falling back to the full avatar
+export function avatarThumbnail(user: Pick<User, 'avatar' | 'avatarThumbnails'> | undefined, size: number): string | undefined {
+  const thumbnails = user?.avatarThumbnails;
+  if (thumbnails) {
+    const fitting = Object.keys(thumbnails)
+      .map(Number)
+      .sort((a, b) => a - b)
+      .find((thumbnailSize) => thumbnailSize >= size);
+    if (fitting !== undefined) {
+      return thumbnails[String(fitting)];
+    }
+  }
+  return user?.avatar;
+}
+
 class ApiService {
   private baseUrl: string;
 
@@ -147,7 +291,7 @@ class ApiService {
         throw new Error(errorMessage);
       }
 
-      return response.json();
+      return resolveAvatarUrls(await response.json());
     } catch (error) {
       if (error instanceof Error) {
         // Check if it's an abort error (timeout)
@@ -169,13 +313,15 @@ class ApiService {
     folderId?: string, 
     limit?: number, 
     offset?: number, 
-    includeContent?: boolean
+    includeContent?: boolean,
+    fields?: (keyof CodeFile | '*')[]
   ): Promise<{ codes: CodeFile[]; total: number; limit?: number; offset: number; hasMore: boolean }> {
     const params = new URLSearchParams();
     if (folderId) params.append('folderId', folderId);
     if (limit !== undefined) params.append('limit', limit.toString());
     if (offset !== undefined) params.append('offset', offset.toString());
     if (includeContent) params.append('includeContent', 'true');
+    if (fields) params.append('fields', fields.join(','));
     
     const endpoint = `/codes${params.toString() ? `?${params.toString()}` : ''}`;
     const response = await this.request<any>(endpoint);
@@ -195,10 +341,51 @@ class ApiService {
     return response;
   }
 
+  // Codes one at a time as they arrive, for listings too large to wait for
+  async *streamCodeFiles(
+    options: { folderId?: string; includeContent?: boolean; fields?: (keyof CodeFile | '*')[] } = {}
+  ): AsyncGenerator<CodeFile> {
+    const params = new URLSearchParams({ stream: '1' });
+    if (options.folderId) params.append('folderId', options.folderId);
+    if (options.includeContent) params.append('includeContent', 'true');
+    if (options.fields) params.append('fields', options.fields.join(','));
+    yield* this.streamNDJSON<CodeFile>(`/codes?${params.toString()}`);
+  }
+
+  private async *streamNDJSON<T>(endpoint: string): AsyncGenerator<T> {
+    const response = await fetch(`${this.baseUrl}${endpoint}`, {
+      headers: { Accept: 'application/x-ndjson' },
+    });
+    if (!response.ok || !response.body) {
+      const errorData = await response.json().catch(() => ({ detail: response.statusText }));
+      throw new Error(errorData.detail || `API Error: ${response.statusText}`);
+    }
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffered = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (value) buffered += value;
+      const lines = buffered.split('\n');
+      buffered = done ? '' : lines.pop() ?? '';
+      for (const line of lines) {
+        if (line.trim()) yield resolveAvatarUrls(JSON.parse(line) as T);
+      }
+      if (done) return;
+    }
+  }
+
   async getCodeFile(id: string): Promise<CodeFile> {
     return this.request<CodeFile>(`/codes/${id}`);
   }
 
+  async getCodeFilesBatch(ids: string[], fields?: (keyof CodeFile | '*')[]): Promise<BatchResult<CodeFile>> {
+    const query = fields ? `?fields=${encodeURIComponent(fields.join(','))}` : '';
+    return this.request<BatchResult<CodeFile>>(`/codes/batch${query}`, {
+      method: 'POST',
+      body: JSON.stringify({ ids }),
+    });
+  }
+
   async createCodeFile(file: Omit<CodeFile, 'id' | 'createdAt' | 'updatedAt'>): Promise<CodeFile> {
     return this.request<CodeFile>('/codes', {
       method: 'POST',
@@ -206,6 +393,21 @@ class ApiService {
     });
   }
 
+  async bulkImportCodes(
+    folder: { title: string; author: string; description?: string; tags?: string[] } | null,
+    files: Array<Omit<CodeFile, 'id' | 'createdAt' | 'updatedAt'>>
+  ): Promise<BulkImportResult> {
+    return this.request<BulkImportResult>('/codes/bulk', {
+      method: 'POST',
+      body: JSON.stringify({ folder, files }),
+    });
+  }
+
+  // Zip of a folder and its files; use as a download link, the server streams it
+  getFolderArchiveUrl(folderId: string): string {
+    return `${this.baseUrl}/codes/${encodeURIComponent(folderId)}/archive`;
+  }
+
   async updateCodeFile(id: string, file: Partial<CodeFile>): Promise<CodeFile> {
     return this.request<CodeFile>(`/codes/${id}`, {
       method: 'PUT',
@@ -213,6 +415,27 @@ class ApiService {
     });
   }
 
+  // Send only the changed ranges; fails with 409 if the code moved past baseVersion
+  async patchCodeFile(
+    id: string,
+    baseVersion: number,
+    edits: TextEdit[],
+    fields?: Partial<Pick<CodeFile, 'title' | 'language' | 'description' | 'tags'>>
+  ): Promise<CodeFile> {
+    return this.request<CodeFile>(`/codes/${id}`, {
+      method: 'PATCH',
+      body: JSON.stringify({ baseVersion, edits, ...fields }),
+    });
+  }
+
+  async getCodeVersions(id: string): Promise<CodeVersion[]> {
+    return this.request<CodeVersion[]>(`/codes/${id}/versions`);
+  }
+
+  async getCodeVersion(id: string, version: number): Promise<CodeFile> {
+    return this.request<CodeFile>(`/codes/${id}/versions/${version}`);
+  }
+
   async deleteCodeFile(id: string): Promise<void> {
     return this.request<void>(`/codes/${id}`, {
       method: 'DELETE',
@@ -268,6 +491,10 @@ class ApiService {
     return this.request<User>(`/users/${userId}`);
   }
 
+  async getUserActivity(userId: string): Promise<UserActivity> {
+    return this.request<UserActivity>(`/users/${userId}/activity`);
+  }
+
   async updateUserProfile(updates: Partial<User>): Promise<User> {
     return this.request<User>('/user', {
       method: 'PUT',
@@ -275,13 +502,17 @@ class ApiService {
     });
   }
 
-  async deleteAccount(userId: string, email: string): Promise<{ message: string }> {
-    return this.request<{ message: string }>('/user', {
+  async deleteAccount(userId: string, email: string): Promise<{ message: string; jobId: string; status: JobStatus }> {
+    return this.request<{ message: string; jobId: string; status: JobStatus }>('/user', {
       method: 'DELETE',
       body: JSON.stringify({ userId, email }),
     });
   }
 
+  async getJob(jobId: string): Promise<Job> {
+    return this.request<Job>(`/jobs/${jobId}`);
+  }
+
   // Authentication
   async register(username: string, email: string, password: string, firebaseUid?: string): Promise<{ user: User; message: string }> {
     return this.request<{ user: User; message: string }>('/auth/register', {
@@ -337,10 +568,10 @@ class ApiService {
   }
 
   // Comments
-  async addComment(codeId: string, author: string, content: string): Promise<CodeFile> {
+  async addComment(codeId: string, author: string, content: string, authorId?: string): Promise<CodeFile> {
     return this.request<CodeFile>(`/codes/${codeId}/comments`, {
       method: 'POST',
-      body: JSON.stringify({ author, content }),
+      body: JSON.stringify({ author, content, authorId }),
     });
   }
 
@@ -380,6 +611,21 @@ class ApiService {
     });
   }
 
+  async getUsersBatch(ids: string[], fields?: (keyof User | '*')[]): Promise<BatchResult<User>> {
+    const query = fields ? `?fields=${encodeURIComponent(fields.join(','))}` : '';
+    return this.request<BatchResult<User>>(`/users/batch${query}`, {
+      method: 'POST',
+      body: JSON.stringify({ ids }),
+    });
+  }
+
+  // Activity feed
+  async getFeed(userId: string, cursor?: number | null, limit = 20): Promise<FeedPage> {
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (cursor) params.set('cursor', String(cursor));
+    return this.request<FeedPage>(`/feed/${userId}?${params}`);
+  }
+
   // Friends
   async getFriends(userId: string): Promise<User[]> {
     return this.request<User[]>(`/friends/${userId}`);
@@ -398,6 +644,14 @@ class ApiService {
     });
   }
 
+  async getFriendSuggestions(userId: string, limit = 20): Promise<(User & { mutualFriendCount: number })[]> {
+    return this.request<(User & { mutualFriendCount: number })[]>(`/friends/${userId}/suggestions?limit=${limit}`);
+  }
+
+  async getMutualFriends(userId: string, otherUserId: string): Promise<User[]> {
+    return this.request<User[]>(`/friends/${userId}/mutual/${otherUserId}`);
+  }
+
   // Messages
   async getMessages(userId: string): Promise<Message[]> {
     return this.request<Message[]>(`/messages/${userId}`);
@@ -436,6 +690,32 @@ class ApiService {
     content?: string,
     metadata?: Record<string, any>
   ): Promise<Message> {
+    // Files already stored on the server (e.g. forwarded again) are sent by hash
+    const sha256 = await fileSha256(file);
+    if (sha256) {
+      const forwarded = await fetch(`${this.baseUrl}/messages/forward`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          fromUserId,
+          toUserId,
+          sha256,
+          filename: file.name,
+          mimeType: file.type || undefined,
+          type: messageType,
+          content,
+          metadata
+        }),
+      }).catch(() => null);
+      if (forwarded?.ok) {
+        return resolveAvatarUrls(await forwarded.json());
+      }
+    }
+
+    if (file.size > RESUMABLE_UPLOAD_THRESHOLD) {
+      return this.uploadFileResumable(file, fromUserId, toUserId, messageType, content, metadata);
+    }
+
     const formData = new FormData();
     formData.append('file', file);
     formData.append('fromUserId', fromUserId);
@@ -465,6 +745,67 @@ class ApiService {
     }
   }
 
+  // Large files are sent in chunks, a failed chunk resumes from the offset
+  // the server has stored instead of restarting the whole upload
+  async uploadFileResumable(
+    file: File,
+    fromUserId: string,
+    toUserId: string,
+    messageType: 'image' | 'audio' | 'video' | 'file',
+    content?: string,
+    metadata?: Record<string, any>
+  ): Promise<Message> {
+    const session = await this.request<UploadSession>('/uploads/sessions', {
+      method: 'POST',
+      body: JSON.stringify({
+        fromUserId,
+        toUserId,
+        filename: file.name,
+        size: file.size,
+        mimeType: file.type || undefined,
+        messageType,
+        content,
+        metadata
+      }),
+    });
+
+    const sessionUrl = `${this.baseUrl}/uploads/sessions/${session.uploadId}`;
+    let offset = session.offset;
+    let failures = 0;
+    while (offset < file.size) {
+      try {
+        const response = await fetch(`${sessionUrl}?offset=${offset}`, {
+          method: 'PUT',
+          headers: { 'Content-Type': 'application/octet-stream' },
+          body: file.slice(offset, offset + session.chunkSize),
+        });
+        if (response.ok || response.status === 409) {
+          // 409 means the server has a different offset, continue from there
+          offset = (await response.json()).offset;
+          failures = 0;
+          continue;
+        }
+        const errorData = await response.json().catch(() => ({ detail: response.statusText }));
+        throw new Error(errorData.detail || 'File upload failed');
+      } catch (error) {
+        failures += 1;
+        if (failures > RESUMABLE_UPLOAD_RETRIES) {
+          throw error instanceof Error ? error : new Error('File upload failed');
+        }
+        await new Promise((resolve) => setTimeout(resolve, 1000 * failures));
+        const status = await fetch(sessionUrl).then((response) => response.json()).catch(() => null);
+        if (status && typeof status.offset === 'number') {
+          offset = status.offset;
+        }
+      }
+    }
+
+    return this.request<Message>(`/uploads/sessions/${session.uploadId}/complete`, {
+      method: 'POST',
+      body: JSON.stringify({}),
+    });
+  }
+
   async markMessageAsRead(messageId: string): Promise<Message> {
     return this.request<Message>(`/messages/${messageId}/read`, {
       method: 'PUT',
@@ -6,6 +6,8 @@ export type WebSocketMessageType =
   | 'message_read'
   | 'messages_read'
   | 'typing'
+  | 'attachment_thumbnails'
+  | 'feed_item'
   | 'pong';
 
 export interface WebSocketMessage {
@@ -16,6 +18,8 @@ export interface WebSocketMessage {
   userId?: string;
   count?: number;
   isTyping?: boolean;
+  attachments?: any[];
+  item?: any; // FeedItem of a feed_item
 }
 
 class WebSocketService {